@@ -0,0 +1,166 @@
+"""
+Day-aware cache of GraphQL responses.
+
+Responses are keyed by the normalised query document, variables and operation
+name. Answers computed over past day collections only are final, hence cached
+for long; answers touching today's collection (or not bounded by days) are
+cached briefly, and invalidated when the day changes. So are answers of `LIVE_FIELDS`,
+which keep changing whatever the days queried.
+"""
+import datetime
+import hashlib
+import json
+import threading
+from typing import Optional, Tuple
+
+import flask
+from graphql import parse, print_ast, DocumentNode, OperationDefinitionNode, \
+    OperationType, FieldNode, VariableNode, ListValueNode, GraphQLSyntaxError
+
+from app.database import DAY_FORMAT
+from app.utils.cache import make_cache
+
+
+# root fields reading data updated on past days too, eg. counters of posts
+LIVE_FIELDS = {"stats"}
+
+
+class ResponseCache:
+    """
+    Caches encoded GraphQL responses into a pluggable backend,
+    cf. `utils.cache.make_cache()`. Counts hits and misses.
+    **parse** parses query strings, eg. `DocumentCache.parse` to reuse parsed documents.
+    """
+
+    def __init__(self, backend, ttl_today=60, ttl_past=86400, parse=parse):
+        self.backend = backend
+        self.parse = parse
+        self.ttl_today = ttl_today
+        self.ttl_past = ttl_past
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, data: dict) -> Optional[bytes]:
+        """ Cached response to GraphQL request **data**, if any """
+
+        key, _ = self.entry(data)
+        return self.get_key(key) if key else None
+
+    def get_key(self, key: str) -> Optional[bytes]:
+        """ Cached response under **key**, as computed by `entry()` """
+
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, data: dict, response: bytes):
+        """ Cache response to GraphQL request **data**, unless a mutation """
+
+        key, ttl = self.entry(data)
+        if key:
+            self.set_key(key, response, ttl)
+
+    def set_key(self, key: str, response: bytes, ttl: int):
+        """ Cache response under **key** for **ttl** seconds, as computed by `entry()` """
+
+        self.backend.set(key, response, ttl)
+
+    def entry(self, data: dict) -> Tuple[Optional[str], int]:
+        """
+        Cache key and TTL for GraphQL request **data**.
+        Key hashes the normalised query (whitespace, comments stripped),
+        sorted variables and operation name. None if the request is not cacheable.
+        """
+
+        try:
+            document = self.parse(data["query"])
+        except (KeyError, TypeError, GraphQLSyntaxError):
+            return None, 0
+        if not is_query(document):
+            return None, 0
+
+        variables = data.get("variables") or {}
+        parts = [print_ast(document), json.dumps(variables, sort_keys=True, default=str),
+                 data.get("operationName") or ""]
+
+        # answers touching today are invalidated when the day changes
+        day, ttl = today(), self.ttl_past
+        if touches_today(document, variables, day):
+            parts.append(day)
+            ttl = self.ttl_today
+
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest(), ttl
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.backend)}
+
+
+def today() -> str:
+    return datetime.datetime.utcnow().strftime(DAY_FORMAT)
+
+
+def is_query(document: DocumentNode) -> bool:
+    """ Whether document only holds queries (no mutations, subscriptions) """
+
+    return all(d.operation == OperationType.QUERY for d in document.definitions
+               if isinstance(d, OperationDefinitionNode))
+
+
+def touches_today(document: DocumentNode, variables: dict, day: str) -> bool:
+    """
+    Whether any root field of the query may read from today's collection,
+    ie. is not given day bounds entirely in the past, or reads live data (`LIVE_FIELDS`).
+    """
+
+    variables = variables or {}
+
+    def value(node):
+        if isinstance(node, VariableNode):
+            return variables.get(node.name.value)
+        if isinstance(node, ListValueNode):
+            return [value(v) for v in node.values]
+        return getattr(node, "value", None)
+
+    for definition in document.definitions:
+        if not isinstance(definition, OperationDefinitionNode):
+            continue
+        for field in definition.selection_set.selections:
+            if not isinstance(field, FieldNode) or field.name.value.startswith("__"):
+                continue
+            if field.name.value in LIVE_FIELDS:
+                return True
+            args = {a.name.value: value(a.value) for a in field.arguments or []}
+            days = args.get("days")
+            if days:
+                days = [days] if isinstance(days, str) else days
+                if any(d >= day for d in days):
+                    return True
+            elif not args.get("days_to") or args["days_to"] >= day:
+                return True
+
+    return False
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """ App-wide response cache, None if disabled """
+
+    from app.documents import get_document_cache
+
+    app = flask.current_app
+    if "response_cache" not in app.extensions:
+        cache, backend = None, app.config["RESPONSE_CACHE"]
+        if backend:
+            opts = {"url": app.config["RESPONSE_CACHE_URL"]} if backend == "redis" \
+                else {"maxsize": app.config["RESPONSE_CACHE_SIZE"]}
+            cache = ResponseCache(
+                make_cache(backend, **opts),
+                ttl_today=app.config["RESPONSE_CACHE_TTL_TODAY"],
+                ttl_past=app.config["RESPONSE_CACHE_TTL_PAST"],
+                parse=get_document_cache().parse)
+        app.extensions["response_cache"] = cache
+    return app.extensions["response_cache"]
@@ -11,9 +11,106 @@ class Config(object):
     # Silence the deprecation warning
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Query engine
+    # query day collections concurrently, on a shared pool of threads,
+    # at most `ENGINE_FANOUT_CONCURRENCY` collections at once per request
+    ENGINE_FANOUT = get_env('ENGINE_FANOUT', True, coerce=True)
+    ENGINE_FANOUT_POOL_SIZE = get_env('ENGINE_FANOUT_POOL_SIZE', 16, coerce=True)
+    ENGINE_FANOUT_CONCURRENCY = get_env('ENGINE_FANOUT_CONCURRENCY', 4, coerce=True)
+    # posts fetched ahead per collection by searches, the rest is fetched as consumed
+    ENGINE_FANOUT_BATCH_SIZE = get_env('ENGINE_FANOUT_BATCH_SIZE', 100, coerce=True)
+
     # API settings
     API_PAGINATION_PER_PAGE = 10
 
+    # GraphQL responses cache: "lru" (in-process) | "redis" | "" (disabled)
+    # answers touching today's collection expire after TTL_TODAY, others after TTL_PAST (secs)
+    # the redis cache expects a db of its own, eg. `redis://localhost:6379/1`
+    RESPONSE_CACHE = get_env('RESPONSE_CACHE', 'lru')
+    RESPONSE_CACHE_SIZE = get_env('RESPONSE_CACHE_SIZE', 1024, coerce=True)
+    RESPONSE_CACHE_URL = get_env('RESPONSE_CACHE_URL', 'redis://localhost:6379/1')
+    RESPONSE_CACHE_TTL_TODAY = get_env('RESPONSE_CACHE_TTL_TODAY', 60, coerce=True)
+    RESPONSE_CACHE_TTL_PAST = get_env('RESPONSE_CACHE_TTL_PAST', 86400, coerce=True)
+
+    # encoder of GraphQL responses: "orjson" (fast) | "json" (stdlib).
+    # with PRE_ENCODE, immutable values (eg. country metadata) are encoded only once
+    JSON_ENCODER = get_env('JSON_ENCODER', 'orjson')
+    JSON_PRE_ENCODE = get_env('JSON_PRE_ENCODE', True, coerce=True)
+
+    # per-resolver latency and Mongo operations metrics, exposed at `/metrics`
+    METRICS = get_env('METRICS', True, coerce=True)
+
+    # GraphQL documents
+    # parsed and validated query documents kept in memory
+    DOCUMENT_CACHE_SIZE = get_env('DOCUMENT_CACHE_SIZE', 512, coerce=True)
+    # JSON registry of persisted queries, as {sha256: query} or [query, ...], loaded at startup.
+    # with PERSISTED_QUERIES_ONLY, only operations from the registry are served.
+    PERSISTED_QUERIES_FILE = get_env('PERSISTED_QUERIES_FILE', '')
+    PERSISTED_QUERIES_ONLY = get_env('PERSISTED_QUERIES_ONLY', False, coerce=True)
+    # otherwise, at most CACHE_SIZE queries registered on the fly by clients are kept (LRU)
+    PERSISTED_QUERIES_CACHE_SIZE = get_env('PERSISTED_QUERIES_CACHE_SIZE', 1024, coerce=True)
+
+    # query cost analysis, cf. `app.cost`. operations over BUDGET get rejected,
+    # or downgraded: "reject" | "downgrade" | "report" (never reject) | "" (disabled).
+    # queries without `days_from` count as spanning all the day collections stored,
+    # or UNBOUNDED_DAYS days if set.
+    QUERY_COST_MODE = get_env('QUERY_COST_MODE', 'reject')
+    QUERY_COST_BUDGET = get_env('QUERY_COST_BUDGET', 50000, coerce=True)
+    QUERY_COST_UNBOUNDED_DAYS = get_env('QUERY_COST_UNBOUNDED_DAYS', 0, coerce=True)
+
+    # Posts settings
+    # where to expand posts relations: "python" (app-side) | "pipeline" (server-side, MongoDB >= 5.0)
+    POSTS_ENGINE = get_env('POSTS_ENGINE', 'python')
+    # how to lookup previous/next posts: "index" (batch, in-memory) | "query" (per post)
+    POSTS_ADJACENT_MODE = get_env('POSTS_ADJACENT_MODE', 'index')
+    # how to match the `type` filter: "regex" (substring, case-insensitive) | "prefix" | "exact".
+    # only "prefix" and "exact" can be served by the `type` index.
+    POSTS_TYPE_MATCH = get_env('POSTS_TYPE_MATCH', 'regex')
+    # create the declared indexes on new day collections, checked every INTERVAL (secs)
+    # by a background thread. otherwise, run `flask indexes create`, cf. `app.posts.indexes`
+    POSTS_INDEXES_AUTO = get_env('POSTS_INDEXES_AUTO', False, coerce=True)
+    POSTS_INDEXES_CHECK_INTERVAL = get_env('POSTS_INDEXES_CHECK_INTERVAL', 600, coerce=True)
+    # Bloom filter of all post ids, rejecting unknown post ids without querying.
+    # ids of new days get added every REFRESH (secs). disabled in tests
+    POSTS_LOOKUP_BLOOM = get_env('POSTS_LOOKUP_BLOOM', True, coerce=True)
+    POSTS_LOOKUP_BLOOM_REFRESH = get_env('POSTS_LOOKUP_BLOOM_REFRESH', 3600, coerce=True)
+    # serve posts counts from precomputed per-day rollups.
+    # recent days are recomputed every TTL (secs), past days checked for changes every INTERVAL.
+    POSTS_ROLLUPS = get_env('POSTS_ROLLUPS', True, coerce=True)
+    POSTS_ROLLUPS_TTL = get_env('POSTS_ROLLUPS_TTL', 60, coerce=True)
+    POSTS_ROLLUPS_CHECK_INTERVAL = get_env('POSTS_ROLLUPS_CHECK_INTERVAL', 3600, coerce=True)
+    # post types (`type` filter) rollups are maintained for. other types are counted by the pipeline
+    POSTS_ROLLUPS_TYPES = get_env('POSTS_ROLLUPS_TYPES', ['post', 'metapost'], coerce=True)
+    # distinct categories and tags per day, cf. `VocabularyStore`.
+    # recent days are refreshed every TTL secs, past days checked every CHECK_INTERVAL secs
+    POSTS_VOCABULARY_TTL = get_env('POSTS_VOCABULARY_TTL', 60, coerce=True)
+    POSTS_VOCABULARY_CHECK_INTERVAL = get_env('POSTS_VOCABULARY_CHECK_INTERVAL', 3600, coerce=True)
+    # days merged by queries not bounded by days (no `days`, `days_from`), newest first
+    POSTS_VOCABULARY_MAX_DAYS = get_env('POSTS_VOCABULARY_MAX_DAYS', 90, coerce=True)
+    # columnar cubes of posts metrics per day, serving `publisherMetrics`, cf. `CubeStore`.
+    # recent days are rebuilt every TTL secs, past days persisted and checked every CHECK_INTERVAL secs
+    POSTS_CUBES_TTL = get_env('POSTS_CUBES_TTL', 60, coerce=True)
+    POSTS_CUBES_CHECK_INTERVAL = get_env('POSTS_CUBES_CHECK_INTERVAL', 3600, coerce=True)
+    # cubes kept in memory, least recently used first evicted
+    POSTS_CUBES_CACHE_SIZE = get_env('POSTS_CUBES_CACHE_SIZE', 366, coerce=True)
+    # posts streamed per chunk by the NDJSON export endpoint (`/posts/export`)
+    POSTS_EXPORT_CHUNK_SIZE = get_env('POSTS_EXPORT_CHUNK_SIZE', 500, coerce=True)
+    # clicks and views posted to `/posts/events` are counted in memory, and flushed
+    # to the posts every FLUSH_INTERVAL (secs), or once MAX_PENDING counters are pending.
+    # events are refused (503) while MAX_PENDING counters are pending, eg. database unreachable
+    POSTS_EVENTS_FLUSH_INTERVAL = get_env('POSTS_EVENTS_FLUSH_INTERVAL', 5, coerce=True)
+    POSTS_EVENTS_MAX_PENDING = get_env('POSTS_EVENTS_MAX_PENDING', 10000, coerce=True)
+    # clients send `Authorization: Bearer <token>`, token one of TOKENS (comma-separated).
+    # ingestion is disabled unless tokens are set. at most MAX_BATCH events are accepted per request
+    POSTS_EVENTS_TOKENS = get_env('POSTS_EVENTS_TOKENS', [], coerce=True)
+    POSTS_EVENTS_MAX_BATCH = get_env('POSTS_EVENTS_MAX_BATCH', 1000, coerce=True)
+
+    # Ezines settings
+    # upcoming events of sports IDS (collections) are served from memory, reloaded every INTERVAL (secs).
+    # other sports are not served.
+    SPORTS_SCHEDULE_IDS = get_env('SPORTS_SCHEDULE_IDS', ['102', '106'], coerce=True)
+    SPORTS_SCHEDULE_REFRESH_INTERVAL = get_env('SPORTS_SCHEDULE_REFRESH_INTERVAL', 300, coerce=True)
+
 
 class DevConfig(Config):
     DEBUG = True
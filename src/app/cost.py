@@ -0,0 +1,300 @@
+"""
+Static cost analysis of GraphQL operations, run before execution.
+
+Estimates the cost of every root field from its arguments and selection:
+day collections scanned (`days`, `days_from`, `days_to`), posts returned
+(`limit`, `first`), and per post, the similar (`siblings`, `related`, nested)
+and adjacent (`adjacent` x `previous`/`next`) posts selected for expansion.
+
+Operations costing more than `QUERY_COST_BUDGET` are rejected, or with
+`QUERY_COST_MODE="downgrade"`, get their `adjacent` then `limit` arguments
+halved until within budget. The cost is reported in the response extensions:
+
+    {"data": ..., "extensions": {"cost": {"requested": 680512, "actual": 48080, "budget": 50000}}}
+"""
+import datetime
+import logging
+import time
+from typing import Dict, Optional
+
+import flask
+from ariadne.types import ExtensionSync
+from graphql import DocumentNode, FieldNode, FragmentSpreadNode, GraphQLError, \
+    GraphQLSchema, OperationDefinitionNode
+from graphql.execution.values import get_argument_values
+from pymongo.errors import PyMongoError
+
+from app.database import DAY_FORMAT, get_day_names
+from app.posts.constants import \
+    POST_SIBLINGS_FIELD, POST_RELATED_FIELD, POST_PREVIOUS_FIELD, POST_NEXT_FIELD
+
+
+logger = logging.getLogger(__name__)
+
+RELATED_FIELDS = POST_SIBLINGS_FIELD, POST_RELATED_FIELD
+ADJACENT_FIELDS = POST_PREVIOUS_FIELD, POST_NEXT_FIELD
+
+# average count of similar posts per relation
+RELATION_FANOUT = 5
+
+# estimated rows returned by fields not given a `limit`
+UNBOUNDED_LIMIT = 1000
+
+# queries not bounded by days scan every day collection, counted every so often (secs)
+DAY_COUNT_TTL = 300
+
+# cost of querying a day collection, per root field.
+# aggregations scan whole collections, `post` is located directly (cf. `PostLocator`).
+# cubes and vocabularies are served from memory, but load whole collections when cold.
+DAY_COST = {
+    "posts": 1, "postsConnection": 1, "post": 0,
+    "mostPublished": 5, "mostPublishedConnection": 5, "mostOccurring": 10,
+    "categoriesCounts": 5, "tagsCounts": 5, "countriesCounts": 5, "stats": 5,
+    "publisherMetrics": 10, "categories": 5, "tags": 5,
+}
+
+# fields returning posts, vs. aggregates (`DocStat`) optionally embedding a post `doc`
+POST_FIELDS = ("posts", "postsConnection", "post")
+
+# cost of a `doc` embedded in aggregates: expanded with all relations and adjacency,
+# cf. `agg_sum_to_schema()`
+EMBEDDED_DOC_COST = 1 + len(RELATED_FIELDS) * RELATION_FANOUT + len(ADJACENT_FIELDS)
+
+
+class FieldCost:
+    """ Cost of a root field, given its (possibly downgraded) arguments """
+
+    def __init__(self, name: str, args: dict, selection: dict, unbounded_days: int,
+                 params=("adjacent", "first", "limit")):
+        self.name = name
+        self.args = args
+        self.params = params
+        self.selection = selection
+        self.unbounded_days = unbounded_days
+        self.overrides = {}
+
+    @property
+    def cost(self) -> int:
+        args = {**self.args, **self.overrides}
+        days = day_span(args, self.unbounded_days)
+
+        if self.name == "post":
+            rows = 1
+        elif "first" in args:
+            rows = args["first"] or flask.current_app.config["API_PAGINATION_PER_PAGE"]
+        else:
+            rows = args.get("limit") or UNBOUNDED_LIMIT
+
+        node = self.selection.get("edges", {}).get("node", self.selection)
+        if self.name in POST_FIELDS:
+            row_cost = doc_cost(node, args.get("adjacent", 1 if self.name == "post" else 0) or 0)
+        else:
+            row_cost = 1 + (EMBEDDED_DOC_COST if "doc" in node else 0)
+
+        return days * DAY_COST.get(self.name, 0) + rows * row_cost
+
+    def downgrade(self) -> bool:
+        """ Halve `adjacent`, else `limit`/`first`. False if cannot downgrade further """
+
+        args = {**self.args, **self.overrides}
+        for arg in ("adjacent", "first", "limit"):
+            if arg not in self.params:
+                continue
+            value = args.get(arg)
+            if arg == "limit" and value is None and self.name != "post" and "first" not in args:
+                value = UNBOUNDED_LIMIT
+            if value and value > 1:
+                self.overrides[arg] = value // 2
+                return True
+        return False
+
+
+class QueryCost:
+    """ Cost of an operation, per root field (by response key) """
+
+    def __init__(self, fields: Dict[str, FieldCost], budget: int):
+        self.fields = fields
+        self.budget = budget
+        self.requested = self.actual
+
+    @property
+    def actual(self) -> int:
+        return sum(f.cost for f in self.fields.values())
+
+    @property
+    def overrides(self) -> Dict[str, dict]:
+        return {key: f.overrides for key, f in self.fields.items() if f.overrides}
+
+    def downgrade(self) -> bool:
+        """ Downgrade the costliest fields until within budget """
+
+        while self.actual > self.budget:
+            for field in sorted(self.fields.values(), key=lambda f: f.cost, reverse=True):
+                if field.downgrade():
+                    break
+            else:
+                return False
+        return True
+
+    def to_dict(self) -> dict:
+        return {"requested": self.requested, "actual": self.actual, "budget": self.budget}
+
+
+class CostAnalyser:
+    """
+    Estimates the cost of GraphQL requests against **schema**,
+    rejects or downgrades (**mode**) those over **budget**.
+    Queries not bounded by days count as spanning **unbounded_days** days,
+    by default as many as there are day collections, cf. `day_count()`.
+    """
+
+    def __init__(self, schema: GraphQLSchema, budget=50000, mode="reject",
+                 unbounded_days=None):
+        self.schema = schema
+        self.budget = budget
+        self.mode = mode
+        self.unbounded_days = unbounded_days
+        self._day_count = 0, 0
+
+    def day_count(self) -> int:
+        """
+        Count of day collections, cached for `DAY_COUNT_TTL` secs.
+        The last count is kept if the database cannot be reached.
+        """
+
+        count, counted_at = self._day_count
+        if time.time() - counted_at > DAY_COUNT_TTL:
+            try:
+                count = len(get_day_names())
+            except PyMongoError:
+                logger.exception("counting day collections failed")
+            self._day_count = count, time.time()
+        return count
+
+    def analyse(self, document: DocumentNode, variables: dict = None,
+                operation_name: str = None) -> Optional[QueryCost]:
+        """ Cost of the operation to run, None if not found (reported by the executor) """
+
+        operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+        operation = next((o for o in operations if not operation_name or
+                          (o.name and o.name.value == operation_name)), None)
+        if operation is None:
+            return
+        root_type = getattr(self.schema, f"{operation.operation.value}_type")
+        fragments = {d.name.value: d for d in document.definitions
+                     if not isinstance(d, OperationDefinitionNode)}
+
+        fields, unbounded_days = {}, self.unbounded_days or self.day_count()
+        for node in collect_fields(operation, fragments):
+            field_def = root_type.fields.get(node.name.value) if root_type else None
+            if field_def is None:
+                continue
+            try:
+                args = get_argument_values(field_def, node, variables or {})
+            except GraphQLError:
+                continue
+            key = node.alias.value if node.alias else node.name.value
+            fields[key] = FieldCost(node.name.value, args, selection_tree(node, fragments),
+                                    unbounded_days, params=tuple(field_def.args))
+
+        return QueryCost(fields, self.budget)
+
+    def check(self, document: DocumentNode, variables: dict = None,
+              operation_name: str = None) -> Optional[QueryCost]:
+        """ Cost of the operation, downgraded if need be. Raises `GraphQLError` if over budget """
+
+        cost = self.analyse(document, variables, operation_name)
+        if not cost or cost.actual <= self.budget or self.mode == "report":
+            return cost
+        if self.mode == "downgrade" and cost.downgrade():
+            return cost
+        raise GraphQLError(
+            f"query cost {cost.actual} exceeds the budget of {self.budget}",
+            extensions={"code": "QUERY_TOO_EXPENSIVE", "cost": cost.to_dict()})
+
+
+class CostExtension(ExtensionSync):
+    """
+    Applies the downgraded arguments of root fields,
+    and reports the query cost in the response extensions.
+    """
+
+    def resolve(self, next_, parent, info, **kwargs):
+        cost = flask.g.get("query_cost") if flask.has_app_context() else None
+        if cost and info.path.prev is None:
+            kwargs.update(cost.overrides.get(info.path.key, {}))
+        return next_(parent, info, **kwargs)
+
+    def format(self, context):
+        cost = flask.g.get("query_cost") if flask.has_app_context() else None
+        if cost:
+            return {"cost": cost.to_dict()}
+
+
+def doc_cost(selection: dict, adjacent: int) -> int:
+    """ Cost of a post and its selected similar and adjacent posts """
+
+    cost = 1
+    for rel in RELATED_FIELDS:
+        if rel in selection:
+            cost += RELATION_FANOUT * doc_cost(selection[rel], 0)
+    for adj in ADJACENT_FIELDS:
+        if adj in selection:
+            cost += adjacent * doc_cost(selection[adj], 0)
+    return cost
+
+
+def day_span(args: dict, unbounded_days: int) -> int:
+    """ Count of days queried, **unbounded_days** at most """
+
+    days = args.get("days")
+    if days:
+        return 1 if isinstance(days, str) else len(days)
+
+    parse = lambda d: datetime.datetime.strptime(d, DAY_FORMAT).date()
+    try:
+        days_to = parse(args["days_to"]) if args.get("days_to") \
+            else datetime.datetime.utcnow().date()
+        if not args.get("days_from"):
+            return unbounded_days
+        return max(0, min((days_to - parse(args["days_from"])).days + 1, unbounded_days))
+    except ValueError:
+        return unbounded_days
+
+
+def collect_fields(node, fragments: dict):
+    """ Field nodes selected directly under **node**, with fragments inlined """
+
+    for sel in node.selection_set.selections:
+        if isinstance(sel, FieldNode):
+            yield sel
+        elif isinstance(sel, FragmentSpreadNode):
+            if sel.name.value in fragments:
+                yield from collect_fields(fragments[sel.name.value], fragments)
+        else:
+            yield from collect_fields(sel, fragments)
+
+
+def selection_tree(node, fragments: dict) -> dict:
+    """ Tree of the fields selected under **node**, cf. `utils.gql.get_selection()` """
+
+    if not getattr(node, "selection_set", None):
+        return {}
+    tree = {}
+    for field in collect_fields(node, fragments):
+        subtree = tree.setdefault(field.name.value, {})
+        subtree.update(selection_tree(field, fragments))
+    return tree
+
+
+def get_cost_analyser() -> Optional[CostAnalyser]:
+    """ App-wide query cost analyser, None if disabled """
+
+    app = flask.current_app
+    if "cost_analyser" not in app.extensions:
+        from app.routes import schema
+        mode = app.config["QUERY_COST_MODE"]
+        app.extensions["cost_analyser"] = CostAnalyser(
+            schema, budget=app.config["QUERY_COST_BUDGET"], mode=mode,
+            unbounded_days=app.config["QUERY_COST_UNBOUNDED_DAYS"]) if mode else None
+    return app.extensions["cost_analyser"]
@@ -1,17 +1,136 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from typing import List, Union
+
 import flask
+from daily_query.base import Doc
 from daily_query.mongo import MongoDaily
 from flask_pymongo import PyMongo
 
+from app.utils.fanout import fan_out
+
+
+# day collections are named after the date of the posts they hold
+DAY_FORMAT = "%Y-%m-%d"
+DAY_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+# record metrics of Mongo commands, cf. `app.metrics`
+listeners = []
+if flask.current_app.config["METRICS"]:
+    from app.metrics import command_metrics
+    listeners.append(command_metrics)
 
 mongo = PyMongo()
-mongo.init_app(flask.current_app)
+mongo.init_app(flask.current_app, event_listeners=listeners)
 
 
 def get_db():
     return mongo.db
 
 
+class FanoutDaily(MongoDaily):
+    """
+    Queries the day collections concurrently, rather than one after another.
+
+    Collections are queried on a shared thread pool of `pool_size` workers,
+    at most `concurrency` at once per call, such that a single wide query cannot
+    exhaust the connection pool. Results are yielded in order of collections,
+    newest days first, and posts are sorted newest first within each day.
+
+    Only `search()` and `aggregate()` are fanned out; falls back to the sequential
+    `MongoDaily` implementation for options not supported here.
+
+    `search()` only fetches the first `batch_size` docs of every collection ahead,
+    the rest is fetched as consumed: at most `concurrency` x `batch_size` docs get
+    read beyond those returned, whatever the limit.
+    """
+
+    def __init__(self, *args, pool_size=16, concurrency=4, batch_size=100, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.executor = ThreadPoolExecutor(pool_size, thread_name_prefix="fanout")
+
+    def search(self, flatten=True, limit=None, match=None, fields=None, exclude=None,
+               days=None, days_from=None, days_to=None, **kwargs):
+
+        if not flatten or exclude or kwargs:
+            return super().search(
+                flatten=flatten, limit=limit, match=match, fields=fields, exclude=exclude,
+                days=days, days_from=days_from, days_to=days_to, **kwargs)
+
+        batch_size = min(limit, self.batch_size) if limit else self.batch_size
+
+        def find(collection):
+            cursor = collection.find(match or {}, fields).sort("_id", -1) \
+                .limit(limit or 0).batch_size(batch_size)
+            # first batch fetched ahead, next batches once consumed
+            return collection, chain(list(islice(cursor, batch_size)), cursor)
+
+        def _search():
+            count = 0
+            for collection, docs in fan_out(
+                    find, get_collections(days_from, days_to, days),
+                    self.executor, self.concurrency):
+                for doc in docs:
+                    yield Doc(collection, doc)      # noqa
+                    count += 1
+                    # stop before reading any further doc
+                    if limit and count >= limit:
+                        return
+
+        return _search()
+
+    def aggregate(self, pipeline, days=None, days_from=None, days_to=None, **kwargs):
+        """
+        Runs **pipeline** on every day collection in range, yields (row, collection).
+        :param pipeline: list of stages, or callable returning the stages for given collection.
+        """
+
+        run = lambda collection: (collection, list(collection.aggregate(
+            pipeline(collection) if callable(pipeline) else pipeline)))
+
+        for collection, rows in fan_out(
+                run, get_collections(days_from, days_to, days),
+                self.executor, self.concurrency):
+            for row in rows:
+                yield row, collection
+
+
 db = get_db()
-engine = MongoDaily(db)
+engine = FanoutDaily(
+    db, pool_size=flask.current_app.config["ENGINE_FANOUT_POOL_SIZE"],
+    concurrency=flask.current_app.config["ENGINE_FANOUT_CONCURRENCY"],
+    batch_size=flask.current_app.config["ENGINE_FANOUT_BATCH_SIZE"]) \
+    if flask.current_app.config["ENGINE_FANOUT"] else MongoDaily(db)
+
+
+def get_day_names(days_from: str = None, days_to: str = None,
+                  days: Union[str, List[str]] = None) -> List[str]:
+    """
+    Names of existing day collections in date range, newest first.
+    Dates are formatted as `DAY_FORMAT`, hence compare as strings.
+
+    :param days_from: first day (inclusive)
+    :param days_to: last day (inclusive)
+    :param days: only given day(s), overrides `days_from` and `days_to`
+    """
+
+    names = filter(DAY_PATTERN.match, db.list_collection_names())
+    if days:
+        days = {days} if isinstance(days, str) else set(days)
+        names = filter(lambda n: n in days, names)
+    else:
+        names = filter(lambda n: (not days_from or n >= days_from) and
+                                 (not days_to or n <= days_to), names)
+
+    return sorted(names, reverse=True)
+
 
+def get_collections(days_from: str = None, days_to: str = None,
+                    days: Union[str, List[str]] = None) -> list:
+    """ Existing day collections in date range, newest first """
 
+    return [db[name] for name in get_day_names(days_from, days_to, days)]
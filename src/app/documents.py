@@ -0,0 +1,210 @@
+"""
+Parsed query documents cache and persisted queries.
+
+Clients send the same few (large) query documents over and over; parsing and
+validating them against the schema on every request is wasted work. Documents
+are parsed and validated once, and kept keyed by the sha256 hash of the query.
+
+On top, Apollo-style persisted queries [1] let clients send the query hash only:
+    {"extensions": {"persistedQuery": {"version": 1, "sha256Hash": "<hash>"}}}
+Hashes are resolved from the registry of allowed operations, loaded at startup
+from `PERSISTED_QUERIES_FILE`, or from queries registered on the fly by clients
+(automatic persisted queries), unless `PERSISTED_QUERIES_ONLY` is set.
+Queries registered on the fly are kept in a bounded LRU cache, the registry never evicted.
+Hash-only requests are small enough to be sent over GET, hence cacheable by HTTP.
+
+[1] https://www.apollographql.com/docs/apollo-server/performance/apq/
+"""
+import hashlib
+import json
+from typing import List, Tuple
+
+import flask
+from ariadne.extensions import ExtensionManager
+from ariadne.format_error import format_error
+from ariadne.graphql import handle_graphql_errors, handle_query_result, validate_data
+from graphql import DocumentNode, ExecutionContext, GraphQLError, GraphQLSchema, \
+    execute, parse
+from graphql.validation import specified_rules, validate
+
+from app.utils.cache import LRUCache
+
+
+# parsed documents never go stale
+NO_EXPIRY = float("inf")
+
+PERSISTED_QUERY_NOT_FOUND = "PersistedQueryNotFound"
+PERSISTED_QUERY_NOT_SUPPORTED = "PersistedQueryNotSupported"
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+class DocumentCache:
+    """
+    LRU cache of query documents, parsed and validated against **schema**.
+    Syntax errors are not cached; validation errors are (they never change).
+    """
+
+    def __init__(self, schema: GraphQLSchema, maxsize=512):
+        self.schema = schema
+        self._documents = LRUCache(maxsize=maxsize)
+
+    def parse(self, query: str) -> DocumentNode:
+        """ Parsed document of **query**. Raises `GraphQLSyntaxError` """
+
+        return self._get(query)[0]
+
+    def validate(self, query: str) -> Tuple[DocumentNode, List[GraphQLError]]:
+        """ Parsed document of **query**, and its validation errors """
+
+        entry = self._get(query)
+        if entry[1] is None:
+            entry[1] = validate(self.schema, entry[0], specified_rules)
+        return entry[0], entry[1]
+
+    def _get(self, query: str) -> list:
+        key = query_hash(query)
+        entry = self._documents.get(key)
+        if entry is None:
+            entry = [parse(query), None]
+            self._documents.set(key, entry, NO_EXPIRY)
+        return entry
+
+    def __len__(self):
+        return len(self._documents)
+
+
+class PersistedQueries:
+    """
+    Registry of persisted queries, by sha256 hash.
+    :param queries: allowed operations, as {hash: query} or [query, ...]
+    :param only: serve persisted operations only, reject others
+    :param maxsize: count of queries registered on the fly by clients, kept at most
+    """
+
+    def __init__(self, queries=None, only=False, maxsize=1024):
+        if isinstance(queries, list):
+            queries = {query_hash(q): q for q in queries}
+        self.queries = dict(queries or {})
+        self.only = only
+        self.registered = LRUCache(maxsize=maxsize)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "PersistedQueries":
+        """ Load registry from a JSON file, eg. as generated by the client build """
+
+        with open(path) as f:
+            return cls(json.load(f), **kwargs)
+
+    def resolve(self, data: dict) -> dict:
+        """
+        Fill in the query of persisted query request **data**, from its hash.
+        Registers queries sent alongside their hash, unless serving allowed operations only.
+        Raises `GraphQLError` if the hash is unknown or mismatches the query.
+        """
+
+        if not isinstance(data, dict):
+            return data
+        query = data.get("query")
+        extension = (data.get("extensions") or {}).get("persistedQuery")
+        if not extension:
+            if self.only and (not isinstance(query, str) or query_hash(query) not in self.queries):
+                raise GraphQLError(PERSISTED_QUERY_NOT_SUPPORTED, extensions={
+                    "code": "PERSISTED_QUERY_NOT_SUPPORTED"})
+            return data
+
+        sha256 = extension.get("sha256Hash")
+        if not query:
+            query = self.get(sha256)
+            if query is None:
+                raise GraphQLError(PERSISTED_QUERY_NOT_FOUND, extensions={
+                    "code": "PERSISTED_QUERY_NOT_FOUND"})
+            return {**data, "query": query}
+
+        if not isinstance(query, str) or query_hash(query) != sha256:
+            raise GraphQLError("provided sha does not match query", extensions={
+                "code": "BAD_USER_INPUT"})
+        if self.get(sha256) is None:
+            if self.only:
+                raise GraphQLError(PERSISTED_QUERY_NOT_FOUND, extensions={
+                    "code": "PERSISTED_QUERY_NOT_FOUND"})
+            self.registered.set(sha256, query, NO_EXPIRY)
+        return data
+
+    def get(self, sha256: str):
+        """ Query of hash **sha256**, from the registry or registered on the fly """
+
+        if not isinstance(sha256, str):
+            return
+        return self.queries.get(sha256) or self.registered.get(sha256)
+
+    def __len__(self):
+        return len(self.queries) + len(self.registered)
+
+
+def graphql_cached(schema: GraphQLSchema, data: dict, documents: DocumentCache,
+                   context_value=None, root_value=None, debug=False,
+                   extensions=None, middleware=None, logger=None,
+                   error_formatter=format_error):
+    """
+    Like `ariadne.graphql_sync()`, but reusing parsed and validated documents
+    from the **documents** cache. Expects persisted queries resolved already.
+    """
+
+    extension_manager = ExtensionManager(extensions, context_value)
+
+    with extension_manager.request():
+        try:
+            validate_data(data)
+            query, variables, operation_name = (
+                data["query"], data.get("variables"), data.get("operationName"))
+
+            document, validation_errors = documents.validate(query)
+            if validation_errors:
+                return handle_graphql_errors(
+                    validation_errors, logger=logger, error_formatter=error_formatter,
+                    debug=debug, extension_manager=extension_manager)
+
+            result = execute(
+                schema, document,
+                root_value=root_value,
+                context_value=context_value,
+                variable_values=variables,
+                operation_name=operation_name,
+                execution_context_class=ExecutionContext,
+                middleware=extension_manager.as_middleware_manager(middleware),
+            )
+        except GraphQLError as error:
+            return handle_graphql_errors(
+                [error], logger=logger, error_formatter=error_formatter, debug=debug,
+                extension_manager=extension_manager)
+        else:
+            return handle_query_result(
+                result, logger=logger, error_formatter=error_formatter, debug=debug,
+                extension_manager=extension_manager)
+
+
+def get_document_cache() -> DocumentCache:
+    """ App-wide cache of parsed documents """
+
+    app = flask.current_app
+    if "document_cache" not in app.extensions:
+        from app.routes import schema
+        app.extensions["document_cache"] = DocumentCache(
+            schema, maxsize=app.config["DOCUMENT_CACHE_SIZE"])
+    return app.extensions["document_cache"]
+
+
+def get_persisted_queries() -> PersistedQueries:
+    """ App-wide registry of persisted queries """
+
+    app = flask.current_app
+    if "persisted_queries" not in app.extensions:
+        path = app.config["PERSISTED_QUERIES_FILE"]
+        kwargs = {"only": app.config["PERSISTED_QUERIES_ONLY"],
+                  "maxsize": app.config["PERSISTED_QUERIES_CACHE_SIZE"]}
+        app.extensions["persisted_queries"] = PersistedQueries.from_file(path, **kwargs) \
+            if path else PersistedQueries(**kwargs)
+    return app.extensions["persisted_queries"]
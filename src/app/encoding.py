@@ -0,0 +1,33 @@
+"""
+Encoding of GraphQL responses to JSON, with the encoder set by `JSON_ENCODER`
+(cf. `utils.encoders`), and values pre-encoded once for all responses.
+"""
+import flask
+
+from app.utils.encoders import make_encoder
+
+
+def get_json_encoder():
+    """ App-wide encoder of GraphQL responses, cf. `utils.encoders` """
+
+    app = flask.current_app
+    if "json_encoder" not in app.extensions:
+        app.extensions["json_encoder"] = make_encoder(app.config["JSON_ENCODER"])
+    return app.extensions["json_encoder"]
+
+
+def pre_encoded(key: str, value):
+    """
+    **value**, encoded once per **key** then embedded as is in responses,
+    if `JSON_PRE_ENCODE`. Only for values that never change, eg. registries.
+    Only done when serving responses from `routes.execute()`.
+    """
+
+    encoder = flask.g.get("json_encoder")
+    if encoder is None or value is None or not flask.current_app.config["JSON_PRE_ENCODE"]:
+        return value
+
+    fragments = flask.current_app.extensions.setdefault("json_fragments", {})
+    if key not in fragments:
+        fragments[key] = encoder.fragment(value)
+    return fragments[key]
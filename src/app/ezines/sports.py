@@ -1,62 +1,133 @@
+import bisect
 import datetime
+import threading
+import time
+from typing import Dict, List
 
+import flask
 from ariadne import convert_kwargs_to_snake_case, ObjectType
 from daily_query.constants import FETCH_BATCH
-from daily_query.mongo import Collection
+from pymongo import ASCENDING
 
 from app.database import db
 from app.routes import query
 
 DEFAULT_SPORTS_IDS = [102, 106]
 
+# `SportEvent` fields, from the event fields stored by the scraper
+EVENT_FIELDS = {
+    "sport": "strSport", "season": "strSeason",
+    "event": "strEvent", "league": "strLeague",
+    "venue": "strVenue", "time": "strTimestamp",
+    "city": "strCity", "country": "strCountry",
+    "status": "strStatus", "postponed": "strPostponed",
+    "home_team": "strHomeTeam", "away_team": "strAwayTeam",
+    "thumb": "strThumb",
+}
 
-class SportSchedule(Collection):
+
+class ScheduleView:
     """
-    Querying sports schedules from the database
+    In-memory materialised view of the upcoming events of every sport,
+    indexed by sport id, then season (None: all seasons), and sorted by date.
+
+    Only the given **sports** are served, other collections are never read.
+    Their `dateEvent` index is created, and their events reloaded, in background
+    every `refresh_interval` seconds. Past events are skipped at query time,
+    by bisecting the event dates, so that the view stays valid between reloads.
     """
 
-    sport: str = None
+    def __init__(self, sports=DEFAULT_SPORTS_IDS, refresh_interval=300):
+        self.sports = frozenset(str(sport) for sport in sports)
+        self.refresh_interval = refresh_interval
+        # sport -> season -> (dates, events), both sorted by date
+        self._events: Dict[str, Dict[str, tuple]] = {}
+        self._indexed = set()
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def get(self, sport: str, season: str = None, limit: int = None) -> List[dict]:
+        """ Next **limit** events of **sport** (and **season**), from today """
+
+        if sport not in self.sports:
+            return []
+        self.maybe_refresh()
+        if sport not in self._events:
+            self._events[sport] = self.load(sport)
+
+        dates, events = self._events[sport].get(season, ((), ()))
+        start = bisect.bisect_left(dates, str(datetime.date.today()))
+        return list(events[start:start + limit] if limit else events[start:])
+
+    @staticmethod
+    def load(sport: str) -> Dict[str, tuple]:
+        """ Upcoming events of sport, by season """
+
+        docs = db[sport].find(
+            {"dateEvent": {"$gte": str(datetime.date.today())}},
+            {"_id": 0, "dateEvent": 1, **{field: 1 for field in EVENT_FIELDS.values()}},
+        ).sort([("dateEvent", ASCENDING), ("strTimestamp", ASCENDING)])
+
+        seasons = {None: ([], [])}
+        for doc in docs:
+            event = {name: doc.get(field) for name, field in EVENT_FIELDS.items()}
+            for season in (None, event["season"]):
+                dates, events = seasons.setdefault(season, ([], []))
+                dates.append(doc["dateEvent"])
+                events.append(event)
 
-    @property
-    def season(self):
-        y = datetime.date.today().year
-        this_season = f"{y}-{y + 1}"
-        return getattr(self, '_season', this_season)
+        return {season: (tuple(dates), tuple(events))
+                for season, (dates, events) in seasons.items()}
 
-    @season.setter
-    def season(self, value: str):
-        setattr(self, '_season', value)
+    def refresh(self, wait=True):
+        """ Index and reload all sports, in background unless **wait** """
 
-    def __init__(self, sport=None, season=None):
-        super().__init__(db_or_uri=db)
-        self.sport = sport
-        self.season = season
+        def run():
+            try:
+                self._refreshed_at = time.time()
+                for sport in self.sports:
+                    if sport not in self._indexed:
+                        db[sport].create_index([("dateEvent", ASCENDING)], name="dateEvent")
+                        self._indexed.add(sport)
+                    # swapped whole, readers never see a partial view
+                    self._events[sport] = self.load(sport)
+            finally:
+                self._lock.release()
+
+        # at most one run at a time
+        if not self._lock.acquire(blocking=False):
+            return
+        if wait:
+            run()
+        else:
+            threading.Thread(target=run, daemon=True).start()
+
+    def maybe_refresh(self):
+        """ Reload sports in background, if never or not refreshed for `refresh_interval` secs """
+
+        if not self._refreshed_at or time.time() - self._refreshed_at > self.refresh_interval:
+            self.refresh(wait=False)
+
+
+def get_schedule_view() -> ScheduleView:
+    """ App-wide view of the upcoming sports events """
+
+    app = flask.current_app
+    if "schedule_view" not in app.extensions:
+        app.extensions["schedule_view"] = ScheduleView(
+            sports=app.config["SPORTS_SCHEDULE_IDS"],
+            refresh_interval=app.config["SPORTS_SCHEDULE_REFRESH_INTERVAL"])
+    return app.extensions["schedule_view"]
 
 
 @query.field("sportsSchedule")
 @convert_kwargs_to_snake_case
 def resolve_schedule(*_, sport, season=None, limit=FETCH_BATCH):
     """
-    Retrieve upcoming schedule (next events) for given sport
+    Retrieve upcoming schedule (next events) for given sport,
+    from the materialised view of upcoming events, cf. `ScheduleView`.
     :param limit:
-    :param str sport: eg. Soccer=102, Basketball=106.
-    :param str season: eg. 2022-2023
+    :param str sport: eg. Soccer=102, Basketball=106. only `SPORTS_SCHEDULE_IDS`.
+    :param str season: eg. 2022-2023. all seasons if not given.
     """
-    pipelines = [
-        {"$match": {"dateEvent": {
-            "$gte": str(datetime.date.today())}}},
-        {"$limit": limit},
-        {"$project": {
-            "sport": "$strSport", "season": "$strSeason",
-            "event": "$strEvent", "league": "$strLeague",
-            "venue": "$strVenue", "time": "$strTimestamp",
-            "city": "$strCity", "country": "$strCountry",
-            "status": "$strStatus", "postponed": "$strPostponed",
-            "home_team": "$strHomeTeam", "away_team": "$strAwayTeam",
-            "thumb": "$strThumb"}}
-    ]
-    events = SportSchedule(sport=sport, season=season)
-    data = events(sport).aggregate(pipelines)
-    return data
-
-
+    return get_schedule_view().get(sport, season, limit)
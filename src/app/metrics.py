@@ -0,0 +1,157 @@
+"""
+Per-resolver latency and Mongo operation metrics, in the Prometheus format.
+
+`MetricsExtension` (an Ariadne extension) times every root field resolver
+(`Query.*`, `Mutation.*`; nested fields are mere lookups on resolved docs),
+while `CommandMetrics` (a PyMongo command listener) attributes the Mongo
+commands issued meanwhile to the resolver: count, documents and bytes returned
+(estimated), and day collections touched. Attribution relies on a context variable, which
+follows resolvers onto the fan-out worker threads, cf. `utils.fanout`.
+
+Metrics are exposed as histograms at `/metrics`. Enabled by `METRICS`,
+requires `prometheus_client`. Per process: with several workers, scrape each.
+"""
+import contextvars
+import threading
+import time
+from inspect import isawaitable
+from typing import Optional
+
+import bson
+from ariadne.types import ExtensionSync
+from prometheus_client import Histogram
+from pymongo import monitoring
+
+from app.database import DAY_PATTERN
+
+
+# types whose field resolvers query the database
+ROOT_TYPES = ("Query", "Mutation")
+
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, 10000)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8)
+
+RESOLVER_DURATION = Histogram(
+    "newsapi_resolver_duration_seconds", "Wall time of GraphQL root field resolvers",
+    ["field"], buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30))
+RESOLVER_COMMANDS = Histogram(
+    "newsapi_resolver_mongo_commands", "Mongo commands issued per resolver call",
+    ["field"], buckets=COUNT_BUCKETS)
+RESOLVER_DOCUMENTS = Histogram(
+    "newsapi_resolver_mongo_documents", "Documents returned by Mongo per resolver call",
+    ["field"], buckets=COUNT_BUCKETS)
+RESOLVER_BYTES = Histogram(
+    "newsapi_resolver_mongo_bytes",
+    "Bytes returned by Mongo per resolver call, estimated from the first document of each batch",
+    ["field"], buckets=BYTES_BUCKETS)
+RESOLVER_DAYS = Histogram(
+    "newsapi_resolver_day_collections", "Day collections queried per resolver call",
+    ["field"], buckets=(0, 1, 2, 3, 7, 14, 31, 62, 93, 186, 365))
+COMMAND_DURATION = Histogram(
+    "newsapi_mongo_command_duration_seconds", "Duration of Mongo commands",
+    ["command"], buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5))
+
+
+class ResolverStats:
+    """ Mongo operations issued on behalf of a resolver call """
+
+    __slots__ = ("commands", "documents", "bytes", "days", "_lock")
+
+    def __init__(self):
+        self.commands = 0
+        self.documents = 0
+        self.bytes = 0
+        self.days = set()
+        # commands may be issued concurrently, cf. `utils.fanout`
+        self._lock = threading.Lock()
+
+    def add_command(self, collection: Optional[str]):
+        with self._lock:
+            self.commands += 1
+            if collection:
+                self.days.add(collection)
+
+    def add_reply(self, documents: int, size: int):
+        with self._lock:
+            self.documents += documents
+            self.bytes += size
+
+    def observe(self, field: str, elapsed: float):
+        RESOLVER_DURATION.labels(field).observe(elapsed)
+        RESOLVER_COMMANDS.labels(field).observe(self.commands)
+        RESOLVER_DOCUMENTS.labels(field).observe(self.documents)
+        RESOLVER_BYTES.labels(field).observe(self.bytes)
+        RESOLVER_DAYS.labels(field).observe(len(self.days))
+
+
+# stats of the resolver being run, if any
+current_stats: contextvars.ContextVar[Optional[ResolverStats]] = \
+    contextvars.ContextVar("resolver_stats", default=None)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """ Records Mongo commands, and attributes them to the resolver being run """
+
+    def started(self, event):
+        stats = current_stats.get()
+        if stats is None:
+            return
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        is_day = isinstance(collection, str) and DAY_PATTERN.match(collection)
+        stats.add_command(collection if is_day else None)
+
+    def succeeded(self, event):
+        COMMAND_DURATION.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+        stats = current_stats.get()
+        if stats is None:
+            return
+        reply = event.reply
+        cursor = reply.get("cursor") or {}
+        docs = cursor.get("firstBatch", cursor.get("nextBatch", reply.get("values")))
+        if docs is None:
+            stats.add_reply(reply.get("n", 0), 0)
+            return
+
+        # replies are already decoded: re-encoding them whole would double the cost
+        # of large reads, hence only the first document is, as a sample.
+        sample = docs[0] if docs and isinstance(docs[0], dict) else None
+        stats.add_reply(len(docs), len(bson.encode(sample)) * len(docs) if sample else 0)
+
+    def failed(self, event):
+        COMMAND_DURATION.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+
+class MetricsExtension(ExtensionSync):
+    """ Times root field resolvers, and records the Mongo operations they issue """
+
+    def resolve(self, next_, parent, info, **kwargs):
+        if info.parent_type.name not in ROOT_TYPES:
+            return next_(parent, info, **kwargs)
+
+        field = f"{info.parent_type.name}.{info.field_name}"
+        stats, start = ResolverStats(), time.perf_counter()
+        token = current_stats.set(stats)
+        try:
+            result = next_(parent, info, **kwargs)
+        finally:
+            current_stats.reset(token)
+
+        # async resolvers: the context (and `stats`) is set again once the awaitable is run.
+        if isawaitable(result):
+            async def measure_async():
+                token = current_stats.set(stats)
+                try:
+                    return await result
+                finally:
+                    current_stats.reset(token)
+                    stats.observe(field, time.perf_counter() - start)
+            return measure_async()
+
+        stats.observe(field, time.perf_counter() - start)
+        return result
+
+
+command_metrics = CommandMetrics()
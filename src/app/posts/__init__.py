@@ -4,3 +4,6 @@ posts = flask.Blueprint('posts', __name__)
 
 from . import queries
 from . import mutation
+from . import export
+from . import indexes
+from . import ingest
@@ -10,9 +10,10 @@ POST_RELATED_FIELD = "related"
 POST_PREVIOUS_FIELD = 'previous'
 POST_NEXT_FIELD = 'next'
 POST_STATS_FIELD = 'stats'
+POST_COUNTERS_FIELD = 'counters'
 POST_TYPE = 'type'
 
-POST_ACTIONS = ["clicks"]
+POST_ACTIONS = ["clicks", "views"]
 
 
 # TODO: to enum `DocStat` mapping to graphql type `DocStat`
@@ -0,0 +1,221 @@
+"""
+Columnar, in-memory OLAP cubes of posts metrics, one per day collection.
+
+Every day collection is loaded once into NumPy arrays: one dictionary-encoded
+column per dimension (paper brand, country, category, type, tag) and one
+column per metric (posts, videos, similarity scores). Any dimensions/metrics
+combination is then answered with a vectorised group-by over these arrays,
+rather than running a new Mongo pipeline per combination.
+
+Like rollups (cf. `RollupStore`), cubes of recent days get rebuilt every
+`POSTS_CUBES_TTL` seconds, while cubes of past days are persisted to the
+`CUBES_COLLECTION` collection, hence built only once (unless their day changed).
+At most `POSTS_CUBES_CACHE_SIZE` cubes are kept in memory.
+"""
+import io
+from collections import defaultdict
+from typing import Dict, List
+
+import flask
+import numpy as np
+from bson import Binary
+
+from app.database import db, get_day_names
+from app.posts.constants import POST_SIBLINGS_FIELD, POST_RELATED_FIELD, POST_TYPE
+from app.posts.rollups import RollupStore
+from app.utils.cache import LRUCache
+from app.utils.fanout import fan_out
+
+
+# not named after a date, hence never mistaken for a day collection
+CUBES_COLLECTION = "posts_cubes"
+
+# dimension -> post field
+DIMENSIONS = {
+    "paper": "paper.brand", "country": "country", "category": "category",
+    "type": POST_TYPE, "tag": "tags",
+}
+
+# posts are counted once per tag when grouping by `tag`
+MULTI_VALUED = {"tag"}
+
+METRICS = ("posts", "videos", POST_SIBLINGS_FIELD, POST_RELATED_FIELD)
+
+
+class PostCube:
+    """
+    Posts of a day as columns: dimensions are arrays of codes into
+    their vocabulary (`vocab`), metrics are arrays of values, one row per post.
+    Tags are multi-valued, hence stored as a (post row, tag code) bridge.
+    """
+
+    def __init__(self, vocab: Dict[str, list], arrays: Dict[str, np.ndarray]):
+        self.vocab = vocab
+        self.arrays = arrays
+
+    def __len__(self):
+        return len(self.arrays["posts"])
+
+    @classmethod
+    def build(cls, docs) -> "PostCube":
+        """ Cube of posts **docs** """
+
+        codes = {dim: {} for dim in DIMENSIONS}
+        encode = lambda dim, value: codes[dim].setdefault(value, len(codes[dim]))
+        columns = defaultdict(list)
+
+        for row, doc in enumerate(docs):
+            for dim in DIMENSIONS.keys() - MULTI_VALUED:
+                value = doc.get(dim) if dim != "paper" else (doc.get("paper") or {}).get("brand")
+                columns[dim].append(encode(dim, value))
+            # posts without tags are grouped under tag None
+            for tag in set(doc.get("tags") or [None]):
+                columns["tag_row"].append(row)
+                columns["tag"].append(encode("tag", tag))
+
+            columns["posts"].append(1)
+            columns["videos"].append(len(doc.get("videos") or []))
+            for rel in (POST_SIBLINGS_FIELD, POST_RELATED_FIELD):
+                columns[rel].append(sum(s.get("score") or 0 for s in doc.get(rel) or []))
+
+        dtypes = {"posts": np.int32, "videos": np.int32,
+                  POST_SIBLINGS_FIELD: np.float64, POST_RELATED_FIELD: np.float64}
+        arrays = {name: np.asarray(columns[name], dtype=dtypes.get(name, np.int32))
+                  for name in (*DIMENSIONS, "tag_row", *METRICS)}
+        return cls({dim: list(values) for dim, values in codes.items()}, arrays)
+
+    def group_by(self, dimensions: List[str], metrics: List[str], networks=None) -> dict:
+        """ {(dimension values): [metric sums]} of the posts of given **networks** (brands) """
+
+        arrays = self.arrays
+        rows = arrays["tag_row"] if "tag" in dimensions else np.arange(len(self))
+        columns = {dim: arrays[dim] if dim in MULTI_VALUED else arrays[dim][rows]
+                   for dim in dimensions}
+
+        if networks:
+            brands = [code for code, brand in enumerate(self.vocab["paper"]) if brand in networks]
+            mask = np.isin(arrays["paper"][rows], brands)
+            rows = rows[mask]
+            columns = {dim: column[mask] for dim, column in columns.items()}
+        if not len(rows):
+            return {}
+
+        # one integer key per combination of dimension codes
+        shape = [max(len(self.vocab[dim]), 1) for dim in dimensions]
+        keys = np.ravel_multi_index([columns[dim] for dim in dimensions], shape) \
+            if dimensions else np.zeros(len(rows), dtype=np.int64)
+        groups, inverse = np.unique(keys, return_inverse=True)
+        sums = [np.bincount(inverse, weights=arrays[m][rows], minlength=len(groups))
+                for m in metrics]
+
+        results = {}
+        for i, codes in enumerate(zip(*np.unravel_index(groups, shape))):
+            values = tuple(self.vocab[dim][code] for dim, code in zip(dimensions, codes))
+            results[values] = [s[i] for s in sums]
+        return results
+
+    def to_document(self) -> dict:
+        def dump(array):
+            buffer = io.BytesIO()
+            np.save(buffer, array, allow_pickle=False)
+            return Binary(buffer.getvalue())
+        return {"vocab": self.vocab, "arrays": {k: dump(v) for k, v in self.arrays.items()}}
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "PostCube":
+        load = lambda data: np.load(io.BytesIO(data), allow_pickle=False)
+        return cls(doc["vocab"], {k: load(v) for k, v in doc["arrays"].items()})
+
+
+class CubeStore:
+    """
+    Per-day cubes, rebuilt every `ttl` seconds for recent days (today, yesterday).
+    Past days are checked every `check_interval` seconds, and only rebuilt
+    if their fingerprint changed. The **maxsize** most recently used cubes are
+    kept in memory.
+
+    Days are checked (and built) concurrently on **executor** if supplied,
+    at most **concurrency** at once, cf. `fan_out()`.
+    """
+
+    def __init__(self, ttl=60, check_interval=3600, maxsize=366, executor=None, concurrency=4):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.executor = executor
+        self.concurrency = concurrency
+        self._cubes = LRUCache(maxsize)
+
+    @property
+    def collection(self):
+        return db[CUBES_COLLECTION]
+
+    def query(self, dimensions: List[str], metrics: List[str], networks=None,
+              days=None, days_from=None, days_to=None, limit=None) -> List[dict]:
+        """
+        Metrics summed by dimensions across day collections in date range,
+        ranked by the first metric. Raises ValueError on unknown dimensions/metrics.
+        """
+
+        unknown = (set(dimensions) - DIMENSIONS.keys()) | (set(metrics) - set(METRICS))
+        if unknown:
+            raise ValueError(f"unknown dimensions or metrics: {', '.join(sorted(unknown))}")
+
+        names = get_day_names(days_from, days_to, days)
+        group_by = lambda day: self.get(day).group_by(dimensions, metrics, networks)
+        groups = fan_out(group_by, names, self.executor, self.concurrency) \
+            if self.executor and len(names) > 1 else map(group_by, names)
+
+        totals = defaultdict(lambda: np.zeros(len(metrics)))
+        for group in groups:
+            for values, sums in group.items():
+                totals[values] += sums
+
+        rank = lambda item: item[1][0] if metrics else 0
+        ranked = sorted(totals.items(), key=rank, reverse=True)
+        ints = {"posts", "videos"}
+        return [{**dict(zip(dimensions, values)),
+                 **{m: int(s) if m in ints else round(float(s), 3) for m, s in zip(metrics, sums)}}
+                for values, sums in (ranked[:limit] if limit else ranked)]
+
+    def get(self, day: str) -> PostCube:
+        """ Cube of given day, (re)built if data changed """
+
+        cube = self._cubes.get(day)
+        if cube is not None:
+            return cube
+
+        recent = RollupStore.is_recent(day)
+        fingerprint = RollupStore.fingerprint(day)
+        stored = None if recent else self.collection.find_one({"_id": day})
+        if stored and stored["fingerprint"] == fingerprint:
+            cube = PostCube.from_document(stored)
+        else:
+            cube = self.build(day)
+            if not recent:
+                self.collection.replace_one(
+                    {"_id": day}, {"fingerprint": fingerprint, **cube.to_document()}, upsert=True)
+
+        self._cubes.set(day, cube, self.ttl if recent else self.check_interval)
+        return cube
+
+    @staticmethod
+    def build(day: str) -> PostCube:
+        projection = {"_id": 0, "videos": 1, "tags": 1,
+                      f"{POST_SIBLINGS_FIELD}.score": 1, f"{POST_RELATED_FIELD}.score": 1,
+                      **{field: 1 for field in DIMENSIONS.values()}}
+        return PostCube.build(db[day].find({}, projection))
+
+
+def get_cube_store() -> CubeStore:
+    """ App-wide store of posts cubes """
+
+    app = flask.current_app
+    if "cube_store" not in app.extensions:
+        from app.database import engine
+        app.extensions["cube_store"] = CubeStore(
+            ttl=app.config["POSTS_CUBES_TTL"],
+            check_interval=app.config["POSTS_CUBES_CHECK_INTERVAL"],
+            maxsize=app.config["POSTS_CUBES_CACHE_SIZE"],
+            executor=getattr(engine, "executor", None),
+            concurrency=app.config["ENGINE_FANOUT_CONCURRENCY"])
+    return app.extensions["cube_store"]
@@ -0,0 +1,87 @@
+"""
+Streaming export of posts, as newline-delimited JSON (NDJSON).
+
+For bulk consumers (eg. model retraining jobs) pulling large date ranges.
+Rather than building the whole response in memory like the GraphQL endpoint,
+posts are streamed from a MongoDB cursor per day collection (newest day first),
+and flushed to the client in chunks of `POSTS_EXPORT_CHUNK_SIZE` posts:
+memory use stays flat regardless of the range size. Posts are encoded like
+GraphQL responses, ie. viewed as `PostView` and serialized by `JSON_ENCODER`.
+
+Takes the same filters as `mkfilter()`, eg.:
+
+    curl "localhost:5000/posts/export?type=metapost&countries=SN,CI&days_from=2021-06-01"
+"""
+import flask
+from bson.errors import InvalidId
+
+from app.database import get_collections
+from app.encoding import get_json_encoder
+from app.posts.queries import mkfilter
+from app.posts.view import PostView
+
+
+# supported query string args.
+# list args may be given several times, or as comma-separated values
+ARGS = ("type", "has_videos", "days_from", "days_to", "limit")
+LIST_ARGS = ("countries", "categories", "post_ids", "days", "fields")
+
+
+@flask.current_app.route("/posts/export", methods=["GET"])
+def export_posts():
+
+    try:
+        kwargs = parse_args(flask.request.args)
+        match = mkfilter(kwargs)
+    except (ValueError, InvalidId) as e:
+        return flask.jsonify({"error": str(e)}), 400
+
+    chunks = stream_posts(match, **kwargs) if match is not None else iter(())
+    return flask.Response(flask.stream_with_context(chunks), mimetype="application/x-ndjson")
+
+
+def parse_args(args) -> dict:
+    """ `mkfilter()` and `stream_posts()` kwargs from the request query string """
+
+    kwargs = {k: v for k, v in args.items() if k in ARGS}
+    for k in LIST_ARGS:
+        if k in args:
+            kwargs[k] = [x for v in args.getlist(k) for x in v.split(",") if x]
+    if "has_videos" in kwargs:
+        kwargs["has_videos"] = kwargs["has_videos"].lower() in ("1", "true", "yes")
+    if "limit" in kwargs:
+        kwargs["limit"] = int(kwargs["limit"])
+    return kwargs
+
+
+def stream_posts(match: dict, days=None, days_from=None, days_to=None,
+                 limit=None, fields=None, chunk_size=None, **_):
+    """
+    Yields posts matching **match** as NDJSON, in chunks of **chunk_size** posts.
+    Relations (similar posts) are not expanded, but exported as ids.
+
+    :param fields: only export these fields
+    """
+
+    chunk_size = chunk_size or flask.current_app.config["POSTS_EXPORT_CHUNK_SIZE"]
+    projection = {f: 1 for f in fields} if fields else None
+    encoder = get_json_encoder()
+
+    chunk, count = [], 0
+    for collection in get_collections(days_from, days_to, days):
+        cursor = collection.find(match, projection).sort("_id", -1).batch_size(chunk_size)
+        if limit:
+            cursor = cursor.limit(limit - count)
+
+        for post in cursor:
+            chunk.append(encoder.dumps(PostView(post)))
+            count += 1
+            if len(chunk) >= chunk_size:
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+
+        if limit and count >= limit:
+            break
+
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
@@ -0,0 +1,205 @@
+"""
+Indexes of the day collections.
+
+Declares the indexes serving the fields posts are filtered and sorted by
+(`type`, `country`, `category`, `tags`, `videos`, `_id`), creates them on every
+day collection, and checks with `explain()` that resolver queries use them.
+With `POSTS_INDEXES_AUTO`, indexes get created on new day collections as these
+appear, by a background thread checking every `POSTS_INDEXES_CHECK_INTERVAL` seconds.
+Otherwise, run `flask indexes create` as new days get scraped, eg. from cron:
+
+    flask indexes create [--day 2021-06-21]
+    flask indexes check
+    flask indexes explain [--day 2021-06-21]
+
+Nota: `type` filters can only be served by an index with `POSTS_TYPE_MATCH`
+set to "exact" or "prefix", cf. `mk_type_filter()`.
+"""
+import logging
+import sys
+import threading
+import time
+from typing import Dict, List
+
+import click
+import flask
+from bson import ObjectId
+from flask.cli import AppGroup
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from app.database import db, get_day_names
+from app.posts.constants import POST_TYPE
+
+
+logger = logging.getLogger(__name__)
+
+# every filter is followed by `_id` DESC, the order posts are returned in
+POST_INDEXES = [
+    IndexModel([(POST_TYPE, ASCENDING), ("_id", DESCENDING)], name="type__id"),
+    IndexModel([("country", ASCENDING), ("_id", DESCENDING)], name="country__id"),
+    IndexModel([("category", ASCENDING), ("_id", DESCENDING)], name="category__id"),
+    IndexModel([("tags", ASCENDING)], name="tags"),
+    IndexModel([("videos", ASCENDING)], name="videos"),
+]
+
+
+class IndexManager:
+    """
+    Creates the declared **indexes** on day collections, once per collection.
+    Day collections created since the last check are indexed by `refresh()`,
+    run every `check_interval` secs once `start()`-ed.
+    """
+
+    def __init__(self, indexes: List[IndexModel] = None, check_interval=600):
+        self.indexes = indexes or POST_INDEXES
+        self.check_interval = check_interval
+        self._indexed = set()
+        self._lock = threading.Lock()
+        self._timer = None
+
+    @property
+    def names(self) -> List[str]:
+        return [index.document["name"] for index in self.indexes]
+
+    def ensure(self, day: str) -> List[str]:
+        """ Create missing indexes on **day** collection, returns their names """
+
+        missing = self.check(day)
+        if missing:
+            db[day].create_indexes([i for i in self.indexes if i.document["name"] in missing])
+        self._indexed.add(day)
+        return missing
+
+    def check(self, day: str) -> List[str]:
+        """ Names of the declared indexes missing on **day** collection """
+
+        existing = set(db[day].index_information())
+        return [name for name in self.names if name not in existing]
+
+    def refresh(self, wait=True):
+        """ Index the day collections not indexed yet, in background unless **wait** """
+
+        def run():
+            try:
+                for day in get_day_names():
+                    if day not in self._indexed:
+                        self.ensure(day)
+            finally:
+                self._lock.release()
+
+        # at most one run at a time
+        if not self._lock.acquire(blocking=False):
+            return
+        if wait:
+            run()
+        else:
+            threading.Thread(target=run, daemon=True).start()
+
+    def start(self):
+        """ Index new day collections every `check_interval` secs, in background """
+
+        def run():
+            while True:
+                try:
+                    self.refresh()
+                except Exception:       # keep checking
+                    logger.exception("indexing new day collections failed")
+                time.sleep(self.check_interval)
+
+        if self._timer is None:
+            self._timer = threading.Thread(target=run, daemon=True)
+            self._timer.start()
+
+
+def explain_queries(day: str) -> Dict[str, List[str]]:
+    """
+    Stages of the winning plans of representative resolver queries,
+    run against **day** collection. Filter values are sampled from the collection.
+    """
+
+    from app.posts.queries import mkfilter, mk_type_filter
+
+    sample = db[day].find_one({POST_TYPE: {"$exists": True}}) or {}
+    queries = {
+        "posts(type)": mkfilter({"type": sample.get(POST_TYPE, "post")}),
+        "posts(countries)": mkfilter({"countries": [sample.get("country", "")]}),
+        "posts(categories)": mkfilter({"categories": [sample.get("category", "")]}),
+        "posts(has_videos)": mkfilter({"has_videos": True}),
+        "posts(post_ids)": mkfilter({"post_ids": [str(sample.get("_id", ObjectId()))]}),
+        "post(adjacent)": {POST_TYPE: mk_type_filter(sample.get(POST_TYPE, "post")),
+                           "_id": {"$lt": sample.get("_id", ObjectId())}},
+    }
+
+    def stages(plan: dict):
+        yield plan.get("stage")
+        for child in (plan.get("inputStage"), *plan.get("inputStages", [])):
+            if child:
+                yield from stages(child)
+
+    plans = {}
+    for name, match in queries.items():
+        explained = db[day].find(match).sort("_id", DESCENDING).explain()
+        plan = explained["queryPlanner"]["winningPlan"]
+        plans[name] = list(filter(None, stages(plan.get("queryPlan", plan))))
+    return plans
+
+
+def get_index_manager() -> IndexManager:
+    """ App-wide index manager """
+
+    app = flask.current_app
+    if "index_manager" not in app.extensions:
+        app.extensions["index_manager"] = IndexManager(
+            check_interval=app.config["POSTS_INDEXES_CHECK_INTERVAL"])
+    return app.extensions["index_manager"]
+
+
+indexes_cli = AppGroup("indexes", help="Manage indexes of the day collections.")
+
+
+@indexes_cli.command("create")
+@click.option("--day", "days", multiple=True, help="Only index given day(s).")
+def create_indexes(days):
+    """ Create the declared indexes on day collections """
+
+    manager = get_index_manager()
+    for day in get_day_names(days=list(days) or None):
+        created = manager.ensure(day)
+        click.echo(f"{day}: {', '.join(created) if created else 'up to date'}")
+
+
+@indexes_cli.command("check")
+def check_indexes():
+    """ Report day collections missing any of the declared indexes """
+
+    manager, missing = get_index_manager(), False
+    for day in get_day_names():
+        names = manager.check(day)
+        if names:
+            missing = True
+            click.echo(f"{day}: missing {', '.join(names)}")
+    sys.exit(1 if missing else 0)
+
+
+@indexes_cli.command("explain")
+@click.option("--day", help="Day collection to explain queries on, defaults to the latest.")
+def explain(day):
+    """ Report resolver queries falling back to a collection scan (COLLSCAN) """
+
+    day = day or next(iter(get_day_names()), None)
+    if not day:
+        return click.echo("no day collections")
+
+    collscan = False
+    for name, stages in explain_queries(day).items():
+        flag = "COLLSCAN" in stages
+        collscan |= flag
+        click.echo(f"{'!!' if flag else 'ok'} {name}: {' <- '.join(stages)}")
+    sys.exit(1 if collscan else 0)
+
+
+flask.current_app.cli.add_command(indexes_cli)
+
+# not on the request path, nor in tests
+if flask.current_app.config["POSTS_INDEXES_AUTO"] and not flask.current_app.testing:
+    get_index_manager().start()
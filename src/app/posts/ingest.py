@@ -0,0 +1,275 @@
+"""
+Buffered ingestion of post interactions (clicks, views), as atomic counters.
+
+Events posted to `/posts/events` are summed in memory, then flushed every
+`POSTS_EVENTS_FLUSH_INTERVAL` seconds (or once `POSTS_EVENTS_MAX_PENDING`
+distinct counters are pending) with one unordered `bulk_write` per day
+collection: a single `$inc` per post, whatever the number of events received.
+Concurrent writers (eg. several workers) hence never lose each other's counts.
+
+Counters are stored under `counters.<action>.<target>`, where target is
+`root` for the post page itself, or the (escaped) url of the link clicked
+inside the page, cf. `target_key()`. Clients authenticate with one of the
+`POSTS_EVENTS_TOKENS`, and post at most `POSTS_EVENTS_MAX_BATCH` events at once:
+
+    curl -XPOST localhost:5000/posts/events -H "Content-Type: application/json" \
+        -H "Authorization: Bearer $TOKEN" \
+        -d '[{"post": "612acbbc20abcbba8e42fd04", "action": "clicks"},
+             {"post": "612acbbc20abcbba8e42fd04", "action": "clicks", "target": "https://x.y/z"}]'
+
+At most `POSTS_EVENTS_MAX_PENDING` counters are kept pending, eg. while the
+database is unreachable: events posted meanwhile are refused (503).
+
+Nota: pending events are lost if the process gets killed before a flush.
+"""
+import hmac
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+import flask
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.database import db
+from app.posts.constants import POST_ACTIONS, POST_COUNTERS_FIELD
+from app.posts.lookup import PostLocator, get_post_locator
+from app.posts.utils import parse_post_url
+from app.utils.cache import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+# user actions counted
+COUNTER_ACTIONS = tuple(POST_ACTIONS)
+
+# target of actions on the post page itself
+ROOT_TARGET = "root"
+
+# events counting more are rejected, counters are stored as int64
+MAX_EVENT_COUNT = 2 ** 31 - 1
+
+# post -> day collection, remembered across flushes for hot posts.
+# unknown posts are remembered too (for less long), not to walk the days again
+LOCATIONS_CACHE_SIZE = 10000
+LOCATIONS_CACHE_TTL = 3600
+LOCATIONS_MISS_TTL = 600
+
+
+class EventBuffer:
+    """
+    Sums counters of post interactions in memory, by (post, action, target),
+    and flushes them to the day collections storing the posts.
+    """
+
+    def __init__(self, locator: PostLocator, flush_interval=5, max_pending=10000):
+        self.locator = locator
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[ObjectId, str, str], int] = defaultdict(int)
+        self._locations = LRUCache(LOCATIONS_CACHE_SIZE)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._wake = threading.Event()
+
+    def add(self, post_id: ObjectId, action: str, target: str = ROOT_TARGET, count=1):
+        if self._locations.get(str(post_id)) == "":     # known to not exist
+            return
+        with self._lock:
+            self._pending[post_id, action, target] += count
+            full = len(self._pending) == self.max_pending
+        self.start()
+        if full:    # flush now, rather than on next tick
+            self._wake.set()
+
+    @property
+    def full(self) -> bool:
+        """ Whether `max_pending` counters are pending, eg. as flushes keep failing """
+        return len(self._pending) >= self.max_pending
+
+    def flush(self) -> int:
+        """
+        Write pending counters, returns the count of posts updated.
+        Counters not written (eg. database unreachable) are put back, and retried
+        on next flush, cf. `restore()`. Updates rejected by the database are logged
+        and dropped.
+        """
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(int)
+
+            # post -> counters, shrinks as posts get written
+            incs = defaultdict(dict)
+            for (post_id, action, target), count in pending.items():
+                incs[post_id][action, target] = count
+
+            updated = 0
+            try:
+                # one `$inc` per post, one `bulk_write` per day collection
+                days = defaultdict(list)
+                for post_id in list(incs):
+                    day = self.locate(post_id)
+                    if day:
+                        days[day].append(post_id)
+                    else:       # unknown post, events dropped
+                        del incs[post_id]
+
+                for day, post_ids in days.items():
+                    requests = [UpdateOne({"_id": post_id}, {"$inc": {
+                        f"{POST_COUNTERS_FIELD}.{action}.{target}": count
+                        for (action, target), count in incs[post_id].items()}})
+                        for post_id in post_ids]
+                    try:
+                        db[day].bulk_write(requests, ordered=False)
+                        rejected = set()
+                    except BulkWriteError as e:
+                        rejected = {error["index"] for error in e.details.get("writeErrors", [])}
+                        logger.error("%d post events updates rejected by %s", len(rejected), day)
+                    for i, post_id in enumerate(post_ids):
+                        del incs[post_id]
+                        updated += i not in rejected
+            finally:
+                self.restore(incs)
+            return updated
+
+    def try_flush(self):
+        try:
+            self.flush()
+        except Exception:       # keep flushing
+            logger.exception("flushing post events failed")
+
+    def restore(self, incs: Dict[ObjectId, Dict[Tuple[str, str], int]]):
+        """
+        Put back counters **incs** not written, as pending.
+        Counters not pending already are dropped beyond `max_pending` counters.
+        """
+
+        dropped = 0
+        with self._lock:
+            for post_id, counters in incs.items():
+                for (action, target), count in counters.items():
+                    key = post_id, action, target
+                    if key in self._pending or len(self._pending) < self.max_pending:
+                        self._pending[key] += count
+                    else:
+                        dropped += 1
+        if dropped:
+            logger.error("%d post events counters dropped, too many pending", dropped)
+
+    def locate(self, post_id: ObjectId) -> Optional[str]:
+        """ Day collection of post **post_id**, None if no such post """
+
+        key = str(post_id)
+        day = self._locations.get(key)
+        if day is None:
+            day = self.locator.locate(post_id) or ""
+            self._locations.set(key, day, LOCATIONS_CACHE_TTL if day else LOCATIONS_MISS_TTL)
+        return day or None
+
+    def start(self):
+        """ Start the flusher thread, unless running. Flushes periodically, or once woken """
+
+        def run():
+            while True:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                self.try_flush()
+
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=run, daemon=True)
+                    self._flusher.start()
+
+    def __len__(self):
+        return len(self._pending)
+
+
+def target_key(target: str = None, post_id: str = None) -> str:
+    """
+    Counter key of an action **target**: `ROOT_TARGET` for the post page itself,
+    else the url, percent-encoded to a valid field name (no `.`, no leading `$`).
+    """
+
+    if not target or (post_id and parse_post_url(target)["id"] == post_id):
+        return ROOT_TARGET
+    return quote(target, safe="").replace(".", "%2E")
+
+
+def parse_event(event: dict) -> Tuple[ObjectId, str, str, int]:
+    """ (post id, action, target key, count) of an event. Raises ValueError """
+
+    if not isinstance(event, dict):
+        raise ValueError("events must be objects")
+    post = str(event.get("post") or "")
+    post = parse_post_url(post)["id"] or post
+    try:
+        post_id = ObjectId(post)
+    except (InvalidId, TypeError):
+        raise ValueError(f"invalid post id: {post!r}")
+
+    action = event.get("action")
+    if action not in COUNTER_ACTIONS:
+        raise ValueError(f"action must be one of {', '.join(COUNTER_ACTIONS)}")
+
+    count = event.get("count", 1)
+    if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= MAX_EVENT_COUNT:
+        raise ValueError(f"count must be a positive integer, up to {MAX_EVENT_COUNT}")
+
+    return post_id, action, target_key(event.get("target"), post), count
+
+
+def authorized(tokens) -> bool:
+    """ Whether the request bears one of **tokens**, as `Authorization: Bearer <token>` """
+
+    scheme, _, token = flask.request.headers.get("Authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and any(
+        hmac.compare_digest(token.encode(), t.encode()) for t in tokens)
+
+
+@flask.current_app.route("/posts/events", methods=["POST"])
+def ingest_events():
+
+    config = flask.current_app.config
+    if not config["POSTS_EVENTS_TOKENS"]:
+        return flask.jsonify({"error": "events ingestion is disabled"}), 403
+    if not authorized(config["POSTS_EVENTS_TOKENS"]):
+        return flask.jsonify({"error": "invalid or missing token"}), 401
+
+    data = flask.request.get_json(silent=True)
+    events = data.get("events") if isinstance(data, dict) else data
+    if not isinstance(events, list):
+        return flask.jsonify({"error": "expected a list of events"}), 400
+    if len(events) > config["POSTS_EVENTS_MAX_BATCH"]:
+        return flask.jsonify({"error": f"at most {config['POSTS_EVENTS_MAX_BATCH']} events per request"}), 413
+
+    try:
+        parsed = [parse_event(event) for event in events]
+    except ValueError as e:
+        return flask.jsonify({"error": str(e)}), 400
+
+    buffer = get_event_buffer()
+    if buffer.full:
+        return flask.jsonify({"error": "too many pending events, retry later"}), 503, \
+            {"Retry-After": str(buffer.flush_interval)}
+    for event in parsed:
+        buffer.add(*event)
+    return flask.jsonify({"accepted": len(parsed)}), 202
+
+
+def get_event_buffer() -> EventBuffer:
+    """ App-wide buffer of post events """
+
+    app = flask.current_app
+    if "event_buffer" not in app.extensions:
+        app.extensions["event_buffer"] = EventBuffer(
+            get_post_locator(),
+            flush_interval=app.config["POSTS_EVENTS_FLUSH_INTERVAL"],
+            max_pending=app.config["POSTS_EVENTS_MAX_PENDING"])
+    return app.extensions["event_buffer"]
@@ -0,0 +1,149 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from concurrent.futures import Executor
+from typing import Iterable, List, Tuple
+
+import flask
+from bson import ObjectId
+
+from app.utils.fanout import fan_out
+
+
+class RelationLoader:
+    """
+    DataLoader-style batching of docs lookups by `_id`, across day collections.
+
+    Ids wanted by a whole result set are first queued using `prime()`,
+    grouped by day collection, then fetched by `dispatch()` with a single
+    `{"_id": {"$in": [...]}}` query per collection. Fetched docs are kept in
+    a per-request cache, so that posts related to several others are fetched
+    only once.
+
+    Docs may be restricted to a projection of **fields**. Collections are queried
+    concurrently if supplied an **executor**, at most **concurrency** at once.
+
+    Usage:
+        >>> loader = get_relation_loader()
+        >>> for post in posts:
+        ...     loader.prime(post.collection, [x["_id"] for x in post["siblings"]])
+        >>> loader.dispatch()
+        >>> siblings = loader.load_many(post.collection, ids)
+    """
+
+    def __init__(self, fields: dict = None, executor: Executor = None, concurrency=4):
+        self.fields = fields
+        self.executor = executor
+        self.concurrency = concurrency
+        self._collections = {}
+        self._pending = defaultdict(set)
+        self._cache = {}
+
+    def prime(self, collection, ids: Iterable[ObjectId]):
+        """ Queue ids to fetch from given day collection on next `dispatch()` """
+
+        name = str(collection)
+        self._collections[name] = collection
+        self._pending[name].update(
+            _id for _id in ids if (name, _id) not in self._cache)
+
+    def dispatch(self):
+        """ Fetch all queued ids, one query per day collection """
+
+        pending = [(name, ids) for name, ids in self._pending.items() if ids]
+        self._pending.clear()
+
+        find = lambda item: (item, list(self._collections[item[0]].find(
+            {"_id": {"$in": list(item[1])}}, self.fields)))
+        results = fan_out(find, pending, self.executor, self.concurrency) \
+            if self.executor and len(pending) > 1 else map(find, pending)
+
+        for (name, ids), docs in results:
+            for doc in docs:
+                self._cache[(name, doc["_id"])] = doc
+
+            # also remember ids not found, not to query them again
+            for _id in ids:
+                self._cache.setdefault((name, _id), None)
+
+    def load_many(self, collection, ids: Iterable[ObjectId]) -> List[dict]:
+        """
+        Docs from given collection matching ids, in order of ids.
+        Returns the cached docs as is, read-only: callers patching docs
+        must copy them first, not to alter the docs of other callers.
+        """
+
+        name, ids = str(collection), list(ids)
+        if any((name, _id) not in self._cache for _id in ids):
+            self.prime(collection, ids)
+            self.dispatch()
+
+        docs = [self._cache[(name, _id)] for _id in ids]
+        return [d for d in docs if d is not None]
+
+
+class AdjacencyIndex:
+    """
+    In-memory ordered `_id` index of docs per (day collection, post type).
+
+    Computes previous/next docs of every post in a result set from a single
+    `_id`-only scan per (day, type), instead of issuing two sorted queries
+    for every post. Ids are kept in ascending order, ie. by insertion time.
+
+    Usage:
+        >>> index = get_adjacency_index()
+        >>> previous_ids, next_ids = index.adjacent(
+        ...     post.collection, post["type"], {"type": "metapost"}, post["_id"], 2)
+    """
+
+    def __init__(self):
+        self._ids = {}
+
+    def ordered_ids(self, collection, key, match: dict) -> List[ObjectId]:
+        """ `_id`s of docs matching **match**, scanned once per (collection, key) """
+
+        name = str(collection)
+        if (name, key) not in self._ids:
+            cursor = collection.find(match, {"_id": 1}).sort([("_id", 1)])
+            self._ids[(name, key)] = [d["_id"] for d in cursor]
+        return self._ids[(name, key)]
+
+    def __contains__(self, item):
+        """ Whether (collection, key) was scanned already """
+
+        collection, key = item
+        return (str(collection), key) in self._ids
+
+    def adjacent(self, collection, key, match: dict, _id: ObjectId, count: int) \
+            -> Tuple[List[ObjectId], List[ObjectId]]:
+        """
+        Ids of **count** docs before and after **_id**, nearest first.
+        Mimics `.find({"_id": {"$lt"|"$gt": _id}}).sort(..).limit(count)`.
+        """
+
+        ids = self.ordered_ids(collection, key, match)
+        lo, hi = bisect_left(ids, _id), bisect_right(ids, _id)
+        previous_ids = ids[max(lo - count, 0):lo][::-1]
+        next_ids = ids[hi:hi + count]
+        return previous_ids, next_ids
+
+
+def get_relation_loader(fields: dict = None) -> RelationLoader:
+    """ Relation loader bound to the current request, for given projection """
+
+    if "relation_loaders" not in flask.g:
+        flask.g.relation_loaders = {}
+    key = tuple(sorted(fields.items())) if fields else None
+    if key not in flask.g.relation_loaders:
+        from app.database import engine
+        flask.g.relation_loaders[key] = RelationLoader(
+            fields, executor=getattr(engine, "executor", None),
+            concurrency=flask.current_app.config["ENGINE_FANOUT_CONCURRENCY"])
+    return flask.g.relation_loaders[key]
+
+
+def get_adjacency_index() -> AdjacencyIndex:
+    """ Adjacency index bound to the current request """
+
+    if "adjacency_index" not in flask.g:
+        flask.g.adjacency_index = AdjacencyIndex()
+    return flask.g.adjacency_index
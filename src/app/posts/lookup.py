@@ -0,0 +1,150 @@
+"""
+Resolves post ids to the day collection storing the post,
+without walking every day collection.
+"""
+import datetime
+import threading
+import time
+from typing import Optional
+
+import flask
+from bson import ObjectId
+
+from app.database import db, get_collections, get_day_names, DAY_FORMAT
+from app.utils.bloom import BloomFilter
+
+
+# persistent `_id` -> day collection index.
+# not named after a date, hence never mistaken for a day collection.
+POST_INDEX_COLLECTION = "posts_index"
+POST_INDEX_DAY_FIELD = "day"
+
+# ids generated this long before the Bloom filter was updated may not be in it yet
+# (eg. inserted in batch by the scraper while updating the filter)
+BLOOM_SAFETY_MARGIN = 600
+
+# ids the Bloom filter is sized for, per id stored when (re)built: room for new days
+BLOOM_GROWTH = 2
+
+
+class PostLocator:
+    """
+    Locates posts by `_id`, trying in turn:
+
+    (a) a Bloom filter of all known post ids, to reject unknown ids without
+        querying. only trusted for ids older than its last update.
+        updated every **bloom_refresh** secs with the ids of new day collections
+        (and days whose count of posts changed), cf. `update_bloom()`.
+    (b) candidate days derived from the ObjectId timestamp (insertion time),
+        since posts are mostly stored in the collection of the day they were scraped.
+    (c) the persistent index collection `POST_INDEX_COLLECTION`.
+    (d) walking all day collections (newest first), as a last resort.
+        posts found this way get recorded in the index.
+
+    Single post lookups hence cost one query, whatever the number of days stored.
+    """
+
+    def __init__(self, bloom=True, bloom_refresh=3600, bloom_error_rate=0.01):
+        self.bloom_enabled = bloom
+        self.bloom_refresh = bloom_refresh
+        self.bloom_error_rate = bloom_error_rate
+        self._bloom = None
+        self._bloom_days = {}       # day -> count of posts added to the filter
+        self._bloom_updated_at = None
+        self._bloom_lock = threading.Lock()
+
+    @property
+    def index(self):
+        return db[POST_INDEX_COLLECTION]
+
+    def locate(self, _id: ObjectId) -> Optional[str]:
+        """ Name of the day collection storing post **_id**, or None """
+
+        if self._surely_absent(_id):
+            return
+
+        exists = lambda day: db[day].find_one({"_id": _id}, {"_id": 1}) is not None
+
+        candidates = self.candidate_days(_id)
+        for day in candidates:
+            if exists(day):
+                return day
+
+        entry = self.index.find_one({"_id": _id})
+        if entry and exists(entry[POST_INDEX_DAY_FIELD]):
+            return entry[POST_INDEX_DAY_FIELD]
+
+        for day in get_day_names():
+            if day not in candidates and exists(day):
+                self.index.replace_one(
+                    {"_id": _id}, {POST_INDEX_DAY_FIELD: day}, upsert=True)
+                return day
+
+    @staticmethod
+    def candidate_days(_id: ObjectId):
+        """ Day of the ObjectId timestamp (UTC) first, then neighbour days (timezones) """
+
+        day = _id.generation_time.date()
+        return [(day + datetime.timedelta(days=d)).strftime(DAY_FORMAT)
+                for d in (0, -1, 1)]
+
+    def _surely_absent(self, _id: ObjectId) -> bool:
+        """ Whether the Bloom filter guarantees post **_id** does not exist """
+
+        if not self.bloom_enabled:
+            return False
+
+        if not self._bloom_updated_at or \
+                time.time() - self._bloom_updated_at > self.bloom_refresh:
+            self.update_bloom(wait=False)
+
+        bloom, updated_at = self._bloom, self._bloom_updated_at
+        if bloom is None or \
+                _id.generation_time.timestamp() >= updated_at - BLOOM_SAFETY_MARGIN:
+            return False
+        return _id.binary not in bloom
+
+    def update_bloom(self, wait=True, rebuild=False):
+        """
+        Add the ids of day collections not in the Bloom filter yet, or whose count
+        of posts changed since added. The filter is rebuilt from scratch on demand
+        (**rebuild**), or once holding more ids than sized for. In background unless **wait**.
+        """
+
+        def update():
+            try:
+                updated_at = time.time()
+                counts = {c.name: c.estimated_document_count() for c in get_collections()}
+                bloom, days = self._bloom, dict(self._bloom_days)
+                if rebuild or bloom is None or sum(counts.values()) > bloom.capacity:
+                    bloom, days = BloomFilter(
+                        BLOOM_GROWTH * sum(counts.values()), self.bloom_error_rate), {}
+
+                # ids added in place: those of days added meanwhile are not trusted yet
+                for day, count in counts.items():
+                    if days.get(day) != count:
+                        for doc in db[day].find({}, {"_id": 1}):
+                            bloom.add(doc["_id"].binary)
+                        days[day] = count
+                self._bloom, self._bloom_days, self._bloom_updated_at = bloom, days, updated_at
+            finally:
+                self._bloom_lock.release()
+
+        # at most one update at a time
+        if not self._bloom_lock.acquire(blocking=False):
+            return
+        if wait:
+            update()
+        else:
+            threading.Thread(target=update, daemon=True).start()
+
+
+def get_post_locator() -> PostLocator:
+    """ App-wide post locator """
+
+    app = flask.current_app
+    if "post_locator" not in app.extensions:
+        app.extensions["post_locator"] = PostLocator(
+            bloom=app.config["POSTS_LOOKUP_BLOOM"] and not app.testing,
+            bloom_refresh=app.config["POSTS_LOOKUP_BLOOM_REFRESH"])
+    return app.extensions["post_locator"]
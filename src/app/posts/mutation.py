@@ -2,9 +2,10 @@ from ariadne import convert_kwargs_to_snake_case
 from bson import ObjectId
 
 from app.posts.constants import POST_STATS_FIELD
+from app.posts.lookup import get_post_locator
 from app.posts.queries import format_doc
 from app.posts.utils import parse_post_url
-from app.database import get_db, engine
+from app.database import get_db
 from app.routes import mutation
 
 db = get_db()
@@ -13,6 +14,7 @@ db = get_db()
 
 # FIXME: delete, obsolete: not posting here from service workers anymore
 #   using global script.
+#   superseded by buffered counters posted to `/posts/events`, cf. `app.posts.ingest`.
 
 # schema {
 #   query: Query
@@ -64,15 +66,13 @@ def resolve_save_stats(*_, stats=None):
         post_id = parse_post_url(url)["id"]
         if post_id:
 
-            # low level `database.find()` faster than `db.search()`
-            # TODO: factorise into `database.find_one()` cf. resolve_post()
-            items = list(engine.find(first=1, filter={"_id": ObjectId(post_id)}))
-            if not len(items):
+            # lookup the post's day collection directly, cf. resolve_post()
+            col_name = get_post_locator().locate(ObjectId(post_id))
+            if not col_name:
                 break
 
             # update post
-            col_name, _ = items[0]
-            col = get_existing_collection(col_name)
+            col = db[col_name]
             post = col.find_one_and_update(
                 {"_id": ObjectId(post_id)},
                 {"$set": {POST_STATS_FIELD: stats}}
@@ -0,0 +1,89 @@
+"""
+Relay-style cursor (keyset) pagination across day collections.
+
+Results are walked newest day first, and within a day along a sort key ending
+with `_id`. The opaque cursor of a result encodes its (day collection, sort key),
+so that the next page resumes exactly after it: older days are skipped, and the
+cursor's day is filtered with a range predicate on the sort key (instead of a
+`skip`). Every page hence costs about the same, however deep the client scrolls.
+
+https://relay.dev/graphql/connections.htm
+"""
+import base64
+import binascii
+from typing import Any, Callable, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app.database import db, get_day_names
+
+
+CURSOR_SEPARATOR = "|"
+
+# sort key of a result within its day collection, eg. (`_id`,) or (value, `_id`)
+Key = Tuple[Any, ...]
+
+
+def encode_cursor(day: str, key: Key) -> str:
+    """ Opaque cursor of the result with sort **key** in **day** collection """
+
+    raw = CURSOR_SEPARATOR.join([day, *map(str, key)])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Key]:
+    """
+    Day collection and sort key encoded by **cursor**, cf. `encode_cursor()`.
+    Keys hold ints, but for the trailing `_id`. Raises `ValueError` if malformed.
+    """
+
+    try:
+        day, *values, _id = base64.urlsafe_b64decode(cursor.encode()).decode() \
+            .split(CURSOR_SEPARATOR)
+        return day, (*map(int, values), ObjectId(_id))
+    except (binascii.Error, UnicodeDecodeError, ValueError, InvalidId):
+        raise ValueError(f"invalid cursor `{cursor}`")
+
+
+def paginate(fetch: Callable[[Any, Optional[Key], int], List[Tuple[Key, Any]]],
+             first: int, after: str = None,
+             days=None, days_from: str = None, days_to: str = None):
+    """
+    Page of **first** results following cursor **after**, across day collections.
+
+    :param fetch: fetch(collection, after, limit) returns at most **limit**
+        (key, result) pairs of collection, sorted by key DESC, with keys lower than
+        **after** if not None.
+    :returns: [(cursor, result), ...] edges, and whether more results follow.
+    """
+
+    after_day, after_key = decode_cursor(after) if after else (None, None)
+
+    edges = []
+    for day in get_day_names(days_from, days_to, days):
+        if after_day and day > after_day:
+            continue
+
+        # fetch one more than the page size, to tell whether a next page exists
+        limit = first + 1 - len(edges)
+        rows = fetch(db[day], after_key if day == after_day else None, limit)
+        edges += [(encode_cursor(day, key), result) for key, result in rows[:limit]]
+        if len(edges) > first:
+            break
+
+    return edges[:first], len(edges) > first
+
+
+def to_connection(edges: List[Tuple[str, Any]], has_next: bool, after: str = None) -> dict:
+    """ Relay connection of (cursor, node) **edges** """
+
+    return {
+        "edges": [{"cursor": cursor, "node": node} for cursor, node in edges],
+        "pageInfo": {
+            "hasNextPage": has_next,
+            "hasPreviousPage": bool(after),
+            "startCursor": edges[0][0] if edges else None,
+            "endCursor": edges[-1][0] if edges else None,
+        }
+    }
@@ -0,0 +1,119 @@
+"""
+Server-side expansion of posts, using MongoDB aggregation pipelines.
+
+Alternative to expanding posts in Python (cf. `queries.expand_docs()`):
+runs a single aggregation per day collection, which `$match`es posts, then
+`$lookup`s their similar (siblings, related) and adjacent (previous, next)
+posts from the same collection. Requires MongoDB >= 5.0 (concise `$lookup`
+syntax with `localField` and `pipeline` combined).
+
+Enabled by setting `POSTS_ENGINE="pipeline"`.
+"""
+from typing import Callable
+
+from app.database import get_collections
+from app.posts.constants import \
+    POST_SIBLINGS_FIELD, POST_RELATED_FIELD, POST_PREVIOUS_FIELD, POST_NEXT_FIELD, \
+    POST_TYPE
+
+
+RELATED_FIELDS = POST_SIBLINGS_FIELD, POST_RELATED_FIELD
+ADJACENT_FIELDS = POST_PREVIOUS_FIELD, POST_NEXT_FIELD
+
+
+def mk_posts_pipeline(collection: str, match: dict = None, limit: int = None,
+                      adjacent: int = None, fields: dict = None,
+                      related_fields=RELATED_FIELDS, embedded_fields: dict = None,
+                      type_match="regex"):
+    """
+    Aggregation pipeline that finds posts in given day collection,
+    and embeds their similar and adjacent posts (newest posts first).
+
+    Relations of embedded posts are projected away, mimicking `expand_doc()`.
+
+    :param str collection: name of the day collection
+    :param match: posts filter, cf. `mkfilter()`
+    :param limit: max posts count
+    :param adjacent: # of previous/next posts to embed with every post.
+    :param fields: projection applied to posts, once expanded.
+    :param related_fields: relations to expand, cf. `mk_expansion()`
+    :param embedded_fields: projection of the similar and adjacent posts.
+    :param type_match: how adjacent posts match the post type, cf. `mk_type_expr()`.
+    """
+
+    drop_relations = {"$project": embedded_fields or {rel: 0 for rel in RELATED_FIELDS}}
+
+    # similar posts from same collection
+    lookup_related = [{"$lookup": {
+        "from": collection, "localField": f"{rel}._id", "foreignField": "_id",
+        "pipeline": [drop_relations], "as": rel}}
+        for rel in related_fields]
+
+    # adjacent posts of same type, as `_expand_adjacent()` does:
+    # nearest first, ie. sorted by `_id` DESC (previous) or ASC (next)
+    lookup_adjacent = [{"$lookup": {
+        "from": collection, "let": {"id": "$_id", "type": f"${POST_TYPE}"},
+        "pipeline": [
+            {"$match": {"$expr": {"$and": [
+                {op: ["$_id", "$$id"]},
+                mk_type_expr(type_match)
+            ]}}},
+            {"$sort": {"_id": order}},
+            {"$limit": adjacent},
+            drop_relations],
+        "as": field}}
+        for field, op, order in zip(ADJACENT_FIELDS, ("$lt", "$gt"), (-1, 1))
+    ] if adjacent else []
+
+    # keep the looked up adjacent posts, which are not db fields
+    if fields and adjacent:
+        fields = {**fields, **{f: 1 for f in ADJACENT_FIELDS}}
+
+    return [
+        {"$match": match or {}},
+        {"$sort": {"_id": -1}},
+        *([{"$limit": limit}] if limit else []),
+        *lookup_related,
+        *lookup_adjacent,
+        *([{"$project": fields}] if fields else []),
+    ]
+
+
+def mk_type_expr(type_match="regex"):
+    """ Aggregation expression counterpart of `mk_type_filter()`, matching `$$type` """
+
+    if type_match == "exact":
+        return {"$eq": [f"${POST_TYPE}", "$$type"]}
+    if type_match == "prefix":
+        return {"$eq": [{"$indexOfBytes": [f"${POST_TYPE}", "$$type"]}, 0]}
+    return {"$regexMatch": {"input": f"${POST_TYPE}", "regex": "$$type", "options": "i"}}
+
+
+def search_posts_pipeline(days=None, days_from=None, days_to=None,
+                          limit=None, match=None, fields=None,
+                          adjacent=None, fmt_func: Callable = None,
+                          related_fields=RELATED_FIELDS, embedded_fields: dict = None,
+                          type_match="regex"):
+    """
+    Like `search_posts()`, but expands posts server-side:
+    one aggregation per day collection in date range, newest days first.
+    """
+
+    _format_doc = lambda d: d \
+        if not callable(fmt_func) else fmt_func(d)
+
+    count = 0
+    for collection in get_collections(days_from, days_to, days):
+        remaining = limit - count if limit else None
+        pipeline = mk_posts_pipeline(
+            collection.name, match, remaining, adjacent, fields,
+            related_fields=related_fields, embedded_fields=embedded_fields,
+            type_match=type_match)
+
+        # embedded docs are left as is: format func is applied to root docs only
+        for row in collection.aggregate(pipeline):
+            yield _format_doc(row)
+            count += 1
+
+        if limit and count >= limit:
+            break
@@ -1,31 +1,47 @@
-from collections import defaultdict
-from itertools import chain
+import heapq
+import re
+from collections import Counter, defaultdict
 from typing import Union, Literal, Callable, List, Tuple
+from urllib.parse import unquote
 
-import pytz as pytz
+import flask
 from ariadne import convert_kwargs_to_snake_case
-from babel.core import Locale
-from babel.numbers import get_territory_currencies
 from bson import ObjectId
 from bson.errors import InvalidId
 from daily_query.base import Doc
 
 from app.database import engine
+from app.encoding import pre_encoded
 from app.posts.constants import \
     POST_SIBLINGS_FIELD, POST_RELATED_FIELD, POST_PREVIOUS_FIELD, POST_NEXT_FIELD, \
-    POST_ACTIONS, POST_TYPE, \
+    POST_ACTIONS, POST_TYPE, POST_STATS_FIELD, POST_COUNTERS_FIELD, \
     VALUE_FIELD, NAME_FIELD, POST_FETCH_LIMIT
-from app.posts.utils import get_post_stats_for_action
+from app.posts.loaders import RelationLoader, get_relation_loader, get_adjacency_index
+from app.posts.lookup import get_post_locator
+from app.posts.pagination import paginate, to_connection
+from app.posts.pipeline import search_posts_pipeline
+from app.posts.rollups import get_rollup_store
+from app.posts.cubes import get_cube_store
+from app.posts.ingest import ROOT_TARGET
+from app.posts.utils import POST_ID_REGEX
+from app.posts.view import PostView
+from app.posts.vocabulary import get_vocabulary_store
 from app.routes import query
-from app.utils import compose
+from app.utils.countries import get_country
+from app.utils.gql import get_selection
 
 from app.utils.agg import Aggregate as Agg
 
 
+# docs of a same day and type in a result set, from which their adjacent docs
+# are computed from an `AdjacencyIndex`, rather than queried per doc
+ADJACENCY_INDEX_MIN_POSTS = 5
+
+
 @query.field("mostPublished")
 @convert_kwargs_to_snake_case
 def resolve_most_published(
-        *_, similarity: Literal['siblings', 'related'] = POST_SIBLINGS_FIELD,
+        _, info, similarity: Literal['siblings', 'related'] = POST_SIBLINGS_FIELD,
         **kwargs):
     """
     Most ranking posts by number of similar stories published.
@@ -37,45 +53,72 @@ def resolve_most_published(
     # use custom pipeline runtime instead of the default `agg_post_sum`
     # is callback for `agg_sum_to_schema` to call ie. `agg_sum(by, sum_by, **kwargs)`
     # sum_by, kwargs unused here, just for convenience
-    agg_sum = lambda by, sum_by: \
-        exec_agg_sum_pipeline(pipeline, **kwargs)
+    agg_sum = lambda by, sum_by, **_: \
+        exec_agg_sum_pipeline(pipeline, with_doc=with_doc, **kwargs)
 
     # `by` here is not used, since this func uses a custom agg_sum/pipeline.
     # this only to satisfy the runtime args checks.
     by = Agg.GroupBy.siblings
     match = mkfilter(kwargs)
+    with_doc = "doc" in get_selection(info)
+    limit = kwargs.get("limit")
 
-    # though MongoDB's `$size` op allows to count array column directly,
-    # it cannot insert the root to the results. using below trick instead
-    # https://stackoverflow.com/a/21721480.
-    #
-    # https://stackoverflow.com/a/57179240,  https://stackoverflow.com/a/25713818
-    # pipeline = [
-    #     {"$match": match},
-    #     {"$project": {"_id": 1, f"{STAT_VALUE_FIELD}": {"$size": f"${similarity}"}}},
-    #     {"$sort": {f"{STAT_VALUE_FIELD}": -1}},
-    # ]
-
-    pipeline = [
-        {"$match": match},
-        {"$project": {"_id": "$$ROOT", f"{similarity}": f"${similarity}"}},
-        {"$unwind": f"${similarity}"},
-        {"$group": {
-            "_id": "$_id",
-            f"{VALUE_FIELD}": {"$sum": 1}}},
-        {"$project": {
-            "_id": "$_id._id", f"{VALUE_FIELD}": 1,
-            "doc": "$_id" }}
-    ]
+    pipeline = mk_most_published_pipeline(match, similarity, limit)
 
     return agg_sum_to_schema(
-        by, agg_sum=agg_sum, gql_subfield=f"{NAME_FIELD}")
+        by, agg_sum=agg_sum, gql_subfield=f"{NAME_FIELD}", with_doc=with_doc)
+
+
+@query.field("mostPublishedConnection")
+@convert_kwargs_to_snake_case
+def resolve_most_published_connection(
+        _, info, similarity: Literal['siblings', 'related'] = POST_SIBLINGS_FIELD,
+        first=None, after=None, **kwargs):
+    """
+    Cursor-paginated `mostPublished`, cf. `pagination.paginate()`.
+
+    Unlike `mostPublished`, which ranks posts across the whole date range,
+    pages rank posts within every day (newest day first), by (value, `_id`) DESC:
+    a cross-day ranking cannot be resumed from a cursor without recomputing it.
+    """
+
+    match = mkfilter(kwargs)
+    if match is None:
+        return to_connection([], False)
+
+    def fetch(collection, after_key, limit):
+        pipeline = mk_most_published_pipeline(match, similarity, limit, after=after_key)
+        return [((row[VALUE_FIELD], row["_id"]), (row, collection))
+                for row in collection.aggregate(pipeline)]
+
+    edges, has_next = paginate(
+        fetch, first or flask.current_app.config["API_PAGINATION_PER_PAGE"], after,
+        days=kwargs.get("days"), days_from=kwargs.get("days_from"), days_to=kwargs.get("days_to"))
+
+    # fetch and expand root docs of the page in batch, cf. `exec_agg_sum_pipeline()`
+    docs = {}
+    if "doc" in get_selection(info).get("edges", {}).get("node", {}):
+        loader = get_relation_loader()
+        for _, (row, collection) in edges:
+            loader.prime(collection, [row["_id"]])
+        loader.dispatch()
+        for _, (row, collection) in edges:
+            found = loader.load_many(collection, [row["_id"]])
+            if found:
+                docs[row["_id"]] = Doc(collection, dict(found[0]))  # noqa
+        docs = dict(zip(docs, (p.to_dict() for p in expand_posts(list(docs.values())))))
+
+    return to_connection([(cursor, {
+        NAME_FIELD: row["_id"],
+        VALUE_FIELD: row[VALUE_FIELD],
+        **({"doc": docs[row["_id"]]} if row["_id"] in docs else {})
+    }) for cursor, (row, _) in edges], has_next, after)
 
 
 @query.field("mostOccurring")
 @convert_kwargs_to_snake_case
 def resolve_most_occurring(
-        *_, similarity: Literal['siblings', 'related'] = POST_SIBLINGS_FIELD,
+        _, info, similarity: Literal['siblings', 'related'] = POST_SIBLINGS_FIELD,
         **kwargs):
     """
     Count/Posts that harnessed the more interest across newspapers.
@@ -100,12 +143,13 @@ def resolve_most_occurring(
         else (Agg.GroupBy.siblings, Agg.SumBy.related)
 
     return agg_sum_to_schema(
-        by, sum_by=sum_by, gql_subfield=f"{NAME_FIELD}", **kwargs)
+        by, sum_by=sum_by, gql_subfield=f"{NAME_FIELD}",
+        with_doc="doc" in get_selection(info), **kwargs)
 
 
 @query.field("categoriesCounts")
 @convert_kwargs_to_snake_case
-def resolve_categories_counts(*_, **kwargs):
+def resolve_categories_counts(_, info, **kwargs):
     """
     Ordered mapping of post counts for each category
     in the input date range.
@@ -113,80 +157,151 @@ def resolve_categories_counts(*_, **kwargs):
         [{'name': 'Carburants', 'value': 2 }, ...]
     """
     return agg_sum_to_schema(
-        Agg.GroupBy.categories, gql_subfield=f"{NAME_FIELD}", **kwargs)
+        Agg.GroupBy.categories, gql_subfield=f"{NAME_FIELD}",
+        with_doc="doc" in get_selection(info), **kwargs)
 
 
 @query.field("tagsCounts")
 @convert_kwargs_to_snake_case
-def resolve_tags_counts(*_, **kwargs):
+def resolve_tags_counts(_, info, **kwargs):
     """
     Ordered mapping of post counts for each tag
     """
     return agg_sum_to_schema(
-        Agg.GroupBy.tags, gql_subfield=f"{NAME_FIELD}", **kwargs)
+        Agg.GroupBy.tags, gql_subfield=f"{NAME_FIELD}",
+        with_doc="doc" in get_selection(info), **kwargs)
 
 
 @query.field("countriesCounts")
 @convert_kwargs_to_snake_case
-def resolve_countries_counts(*_, **kwargs):
+def resolve_countries_counts(_, info, **kwargs):
     """
     Ordered mapping of post counts for each tag
     """
     def mk_country(count):
-        # FIXME: once refactored newsbot: pycountry -> python-babel,
-        #  then must have country code ==  locale.territory
-        locale = Locale.parse(f"und_{count[NAME_FIELD]}")
-        assert count[NAME_FIELD] == locale.territory
-        count["doc"] = {
-            "country_code": locale.territory,
-            "country_name": locale.get_territory_name('en'),
-            "timezone": pytz.country_timezones(locale.territory)[0],
-            "currency": get_territory_currencies(locale.territory)[0],
-            "languages": [locale.get_language_name('en')]}
+        # join against the country metadata registry, built once (and encoded once)
+        code = count[NAME_FIELD]
+        count["doc"] = pre_encoded(f"country:{code}", get_country(code))
         return count
 
     counts = agg_sum_to_schema(
-        Agg.GroupBy.countries, gql_subfield=f"{NAME_FIELD}", **kwargs)
+        Agg.GroupBy.countries, gql_subfield=f"{NAME_FIELD}", with_doc=False, **kwargs)
 
+    if "doc" not in get_selection(info):
+        return counts
     return map(mk_country, counts)
 
 
-# FIXME: deleteme: obsolete code. not using service workers on frontend anymore.
-# @query.field("stats")
+@query.field("publisherMetrics")
 @convert_kwargs_to_snake_case
-def resolve_stats(*_, from_date=None, to_date=None, limit=None, recursive=False):
+def resolve_publisher_metrics(*_, networks=None, dimensions=None, metrics=None, limit=None,
+                              **kwargs):
     """
-    Compile stats for posts matching given date range and count.
-    :returns dict: stats by action for all matched posts.
+    Metrics (posts, videos, siblings, related) of posts summed by dimensions
+    (paper, country, category, type, tag), from the per-day cubes, cf. `CubeStore`.
+    Ranked by the first metric. Eg. `publisherMetrics(dimensions: ["paper", "country"])`
+    -> [{"paper": "lequotidien", "country": "SN", "posts": 132}, ...]
 
-    Requires adding to GraphQL schema:
-        `type Query {
-            stats(from_date: String, to_date: String, limit:Int, recursive:Boolean): Stats
-        }`
+    :param networks: only posts of these papers (brands)
     """
 
-    posts = list(engine.search(
-        from_date=from_date, to_date=to_date,
-        flatten=True, limit=limit
-    ))
+    return get_cube_store().query(
+        dimensions or ["paper"], metrics or ["posts"], networks=networks, limit=limit,
+        days=kwargs.get("days"), days_from=kwargs.get("days_from"), days_to=kwargs.get("days_to"))
+
+
+@query.field("stats")
+@convert_kwargs_to_snake_case
+def resolve_stats(_, info, limit=None, recursive=False, **kwargs):
+    """
+    Stats of posts in date range, by action (eg. clicks) and target
+    (the post page itself, or links clicked inside it), most counted first.
+
+    Sums both the legacy stats entries (`stats.<action>`, one per event)
+    and the counters (`counters.<action>.<target>`, cf. `app.posts.ingest`),
+    server-side: posts themselves are never loaded.
+
+    :param limit: only the top **limit** stats per action.
+    :param recursive: also count actions on links inside post pages,
+        not only on the post pages (roots).
+    """
+
+    actions = [a for a in POST_ACTIONS if a in get_selection(info)]
+    pipeline = mk_stats_pipeline(actions, recursive)
+    rows = engine.aggregate(pipeline, days=kwargs.get("days"),
+                            days_from=kwargs.get("days_from"), days_to=kwargs.get("days_to"))
+    return merge_stats((row for row, _ in rows), actions, limit)
+
+
+def merge_stats(rows, actions: List[str], limit=None) -> dict:
+    """
+    Stats by action, most counted first, from the rows of `mk_stats_pipeline()`
+    run on every day collection.
+    """
 
-    stats = defaultdict(list)
-    for key in POST_ACTIONS:
-        action_stats = list(filter(None, map(
-            lambda p: get_post_stats_for_action(format_doc(p), key, recursive=recursive),
-            posts
-        )))
-        action_stats = list(chain.from_iterable(action_stats))
-        stats[key] += action_stats
+    # merge legacy stats and counters of the same target (counter targets are url-encoded)
+    stats = defaultdict(dict)
+    for row in rows:
+        key = row["_id"]
+        name = unquote(key["name"]) if key["counter"] and key["name"] else key["name"]
+        stat = stats[key["action"]].setdefault((key["post"], name), {
+            "post": str(key["post"]), "name": name, "root": row["root"], VALUE_FIELD: 0})
+        stat[VALUE_FIELD] += row[VALUE_FIELD]
 
-    return stats
+    # rank across all collections, since the pipeline's $sort only ranks per collection
+    rank = lambda stat: stat[VALUE_FIELD]
+    return {action: heapq.nlargest(limit, stats[action].values(), key=rank) if limit
+            else sorted(stats[action].values(), key=rank, reverse=True)
+            for action in actions}
+
+
+def mk_stats_pipeline(actions: List[str], recursive=False) -> List[dict]:
+    """
+    Pipeline counting the stats of posts, grouped by (post, action, target).
+    Stats entries on the post page itself (root) are told apart from those
+    on links inside the page by matching the post id in the entry url,
+    cf. `utils.post_id_pattern`. Root stats are grouped under name None.
+    """
+
+    root_id = lambda url: {"$let": {
+        "vars": {"m": {"$regexFind": {"input": {"$ifNull": [url, ""]},
+                                      "regex": POST_ID_REGEX}}},
+        "in": {"$arrayElemAt": ["$$m.captures", 0]}}}
+
+    entries = lambda action: [
+        # legacy stats, eg. {"on": {"name": "post/612acbbc20abcbba8e42fd04", "value": "1983"}}
+        {"$map": {"input": {"$ifNull": [f"${POST_STATS_FIELD}.{action}", []]}, "as": "s", "in": {
+            "action": action, "name": "$$s.on.name", VALUE_FIELD: 1, "counter": False,
+            "root": {"$eq": [root_id("$$s.on.name"), {"$toString": "$_id"}]}}}},
+        # counters, eg. {"root": 12, "https%3A%2F%2Fx%2Ey%2Fz": 3}
+        {"$map": {"input": {"$objectToArray": {"$ifNull": [f"${POST_COUNTERS_FIELD}.{action}", {}]}},
+                  "as": "c", "in": {
+            "action": action, "name": "$$c.k", VALUE_FIELD: "$$c.v", "counter": True,
+            "root": {"$eq": ["$$c.k", ROOT_TARGET]}}}},
+    ]
+
+    return [
+        {"$match": {"$or": [{f"{field}.{action}": {"$exists": True}}
+                            for field in (POST_STATS_FIELD, POST_COUNTERS_FIELD)
+                            for action in actions]}},
+        {"$project": {"_id": 1, "entries": {
+            "$concatArrays": [e for action in actions for e in entries(action)]}}},
+        {"$unwind": "$entries"},
+        *([] if recursive else [{"$match": {"entries.root": True}}]),
+        {"$group": {
+            "_id": {"post": "$_id", "action": "$entries.action", "counter": "$entries.counter",
+                    "name": {"$cond": ["$entries.root", None, "$entries.name"]}},
+            f"{VALUE_FIELD}": {"$sum": f"$entries.{VALUE_FIELD}"},
+            "root": {"$first": "$entries.root"}}},
+        {"$sort": {f"{VALUE_FIELD}": -1}},
+    ]
 
 
 @query.field("post")
 @convert_kwargs_to_snake_case
-def resolve_post(*_, post_id=None, adjacent=1):
+def resolve_post(_, info, post_id=None, adjacent=1):
     """
-    Find the given post across all collections (days).
+    Find the given post across all collections (days), cf. `PostLocator`.
     Embeds #adjacent_posts previous/next posts.
     :param adjacent: number of previous/next posts to insert
     :param post_id:
@@ -203,8 +318,13 @@ def resolve_post(*_, post_id=None, adjacent=1):
     except InvalidId:
         return
 
-    opts = {"match": {"_id": object_id}, "limit": 1,
-            "adjacent": adjacent}
+    # lookup the post's day collection directly
+    day = get_post_locator().locate(object_id)
+    if not day:
+        return
+
+    opts = {"match": {"_id": object_id}, "limit": 1, "days": day,
+            "adjacent": adjacent, "selection": get_selection(info)}
     posts = list(search_posts(**opts))
     if not len(posts):
         return
@@ -214,35 +334,68 @@ def resolve_post(*_, post_id=None, adjacent=1):
 
 @query.field("posts")
 @convert_kwargs_to_snake_case
-def resolve_posts(*_, **kwargs):
+def resolve_posts(_, info, **kwargs):
     """
     List of posts across all collections matching given criteria.
     """
     post_filter = mkfilter(kwargs)
     if post_filter is None:
         return []
-    posts = list(search_posts(match=post_filter, **kwargs))
+    posts = list(search_posts(match=post_filter, selection=get_selection(info), **kwargs))
     return posts
 
 
+@query.field("postsConnection")
+@convert_kwargs_to_snake_case
+def resolve_posts_connection(_, info, first=None, after=None, adjacent=None, **kwargs):
+    """
+    Cursor-paginated `posts`, newest first, cf. `pagination.paginate()`.
+    Pages hold `first` posts (defaults to `API_PAGINATION_PER_PAGE`).
+    """
+    post_filter = mkfilter(kwargs)
+    if post_filter is None:
+        return to_connection([], False)
+
+    selection = get_selection(info).get("edges", {}).get("node", {})
+    fields = mk_projection(selection)
+
+    def fetch(collection, after_key, limit):
+        match = {"$and": [post_filter, {"_id": {"$lt": after_key[-1]}}]} \
+            if after_key else post_filter
+        docs = collection.find(match, fields).sort("_id", -1).limit(limit)
+        return [((doc["_id"],), Doc(collection, doc)) for doc in docs]  # noqa
+
+    edges, has_next = paginate(
+        fetch, first or flask.current_app.config["API_PAGINATION_PER_PAGE"], after,
+        days=kwargs.get("days"), days_from=kwargs.get("days_from"), days_to=kwargs.get("days_to"))
+
+    posts = expand_posts([doc for _, doc in edges], adjacent, selection)
+    return to_connection([(cursor, post) for (cursor, _), post in zip(edges, posts)],
+                         has_next, after)
+
+
 @query.field("categories")
 @convert_kwargs_to_snake_case
-def resolve_categories(*_, **kwargs):
-    """ All categories across filtered day-collections """
-    return engine.distinct('category')
+def resolve_categories(*_, match=None, limit=None, **kwargs):
+    """ All categories across filtered day-collections, cf. `VocabularyStore` """
+    return get_vocabulary_store().values(
+        "category", match, limit,
+        days=kwargs.get("days"), days_from=kwargs.get("days_from"), days_to=kwargs.get("days_to"))
 
 
 @query.field("tags")
 @convert_kwargs_to_snake_case
-def resolve_tags(*_, **kwargs):
-    """ All tags across filtered day-collections """
-    return engine.distinct('tags')
+def resolve_tags(*_, match=None, limit=None, **kwargs):
+    """ All tags across filtered day-collections, cf. `VocabularyStore` """
+    return get_vocabulary_store().values(
+        "tags", match, limit,
+        days=kwargs.get("days"), days_from=kwargs.get("days_from"), days_to=kwargs.get("days_to"))
 
 
 def search_posts(
         days=None, days_from=None, days_to=None,
         limit=None, match=None, fields=None, exclude=None,
-        adjacent=None,
+        adjacent=None, selection=None,
 ):
     """
     Walk posts across all collections (days) in date range,
@@ -252,7 +405,8 @@ def search_posts(
       POST_SIBLINGS_FIELD, POST_RELATED_FIELD resp.
     - insert adjacent (previous and next) posts under keys:
       POST_PREVIOUS_FIELD and POST_NEXT_FIELD resp.
-    - convert `_id` of type `ObjectId` into `id` of type `str` everywhere.
+    - convert `_id` of type `ObjectId` into `id` of type `str` everywhere,
+      viewing posts as `PostView`s.
 
     Nota: search for similar and adjacent posts only in same collection
         as the referred to post: nlp tasks marks similar posts for any
@@ -265,17 +419,35 @@ def search_posts(
     :param adjacent: # of previous/next posts to also embed with every post.
         only adjacent posts of same `type` as given post will be included.
         None if should not include adjacent posts
+    :param selection: fields selected by the GraphQL query, cf. `get_selection()`.
+        only fetches the selected fields (unless **fields** is given),
+        and only expands the selected relations and adjacencies.
+
+    With `POSTS_ENGINE="pipeline"`, posts are rather expanded server-side,
+    cf. `pipeline.search_posts_pipeline()`.
 
     #TODO: better handling for POST_SIBLINGS_FIELD not found error??
     #TODO: engine.search to yield `Doc` instances directly
 
     """
 
-    for post in engine.search(
+    if fields is None and selection:
+        fields = mk_projection(selection)
+
+    if flask.current_app.config["POSTS_ENGINE"] == "pipeline" and not exclude:
+        related_fields, adjacent, embedded_fields = mk_expansion(selection, adjacent)
+        yield from search_posts_pipeline(
+            days=days, days_from=days_from, days_to=days_to, limit=limit,
+            match=match, fields=fields, adjacent=adjacent, fmt_func=PostView,
+            related_fields=related_fields, embedded_fields=embedded_fields,
+            type_match=flask.current_app.config["POSTS_TYPE_MATCH"])
+        return
+
+    posts = list(engine.search(
         flatten=True, limit=limit, match=match, fields=fields, exclude=exclude,
         days=days, days_from=days_from, days_to=days_to
-    ):
-        yield expand_post(post, adjacent)
+    ))
+    yield from expand_posts(posts, adjacent, selection)
 
 
 def expand_post(doc: Doc, adjacent=1):
@@ -292,11 +464,76 @@ def expand_post(doc: Doc, adjacent=1):
     related_fields = POST_SIBLINGS_FIELD, POST_RELATED_FIELD
     adjacent_fields = POST_PREVIOUS_FIELD, POST_NEXT_FIELD
 
-    return expand_doc(doc, related_fields, adjacent_fields, adjacent, fmt_func=format_doc)
+    return expand_doc(doc, related_fields, adjacent_fields, adjacent, fmt_func=PostView)
+
+
+def expand_posts(docs: List[Doc], adjacent=1, selection: dict = None):
+    """
+    Like `expand_post()`, for a whole result set.
+    Similar posts of all docs are fetched in batch, cf. `expand_docs()`.
+    Only expands relations and adjacencies in **selection**, if supplied.
+    """
+    related_fields, adjacent, fields = mk_expansion(selection, adjacent)
+    adjacent_fields = POST_PREVIOUS_FIELD, POST_NEXT_FIELD
+
+    return expand_docs(docs, related_fields, adjacent_fields, adjacent,
+                       fmt_func=PostView, fields=fields)
+
+
+def expand_docs(docs: List[Doc], related_fields: Tuple[str], adjacent_fields: Tuple[str],
+                adjacent=1, fmt_func: Callable = None, fields: dict = None):
+    """
+    Expands docs relations and adjacencies, cf. `expand_doc()`.
+
+    Rather than querying related docs once per relation field of every doc,
+    collects the related ids of all docs first, then fetches them with a single
+    query per day collection, using the request's `RelationLoader`.
+
+    Likewise with `POSTS_ADJACENT_MODE="index"`, previous/next ids are computed
+    for all docs from the request's `AdjacencyIndex` (one `_id` scan per day and
+    post type), then fetched in batch along with the related docs. Only done for
+    the (day, type) holding `ADJACENCY_INDEX_MIN_POSTS` docs or more, or scanned
+    already: adjacent docs of other docs are queried per doc.
+
+    :param fields: projection of the related and adjacent docs
+    """
+    docs = [d for d in docs if d]
+    loader = get_relation_loader(fields)
+
+    for doc in docs:
+        for rel in related_fields:
+            try:
+                loader.prime(doc.collection, map(lambda x: x["_id"], doc[rel]))
+            except KeyError:
+                pass
+
+    adjacent_ids = [None] * len(docs)
+    if adjacent and flask.current_app.config["POSTS_ADJACENT_MODE"] == "index":
+        index = get_adjacency_index()
+        groups = Counter((str(doc.collection), doc[POST_TYPE]) for doc in docs)
+        for i, doc in enumerate(docs):
+            post_type = doc[POST_TYPE]
+            # few posts of a (day, type): two `limit` queries per post beat a scan
+            if groups[str(doc.collection), post_type] < ADJACENCY_INDEX_MIN_POSTS \
+                    and (doc.collection, post_type) not in index:
+                continue
+            adjacent_ids[i] = index.adjacent(
+                doc.collection, post_type, {POST_TYPE: mk_type_filter(post_type)},
+                doc.data["_id"], adjacent)
+            for ids in adjacent_ids[i]:
+                loader.prime(doc.collection, ids)
+
+    loader.dispatch()
+
+    return [expand_doc(doc, related_fields, adjacent_fields, adjacent,
+                       fmt_func=fmt_func, loader=loader, adjacent_ids=ids, fields=fields)
+            for doc, ids in zip(docs, adjacent_ids)]
 
 
 def expand_doc(doc: Doc, related_fields: Tuple[str], adjacent_fields: Tuple[str],
-               adjacent=1, fmt_func: Callable = None):
+               adjacent=1, fmt_func: Callable = None, loader: RelationLoader = None,
+               adjacent_ids: Tuple[List[ObjectId], List[ObjectId]] = None,
+               fields: dict = None):
     """
     Expands in-place docs relations and adjacencies.
 
@@ -312,8 +549,14 @@ def expand_doc(doc: Doc, related_fields: Tuple[str], adjacent_fields: Tuple[str]
     :param adjacent_fields: previous and next field names as a 2-uple
     :param related_fields: fields to explode, each of which contain a `_id` key
             storing an ObjectId pointing to other docs in same collection
-    :param Callable fmt_func:
+    :param Callable fmt_func: format of the expanded doc, eg. `PostView`.
+            not applied to the embedded (related, adjacent) docs.
     :param int adjacent: count of adjacent docs to retrieve and replace
+    :param RelationLoader loader: fetch related docs through given (batching) loader,
+            instead of querying the doc's collection directly.
+    :param adjacent_ids: precomputed ids of previous and next docs as a 2-uple,
+            cf. `AdjacencyIndex`. loaded through **loader** if supplied.
+    :param fields: projection of the related and adjacent docs, if not using a loader.
     :return: same input doc, but with expanded relationships and adjacencies.
     """
     if not doc:
@@ -322,10 +565,11 @@ def expand_doc(doc: Doc, related_fields: Tuple[str], adjacent_fields: Tuple[str]
     _format_doc = lambda d: d \
         if not callable(fmt_func) else fmt_func(d)
 
-    def _drop_relations(d: Doc):
-        for x in related_fields:
-            del d[x]
-        return d
+    def _drop_relations(d: dict):
+        # copies only docs holding relations, others may be shared (loader cache)
+        if not any(x in d for x in related_fields):
+            return d
+        return {k: v for k, v in d.items() if k not in related_fields}
 
     def _expand_relations(to: Doc):
         """
@@ -334,15 +578,17 @@ def expand_doc(doc: Doc, related_fields: Tuple[str], adjacent_fields: Tuple[str]
         """
         for rel in related_fields:
             try:
-                rel_docs = list(to.collection.find({
-                    "_id": {"$in": list(map(lambda x: x["_id"], to[rel]))}, }))
+                rel_ids = list(map(lambda x: x["_id"], to[rel]))
+                rel_docs = loader.load_many(to.collection, rel_ids) if loader \
+                    else list(to.collection.find({"_id": {"$in": rel_ids}, }, fields))
 
                 # do NOT recurse, instead, drop the related fields
                 # on expanded doc for every relation
                 rel_docs = list(map(_drop_relations, rel_docs))
 
-                # optionally apply format func to expanded docs
-                to[rel] = list(map(_format_doc, rel_docs))
+                # format func is applied to the root doc only,
+                # cf. `PostView` viewing embedded docs lazily
+                to[rel] = rel_docs
             except KeyError:
                 to[rel] = []
         return to
@@ -360,10 +606,21 @@ def expand_doc(doc: Doc, related_fields: Tuple[str], adjacent_fields: Tuple[str]
                 that can be moved to `daily.mongo`
 
         """
-        if count:
+        if count and adjacent_ids:
+            adj_docs = [list(map(_drop_relations, (
+                loader.load_many(to.collection, ids) if loader else
+                to.collection.find({"_id": {"$in": ids}}, fields).sort("_id", -1 if i == 0 else 1)
+            ))) for i, ids in enumerate(adjacent_ids)]
+
+            previous_docs, next_docs = adj_docs
+            previous_field, next_field = adjacent_fields
+            to[previous_field] = previous_docs
+            to[next_field] = next_docs
+
+        elif count:
 
             _mkfilter = lambda op: \
-                {'type': {'$regex': f'{type}', '$options': 'i'},
+                {POST_TYPE: mk_type_filter(type),
                  '_id': {op: to.data["_id"]}}
 
             lookups = ({'op': '$lt', 'sort': [('_id', -1)]},
@@ -371,10 +628,9 @@ def expand_doc(doc: Doc, related_fields: Tuple[str], adjacent_fields: Tuple[str]
 
             adj_docs = []
             for lookup in lookups:
-                lookup_docs = to.collection.find(_mkfilter(lookup['op']))\
+                lookup_docs = to.collection.find(_mkfilter(lookup['op']), fields)\
                     .sort(lookup['sort']).limit(count)
-                adj_docs += [list(map(compose(
-                    _format_doc, _drop_relations), lookup_docs))]
+                adj_docs += [list(map(_drop_relations, lookup_docs))]
 
             previous_docs, next_docs = adj_docs
             previous_field, next_field = adjacent_fields
@@ -384,11 +640,108 @@ def expand_doc(doc: Doc, related_fields: Tuple[str], adjacent_fields: Tuple[str]
     # patch doc with relation fields exploded,
     # patch doc with `adjacent` adjacent docs within collection,
     _expand_relations(doc)
-    _expand_adjacent(doc, doc[POST_TYPE], adjacent)
+    if adjacent:
+        # `type` is only projected if adjacent posts are selected, cf. `mk_projection()`
+        _expand_adjacent(doc, doc[POST_TYPE], adjacent)
 
     return _format_doc(doc)
 
 
+def mk_projection(selection: dict, embedded=False):
+    """
+    MongoDB projection of the posts fields selected by a GraphQL query,
+    cf. `get_selection()`. Includes the db fields that expansions rely upon.
+
+    :param selection: tree of selected fields
+    :param embedded: whether projecting similar/adjacent posts embedded in a post.
+        relations of these are never expanded, hence not fetched.
+    """
+    related_fields = POST_SIBLINGS_FIELD, POST_RELATED_FIELD
+    adjacent_fields = POST_PREVIOUS_FIELD, POST_NEXT_FIELD
+
+    fields = {"_id": 1}
+    for f in selection:
+        if f in adjacent_fields:
+            if not embedded:
+                fields[POST_TYPE] = 1
+        elif f in related_fields and embedded:
+            continue
+        elif f not in ("id", "__typename"):
+            fields[f] = 1
+
+    return fields
+
+
+def mk_expansion(selection: dict = None, adjacent=1):
+    """
+    Expansions of posts required by a GraphQL query.
+    Returns all relations and **adjacent** unchanged if no selection is supplied.
+
+    :returns: relation fields to expand, count of adjacent posts
+        and projection of embedded (similar and adjacent) posts.
+    """
+    related_fields = POST_SIBLINGS_FIELD, POST_RELATED_FIELD
+    adjacent_fields = POST_PREVIOUS_FIELD, POST_NEXT_FIELD
+    if selection is None:
+        return related_fields, adjacent, None
+
+    related_fields = tuple(f for f in related_fields if f in selection)
+    if not any(f in selection for f in adjacent_fields):
+        adjacent = 0
+
+    embedded = {}
+    for f in (*related_fields, *adjacent_fields):
+        embedded.update(selection.get(f, {}))
+
+    return related_fields, adjacent, mk_projection(embedded, embedded=True)
+
+
+def mk_most_published_pipeline(match: dict, similarity: str, limit: int = None,
+                               after: Tuple[int, ObjectId] = None):
+    """
+    Pipeline ranking posts of a day collection by count of similar posts,
+    by (value, `_id`) DESC.
+
+    :param after: only rank posts after this (value, `_id`) key, cf. `paginate()`.
+    """
+
+    # resume strictly after the (value, _id) key of the cursor
+    keyset = [{"$match": {"$or": [
+        {f"{VALUE_FIELD}": {"$lt": after[0]}},
+        {f"{VALUE_FIELD}": after[0], "_id": {"$lt": after[1]}}
+    ]}}] if after else []
+
+    # count the array column directly using MongoDB's `$size` op.
+    # root docs are fetched by `exec_agg_sum_pipeline()`, for the top ranking posts only.
+    # every post is counted in a single collection, hence ok to `$limit` per collection.
+    # https://stackoverflow.com/a/57179240,  https://stackoverflow.com/a/25713818
+    return [
+        {"$match": match},
+        {"$project": {"_id": 1, f"{VALUE_FIELD}": {
+            "$size": {"$ifNull": [f"${similarity}", []]}}}},
+        {"$match": {f"{VALUE_FIELD}": {"$gt": 0}}},
+        *keyset,
+        {"$sort": {f"{VALUE_FIELD}": -1, "_id": -1}},
+        *([{"$limit": limit}] if limit else []),
+    ]
+
+
+def mk_type_filter(post_type: str):
+    """
+    Query filter matching posts of type **post_type**, cf. `POSTS_TYPE_MATCH`:
+    "regex" matches types containing **post_type**, case-insensitive (no index use);
+    "prefix" matches types starting with it, eg. "metapost" matches "metapost.featured";
+    "exact" matches **post_type** only. Both latter can be served by an index.
+    """
+
+    mode = flask.current_app.config["POSTS_TYPE_MATCH"]
+    if mode == "exact":
+        return post_type
+    if mode == "prefix":
+        return {'$regex': f'^{re.escape(post_type)}'}
+    return {'$regex': f'{post_type}', '$options': 'i'}
+
+
 def mkfilter(kwargs):
     """
     Generate a MongoDB posts query filter from kwargs
@@ -400,8 +753,7 @@ def mkfilter(kwargs):
     # https://stackoverflow.com/a/52018277
     post_type = kwargs.pop('type', None)
     if post_type:
-        post_filter.update({'type': {
-            '$regex': f'{post_type}', '$options': 'i'}})
+        post_filter.update({POST_TYPE: mk_type_filter(post_type)})
 
     has_videos = kwargs.pop('has_videos', None)
     if has_videos:
@@ -442,7 +794,7 @@ def mkfilter(kwargs):
 #
 
 
-def agg_post_sum(by: Agg.GroupBy, sum_by: Agg.SumBy = Agg.SumBy.count, **kwargs):
+def agg_post_sum(by: Agg.GroupBy, sum_by: Agg.SumBy = Agg.SumBy.count, with_doc=True, **kwargs):
     """
     Runs the default aggregation pipeline, which sums or counts posts grouped by
     a given column. Column is specified as one of the field paths stored in the
@@ -453,11 +805,19 @@ def agg_post_sum(by: Agg.GroupBy, sum_by: Agg.SumBy = Agg.SumBy.count, **kwargs)
 
         eg. {"Politique": 322, "Culture": 153, ...}
 
+    :param with_doc: whether to also fetch the doc grouped by, if it is a post.
     """
     # TODO: move func to `daily_query.mongo.py`.
     #   this code must stay engine agnostic
 
+    # serve counts from precomputed per-day rollups whenever possible
+    if flask.current_app.config["POSTS_ROLLUPS"] and \
+            get_rollup_store().is_eligible(by, sum_by, kwargs):
+        return exec_agg_sum_pipeline(
+            None, rows=get_rollup_store().aggregate(by, **kwargs), limit=kwargs.get("limit"))
+
     unwind, relation = Agg.extract_fields(by)
+    limit = kwargs.get("limit")
 
     match = mkfilter(kwargs)    # <- FIXME: this alters kwargs. is desirable?
     match_filter = [{"$match": match}] if match else []
@@ -468,17 +828,13 @@ def agg_post_sum(by: Agg.GroupBy, sum_by: Agg.SumBy = Agg.SumBy.count, **kwargs)
         "path": f"${unwind}", "preserveNullAndEmptyArrays": True}}
     ] if unwind else []
 
-    # also expand groupby field if it is a foreign key to self
-    # performs a SQL self-join using aka. $lookup
-    inflate_doc = lambda collection: [
-        {"$lookup": {
-            "from": str(collection), "localField": "_id",
-            "foreignField": f"_id", "as": f"doc"}},
-        {"$unwind": f"$doc"}
-    ] if relation else []
+    # groupby field that is a foreign key to self (ie. a relation) refers to docs
+    # of same collection: sums are final per collection, hence ok to `$limit` early.
+    # also, such docs get fetched by `exec_agg_sum_pipeline()` for the top K rows only.
+    limit_relation = [{"$limit": limit}] if relation and limit else []
 
     # https://mongoplayground.net/p/8WYDmj740WF
-    pipeline = lambda collection: [
+    pipeline = [
         *match_filter,
         *unwind_relation,
         {"$group": {
@@ -486,20 +842,31 @@ def agg_post_sum(by: Agg.GroupBy, sum_by: Agg.SumBy = Agg.SumBy.count, **kwargs)
             f"{VALUE_FIELD}": {"$sum": 1 if sum_by == Agg.SumBy.count
                                 else f"${sum_by.value}"}
         }},
-        *inflate_doc(collection),
         {"$sort": {f"{VALUE_FIELD}": -1}},
-        {"$project": {"_id": 1, f"{VALUE_FIELD}": 1, "doc": 1}}
+        *limit_relation,
+        {"$project": {"_id": 1, f"{VALUE_FIELD}": 1}}
     ]
 
-    return exec_agg_sum_pipeline(pipeline, **kwargs)
+    return exec_agg_sum_pipeline(pipeline, with_doc=bool(relation and with_doc), **kwargs)
 
 
-def exec_agg_sum_pipeline(pipeline, **kwargs):
-    """ Run MongoDB pipeline """
+def exec_agg_sum_pipeline(pipeline, rows=None, limit=None, with_doc=False, **kwargs):
+    """
+    Run MongoDB pipeline, and merge results across all collections.
+
+    :param rows: precomputed (row, collection) pairs to merge instead
+        of running the pipeline, eg. per-day rollups (cf. `RollupStore`).
+    :param limit: only keep the top **limit** rows (ranked by sum).
+    :param with_doc: whether rows are grouped by post `_id`, and to fetch these
+        posts as root docs. only done for the top **limit** rows.
+    """
 
     results = defaultdict(lambda: defaultdict(int))
 
-    for row, collection in engine.aggregate(pipeline, **kwargs):
+    if rows is None:
+        rows = engine.aggregate(pipeline, **kwargs)
+
+    for row, collection in rows:
 
         count = row[VALUE_FIELD]
         by_value = row["_id"]
@@ -511,15 +878,34 @@ def exec_agg_sum_pipeline(pipeline, **kwargs):
             results[by_value]["sum"] += count
             if "doc" in row:
                 results[by_value]["doc"] = Doc(collection, row['doc']) # noqa
+            elif with_doc:
+                results[by_value]["collection"] = collection
 
     # fix for ranking by value DESC across the entire dataset (all collections),
-    # since the pipeline's $sort does this only per collection
-    results = dict(sorted(results.items(),
-                          key=lambda item: item[1]["sum"], reverse=True))
+    # since the pipeline's $sort does this only per collection.
+    # selects the top K rows using a bounded heap, rather than sorting all rows.
+    rank = lambda item: item[1]["sum"]
+    results = dict(heapq.nlargest(limit, results.items(), key=rank) if limit
+                   else sorted(results.items(), key=rank, reverse=True))
+
+    # materialise root docs for final rows only, fetched in batch
+    if with_doc:
+        loader = get_relation_loader()
+        for by_value, v in results.items():
+            if "collection" in v:
+                loader.prime(v["collection"], [by_value])
+        loader.dispatch()
+        for by_value, v in results.items():
+            if "collection" in v:
+                collection = v.pop("collection")
+                docs = loader.load_many(collection, [by_value])
+                if docs:
+                    v["doc"] = Doc(collection, dict(docs[0]))  # noqa
     return results
 
 
-def agg_sum_to_schema(by, sum_by=Agg.SumBy.count, agg_sum=agg_post_sum, gql_subfield=None, **kwargs):
+def agg_sum_to_schema(by, sum_by=Agg.SumBy.count, agg_sum=agg_post_sum, gql_subfield=None,
+                      with_doc=True, **kwargs):
     """ Adapt results from `agg_post_sum()` to an array of dicts
         suitable for returning as the GraphQL type `DocStat` (aggregate).
 
@@ -536,18 +922,27 @@ def agg_sum_to_schema(by, sum_by=Agg.SumBy.count, agg_sum=agg_post_sum, gql_subf
               { "data": {  "categoriesCounts": [
                     {"category": "Politique", "postsCount": 1}, ...
               ]}}
+
+        :param with_doc: whether the `doc` subfield is queried. skips fetching
+            and expanding root docs altogether otherwise.
     """
-    results = agg_sum(by, sum_by, **kwargs)
+    results = agg_sum(by, sum_by, with_doc=with_doc, **kwargs)
+
+    # expand all root docs at once, batching their relations lookups
+    docs = iter(expand_posts([v["doc"] for v in results.values() if v.get("doc")]))
     results = [{
         gql_subfield or by.name: k,
         VALUE_FIELD: v["sum"],
-        **({"doc": expand_post(v.get("doc"))} if v.get("doc") else {})
+        **({"doc": next(docs).to_dict()} if v.get("doc") else {})
     } for k, v in results.items()]
     return results
 
 
 def format_doc(post, delete_fields=[]):
-    """ Format post raw db data. """
+    """
+    Format post raw db data, as a copy.
+    Resolvers rather view posts without copying them, cf. `PostView`.
+    """
 
     # convert `bson.ObjectId` to str
     p = {'id': str(post['_id']), **post}
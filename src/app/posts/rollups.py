@@ -0,0 +1,226 @@
+"""
+Incrementally maintained, precomputed per-day post counts.
+
+Counting posts by category, tag or country over months of data would run a
+`$unwind`/`$group` pipeline over every day collection on every request, while
+past days almost never change. Rather, counts are precomputed once per day,
+group-by field and filters, stored in the `ROLLUPS_COLLECTION` collection,
+and merged at query time. Only days whose data changed get recomputed.
+
+Rollups are only maintained for the `POSTS_ROLLUPS_TYPES` post types (or no type),
+other type filters get counted by running the pipeline.
+
+Posts of past days edited in place (eg. tags rewritten by NLP tasks) go unnoticed
+by the fingerprint of their day. Once done editing, bump the revision of the day,
+so that its rollups (and cubes, vocabularies) get recomputed on their next check:
+
+    flask rollups invalidate --day 2021-06-21
+"""
+import datetime
+import threading
+import time
+
+import click
+import flask
+from flask.cli import AppGroup
+
+from app.database import db, get_day_names, DAY_FORMAT
+from app.posts.constants import POST_TYPE, VALUE_FIELD
+from app.utils.agg import Aggregate as Agg
+from app.utils.fanout import fan_out
+
+
+# not named after a date, hence never mistaken for a day collection
+ROLLUPS_COLLECTION = "posts_rollups"
+
+# revisions of day collections, bumped by `RollupStore.invalidate()`
+REVISIONS_COLLECTION = "posts_revisions"
+
+# group-by fields rollups are maintained for
+ROLLUP_GROUP_BYS = (Agg.GroupBy.categories, Agg.GroupBy.tags, Agg.GroupBy.countries)
+
+# query filters that rollups can serve, cf. `mkfilter()`.
+# `countries` and `categories` are rollup dimensions, filtered upon at merge time.
+ROLLUP_FILTERS = {"type", "has_videos", "countries", "categories"}
+
+COUNTRY_FIELD = Agg.GroupBy.countries.value
+CATEGORY_FIELD = Agg.GroupBy.categories.value
+
+
+class RollupStore:
+    """
+    Per-day rollups of posts counts, keyed by
+    (day, group-by field, type, has_videos) and holding counts by
+    (group-by value, country, category).
+
+    Rollups of recent days (today, yesterday), which still receive posts and
+    NLP updates, are recomputed every `ttl` seconds. Rollups of past days are
+    checked every `check_interval` seconds, and only recomputed when their
+    fingerprint (count, newest `_id` and revision of the day collection) changed.
+
+    Days are checked (and computed) concurrently on **executor** if supplied,
+    at most **concurrency** at once, cf. `fan_out()`.
+    """
+
+    def __init__(self, ttl=60, check_interval=3600, types=(), executor=None, concurrency=4):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.types = frozenset(types)
+        self.executor = executor
+        self.concurrency = concurrency
+        self._rollups = {}
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        return db[ROLLUPS_COLLECTION]
+
+    def is_eligible(self, by: Agg.GroupBy, sum_by: Agg.SumBy, kwargs: dict) -> bool:
+        """ Whether counts can be computed from rollups, given the query's filters """
+
+        filters = {k for k, v in kwargs.items() if v is not None} \
+            - {"days", "days_from", "days_to", "limit"}
+        return by in ROLLUP_GROUP_BYS and sum_by == Agg.SumBy.count \
+            and filters <= ROLLUP_FILTERS \
+            and (not kwargs.get("type") or kwargs["type"] in self.types)
+
+    def aggregate(self, by: Agg.GroupBy, type=None, has_videos=None,
+                  countries=None, categories=None,
+                  days=None, days_from=None, days_to=None, **_):
+        """
+        Like `engine.aggregate()` running the `agg_post_sum()` pipeline,
+        ie. yields (row, collection) with posts counts per day collection,
+        but computed from the rollups.
+        """
+
+        # mimic `mkfilter()`, which drops all filters on empty lists
+        if countries == [] or categories == []:
+            type = has_videos = countries = categories = None
+        countries = set(countries) if countries else None
+        categories = set(categories) if categories else None
+
+        get = lambda day: (day, self.get(day, by, type, bool(has_videos)))
+        days = get_day_names(days_from, days_to, days)
+        results = fan_out(get, days, self.executor, self.concurrency) \
+            if self.executor and len(days) > 1 else map(get, days)
+
+        for day, rows in results:
+            counts = {}
+            for row in rows:
+                if countries and row[COUNTRY_FIELD] not in countries:
+                    continue
+                if categories and row[CATEGORY_FIELD] not in categories:
+                    continue
+                counts[row["_id"]] = counts.get(row["_id"], 0) + row[VALUE_FIELD]
+
+            for key, count in counts.items():
+                yield {"_id": key, VALUE_FIELD: count}, db[day]
+
+    def get(self, day: str, by: Agg.GroupBy, type=None, has_videos=False) -> list:
+        """ Rollup rows of given day, (re)computed if data changed """
+
+        key = "|".join((day, by.name, type or "", str(int(has_videos))))
+        rows, checked_at = self._rollups.get(key, (None, 0))
+
+        recent = self.is_recent(day)
+        interval = self.ttl if recent else self.check_interval
+        if rows is not None and time.time() - checked_at < interval:
+            return rows
+
+        fingerprint = self.fingerprint(day)
+        stored = None if recent else self.collection.find_one({"_id": key})
+        if stored and stored["fingerprint"] == fingerprint:
+            rows = stored["rows"]
+        else:
+            rows = self.compute(day, by, type, has_videos)
+            self.collection.replace_one({"_id": key}, {
+                "day": day, "by": by.name, POST_TYPE: type, "has_videos": has_videos,
+                "fingerprint": fingerprint, "rows": rows}, upsert=True)
+
+        with self._lock:
+            self._rollups[key] = rows, time.time()
+        return rows
+
+    @staticmethod
+    def compute(day: str, by: Agg.GroupBy, type=None, has_videos=False) -> list:
+        """ Count posts of day by (group-by value, country, category) """
+
+        from app.posts.queries import mkfilter
+        match = mkfilter({"type": type, "has_videos": has_videos})
+        unwind, _ = Agg.extract_fields(by)
+
+        pipeline = [
+            *([{"$match": match}] if match else []),
+            *([{"$unwind": {"path": f"${unwind}", "preserveNullAndEmptyArrays": True}}]
+              if unwind else []),
+            {"$group": {
+                "_id": {"key": f"${by.value}", "country": f"${COUNTRY_FIELD}",
+                        "category": f"${CATEGORY_FIELD}"},
+                f"{VALUE_FIELD}": {"$sum": 1}}},
+        ]
+
+        return [{"_id": row["_id"].get("key"),
+                 COUNTRY_FIELD: row["_id"].get("country"),
+                 CATEGORY_FIELD: row["_id"].get("category"),
+                 VALUE_FIELD: row[VALUE_FIELD]}
+                for row in db[day].aggregate(pipeline)]
+
+    @staticmethod
+    def fingerprint(day: str) -> list:
+        """
+        Changes whenever posts get added to or removed from the day collection,
+        or the day gets invalidated, cf. `invalidate()`.
+        """
+
+        newest = list(db[day].find({}, {"_id": 1}).sort("_id", -1).limit(1))
+        revision = db[REVISIONS_COLLECTION].find_one({"_id": day}) or {}
+        return [db[day].estimated_document_count(), newest[0]["_id"] if newest else None,
+                revision.get("revision", 0)]
+
+    @staticmethod
+    def invalidate(day: str):
+        """
+        Bump the revision of day, eg. once its posts got edited in place.
+        Its rollups, cubes and vocabularies are recomputed by every worker
+        on their next check, cf. `check_interval`.
+        """
+
+        db[REVISIONS_COLLECTION].update_one({"_id": day}, {"$inc": {"revision": 1}}, upsert=True)
+
+    @staticmethod
+    def is_recent(day: str) -> bool:
+        """ Whether day may still receive posts """
+
+        yesterday = datetime.datetime.utcnow().date() - datetime.timedelta(days=1)
+        return day >= yesterday.strftime(DAY_FORMAT)
+
+
+def get_rollup_store() -> RollupStore:
+    """ App-wide rollup store """
+
+    app = flask.current_app
+    if "rollup_store" not in app.extensions:
+        from app.database import engine
+        app.extensions["rollup_store"] = RollupStore(
+            ttl=app.config["POSTS_ROLLUPS_TTL"],
+            check_interval=app.config["POSTS_ROLLUPS_CHECK_INTERVAL"],
+            types=app.config["POSTS_ROLLUPS_TYPES"],
+            executor=getattr(engine, "executor", None),
+            concurrency=app.config["ENGINE_FANOUT_CONCURRENCY"])
+    return app.extensions["rollup_store"]
+
+
+rollups_cli = AppGroup("rollups", help="Manage precomputed stats of the day collections.")
+
+
+@rollups_cli.command("invalidate")
+@click.option("--day", "days", multiple=True, required=True, help="Day(s) whose posts were edited.")
+def invalidate(days):
+    """ Recompute rollups, cubes and vocabularies of given days """
+
+    for day in days:
+        RollupStore.invalidate(day)
+        click.echo(f"{day}: invalidated")
+
+
+flask.current_app.cli.add_command(rollups_cli)
@@ -7,6 +7,8 @@ import re
 POST_ENTITY_NAME = 'post'
 
 post_id_pattern = re.compile(f"(?<={POST_ENTITY_NAME}\/)\w*")
+# same, as a MongoDB regex capturing the post id, cf. `mk_stats_pipeline()`
+POST_ID_REGEX = f"{POST_ENTITY_NAME}/(\\w*)"
 
 
 # FUNCS
@@ -0,0 +1,58 @@
+"""
+Lightweight, read-only views of posts as fetched from the database.
+
+Posts used to be copied into new dicts (`format_doc()`) only to rename `_id`
+into `id`, once per post and once per similar or adjacent post embedded.
+`PostView` rather wraps the decoded document as is: `id` is computed when
+read, and embedded posts (relations) get wrapped only when a resolver reads
+them. No copy is made, and views only hold a reference to their document.
+"""
+from collections.abc import Mapping
+
+from app.posts.constants import \
+    POST_SIBLINGS_FIELD, POST_RELATED_FIELD, POST_PREVIOUS_FIELD, POST_NEXT_FIELD
+
+
+# fields embedding other posts, viewed as posts in turn
+EMBEDDED_FIELDS = frozenset((POST_SIBLINGS_FIELD, POST_RELATED_FIELD,
+                             POST_PREVIOUS_FIELD, POST_NEXT_FIELD))
+
+
+class PostView(Mapping):
+    """
+    Post **doc** (a dict or a `Doc`), exposing `_id` as `id` (str).
+    Embedded posts are returned as views too.
+    """
+
+    __slots__ = ("_doc",)
+
+    def __init__(self, doc):
+        self._doc = doc
+
+    def __getitem__(self, key):
+        if key == "id":
+            return str(self._doc["_id"])
+        if key == "_id":
+            raise KeyError(key)
+
+        value = self._doc[key]
+        if key in EMBEDDED_FIELDS and isinstance(value, list):
+            return [v if isinstance(v, PostView) else PostView(v) for v in value]
+        return value
+
+    def __iter__(self):
+        for key in self._doc.keys():
+            yield "id" if key == "_id" else key
+
+    def __len__(self):
+        return len(self._doc.keys())
+
+    def __repr__(self):
+        return f"PostView({self._doc!r})"
+
+    def to_dict(self) -> dict:
+        """ Copy as a plain dict, embedded posts included. eg. to serialize as JSON """
+
+        return {key: [v.to_dict() for v in value] if key in EMBEDDED_FIELDS
+                and isinstance(value, list) else value
+                for key, value in self.items()}
@@ -0,0 +1,176 @@
+"""
+Incrementally maintained vocabularies: distinct categories and tags per day.
+
+Rather than running `distinct` over every day collection on every request,
+the distinct values of every day are computed once, stored in the
+`VOCABULARY_COLLECTION` collection, and merged in memory at query time.
+Like rollups (cf. `RollupStore`), only recent days get recomputed on a short
+interval; past days are recomputed only when their fingerprint changed.
+Queries not bounded by days only merge the newest `POSTS_VOCABULARY_MAX_DAYS` days.
+"""
+import re
+import threading
+import time
+from typing import FrozenSet, Iterable, List, Union
+
+import flask
+from graphql import GraphQLError
+
+from app.database import db, get_day_names
+from app.posts.rollups import RollupStore
+from app.utils.fanout import fan_out
+
+
+# not named after a date, hence never mistaken for a day collection
+VOCABULARY_COLLECTION = "posts_vocabulary"
+
+# post fields vocabularies are maintained for
+VOCABULARY_FIELDS = ("category", "tags")
+
+# longest `$regex` pattern accepted from clients
+MAX_PATTERN_LENGTH = 100
+
+
+class VocabularyStore:
+    """
+    Per-day sets of the distinct values of post fields, keyed by (day, field).
+
+    Vocabularies of recent days (today, yesterday) are recomputed every `ttl`
+    seconds. Those of past days are checked every `check_interval` seconds,
+    and only recomputed if the day collection changed.
+
+    Days are checked (and computed) concurrently on **executor** if supplied,
+    at most **concurrency** at once, cf. `fan_out()`. Without day bounds,
+    only the newest **max_days** days are merged.
+    """
+
+    def __init__(self, ttl=60, check_interval=3600, max_days=90, executor=None, concurrency=4):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.max_days = max_days
+        self.executor = executor
+        self.concurrency = concurrency
+        self._vocabularies = {}
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        return db[VOCABULARY_COLLECTION]
+
+    def values(self, field: str, match: Union[str, dict] = None, limit: int = None,
+               days=None, days_from=None, days_to=None) -> List[str]:
+        """
+        Distinct values of **field** across day collections in date range,
+        sorted, filtered by **match** (cf. `mk_matcher()`) and truncated to **limit**.
+        """
+
+        names = get_day_names(days_from, days_to, days)
+        if not days and not days_from:
+            names = names[:self.max_days]
+
+        get = lambda day: self.get(day, field)
+        vocabularies = fan_out(get, names, self.executor, self.concurrency) \
+            if self.executor and len(names) > 1 else map(get, names)
+        union = set().union(*vocabularies)
+
+        matches = mk_matcher(match)
+        values = sorted(v for v in union if matches(v))
+        return values[:limit] if limit else values
+
+    def get(self, day: str, field: str) -> FrozenSet[str]:
+        """ Distinct values of field on given day, (re)computed if data changed """
+
+        key = f"{day}|{field}"
+        values, checked_at = self._vocabularies.get(key, (None, 0))
+
+        recent = RollupStore.is_recent(day)
+        interval = self.ttl if recent else self.check_interval
+        if values is not None and time.time() - checked_at < interval:
+            return values
+
+        fingerprint = RollupStore.fingerprint(day)
+        stored = None if recent else self.collection.find_one({"_id": key})
+        if stored and stored["fingerprint"] == fingerprint:
+            values = frozenset(stored["values"])
+        else:
+            values = self.compute(day, field)
+            self.collection.replace_one({"_id": key}, {
+                "day": day, "field": field,
+                "fingerprint": fingerprint, "values": sorted(values)}, upsert=True)
+
+        with self._lock:
+            self._vocabularies[key] = values, time.time()
+        return values
+
+    @staticmethod
+    def compute(day: str, field: str) -> FrozenSet[str]:
+        """ Distinct values of field on day. array fields (eg. `tags`) are unwound """
+
+        return frozenset(v for v in db[day].distinct(field) if isinstance(v, str) and v)
+
+
+def mk_matcher(match: Union[str, dict, Iterable[str], None]):
+    """
+    Predicate on vocabulary values, from the `match` argument of queries:
+
+    - "sport": values containing "sport", case insensitive
+    - {"$regex": "^foot", "$options": "i"}: values starting with "foot", cf. `mk_regex()`
+    - {"$in": [...]}, {"$nin": [...]}: values (not) in the list
+    - ["a", "b"]: values in the list
+    """
+
+    if not match:
+        return lambda value: True
+    if isinstance(match, str):
+        match = {"$regex": re.escape(match), "$options": "i"}
+    elif not isinstance(match, dict):
+        match = {"$in": list(match)}
+
+    tests = []
+    if "$regex" in match:
+        regex = mk_regex(match["$regex"], match.get("$options", ""))
+        tests.append(lambda value: regex.search(value))
+    if "$in" in match:
+        included = set(match["$in"])
+        tests.append(lambda value: value in included)
+    if "$nin" in match:
+        excluded = set(match["$nin"])
+        tests.append(lambda value: value not in excluded)
+
+    return lambda value: all(test(value) for test in tests)
+
+
+def mk_regex(pattern: str, options: str = ""):
+    """
+    Compile a `$regex` **pattern** sent by clients. Only literal substrings
+    are supported, optionally anchored as prefixes (`^`), metacharacters escaped
+    with `\\`: arbitrary patterns could backtrack for ever (eg. `(a+)+$`).
+    Raises `GraphQLError` otherwise.
+    """
+
+    if not isinstance(pattern, str) or len(pattern) > MAX_PATTERN_LENGTH:
+        raise GraphQLError(f"`$regex` must be a string of at most {MAX_PATTERN_LENGTH} chars")
+
+    prefix = pattern.startswith("^")
+    literal = re.sub(r"\\(\W)", "", pattern[prefix:])
+    if re.search(r"[.^$*+?{}\[\]|()\\]", literal):
+        raise GraphQLError(f"unsupported `$regex`: {pattern!r}, only substrings "
+                           f"and prefixes (`^`) are supported, escape special chars with `\\`")
+
+    flags = re.IGNORECASE if "i" in (options or "") else 0
+    return re.compile(pattern, flags)
+
+
+def get_vocabulary_store() -> VocabularyStore:
+    """ App-wide vocabulary store """
+
+    app = flask.current_app
+    if "vocabulary_store" not in app.extensions:
+        from app.database import engine
+        app.extensions["vocabulary_store"] = VocabularyStore(
+            ttl=app.config["POSTS_VOCABULARY_TTL"],
+            check_interval=app.config["POSTS_VOCABULARY_CHECK_INTERVAL"],
+            max_days=app.config["POSTS_VOCABULARY_MAX_DAYS"],
+            executor=getattr(engine, "executor", None),
+            concurrency=app.config["ENGINE_FANOUT_CONCURRENCY"])
+    return app.extensions["vocabulary_store"]
@@ -1,9 +1,17 @@
+import json
 import os.path
 
 import flask
-from ariadne import graphql_sync, make_executable_schema, load_schema_from_path, gql, ObjectType
+from ariadne import make_executable_schema, load_schema_from_path, gql, ObjectType, format_error
 from ariadne.constants import PLAYGROUND_HTML
 from flask import Blueprint
+from graphql import GraphQLError
+
+from app.cache import get_response_cache, is_query
+from app.documents import DocumentCache, get_document_cache, get_persisted_queries, \
+    graphql_cached
+from app.encoding import get_json_encoder
+from app.utils.countries import get_countries
 
 
 # ObjectType instances mapping to schema's Query and Mutation.
@@ -41,26 +49,128 @@ def load_schema(path: str):
 
 schema = load_schema(f"{os.path.dirname(__file__)}/schema.graphql")
 
+# load the registry of persisted queries, and country metadata at startup
+get_persisted_queries()
+get_countries()
+
 
 @flask.current_app.route("/graphql", methods=["GET"])
 def graphql_playground():
-    return PLAYGROUND_HTML, 200
+
+    # queries sent over GET (eg. persisted queries, by hash) are executed,
+    # hence cacheable at the HTTP layer. Otherwise, serve the playground.
+    args = flask.request.args
+    if "query" not in args and "extensions" not in args:
+        return PLAYGROUND_HTML, 200
+
+    try:
+        data = {k: json.loads(v) if k in ("variables", "extensions") else v
+                for k, v in args.items()}
+    except ValueError:
+        return flask.jsonify({"errors": [{"message": "malformed GET parameters"}]}), 400
+    return execute(data, method="GET")
 
 
 @flask.current_app.route("/graphql", methods=["POST"])
 def graphql_server():
-
-    # GraphQL queries are always sent as POST
-    data = flask.request.get_json()
+    return execute(flask.request.get_json(), method="POST")
+
+
+def execute(data: dict, method="POST"):
+    """ Run GraphQL request **data**, through the response cache """
+
+    # resolve persisted queries, by hash
+    try:
+        data = get_persisted_queries().resolve(data)
+    except GraphQLError as error:
+        return flask.jsonify({"errors": [format_error(error)]}), 400
+
+    documents = get_document_cache()
+    if method == "GET" and not is_get_allowed(data, documents):
+        return flask.jsonify({"errors": [{"message": "only queries can be sent over GET"}]}), 405
+
+    # estimate the query cost: reject, or downgrade queries over budget
+    from app.cost import get_cost_analyser
+    analyser = get_cost_analyser()
+    if analyser and isinstance(data, dict) and isinstance(data.get("query"), str):
+        try:
+            flask.g.query_cost = analyser.check(
+                documents.parse(data["query"]), data.get("variables"), data.get("operationName"))
+        except GraphQLError as error:
+            return flask.jsonify({"errors": [format_error(error)]}), 400
+
+    # serve identical queries from the response cache
+    cache = get_response_cache()
+    key, ttl = cache.entry(data) if cache else \
+        (None, flask.current_app.config["RESPONSE_CACHE_TTL_TODAY"])
+    cached = cache.get_key(key) if key else None
+    if cached is not None:
+        response = flask.Response(cached, 200, mimetype="application/json")
+        return with_cache_control(response, method, ttl)
+
+    # resolvers may embed pre-encoded values, cf. `pre_encoded()`
+    encoder = flask.g.json_encoder = get_json_encoder()
 
     # Note: Passing the request to the context is optional.
     # In Flask, the current request is always accessible as flask.request
-    success, result = graphql_sync(
+    success, result = graphql_cached(
         schema,
         data,
+        documents,
         context_value=flask.request,
-        debug=flask.current_app.debug
+        debug=flask.current_app.debug,
+        extensions=get_extensions()
     )
 
     status_code = 200 if success else 400
-    return flask.jsonify(result), status_code
+    response = flask.Response(encoder.dumps(result), mimetype="application/json")
+    if success and not result.get("errors"):
+        if key:
+            cache.set_key(key, response.get_data(), ttl)
+        with_cache_control(response, method, ttl)
+    return response, status_code
+
+
+def is_get_allowed(data: dict, documents: DocumentCache) -> bool:
+    """ Whether request **data** may be run over GET, ie. holds no mutation """
+
+    try:
+        return is_query(documents.parse(data["query"]))
+    except (KeyError, TypeError, GraphQLError):
+        # malformed requests are reported by the executor
+        return True
+
+
+def with_cache_control(response: flask.Response, method: str, ttl: int):
+    """ Let HTTP caches keep successful GET responses for **ttl** secs """
+
+    if method == "GET" and ttl:
+        response.cache_control.public = True
+        response.cache_control.max_age = ttl
+    return response
+
+
+def get_extensions() -> list:
+    """ Ariadne extensions enabled by the app settings """
+
+    from app.cost import CostExtension, get_cost_analyser
+
+    extensions = []
+    if flask.current_app.config["METRICS"]:
+        from app.metrics import MetricsExtension
+        extensions.append(MetricsExtension)
+    if get_cost_analyser():
+        extensions.append(CostExtension)
+    return extensions
+
+
+@flask.current_app.route("/metrics", methods=["GET"])
+def metrics():
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+    return flask.Response(generate_latest(), 200, mimetype=CONTENT_TYPE_LATEST)
+
+
+@flask.current_app.route("/graphql/cache", methods=["GET"])
+def graphql_cache_stats():
+    cache = get_response_cache()
+    return flask.jsonify(cache.stats() if cache else {}), 200
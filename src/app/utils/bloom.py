@@ -0,0 +1,37 @@
+import hashlib
+import math
+
+
+__all__ = ('BloomFilter', )
+
+
+class BloomFilter:
+    """
+    Space-efficient probabilistic set: membership tests may yield false
+    positives (at most **error_rate**), but never false negatives.
+
+        >>> bloom = BloomFilter(capacity=1000)
+        >>> bloom.add(b"612acbbc20abcbba8e42fd04")
+        >>> b"612acbbc20abcbba8e42fd04" in bloom
+        True
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: bytes):
+        # double hashing: derive all positions from two 64-bit hashes
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big')
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: bytes):
+        for pos in self._positions(key):
+            self.bits[pos // 8] |= 1 << (pos % 8)
+
+    def __contains__(self, key: bytes):
+        return all(self.bits[pos // 8] & (1 << (pos % 8))
+                   for pos in self._positions(key))
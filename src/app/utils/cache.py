@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+__all__ = ('LRUCache', 'RedisCache', 'make_cache')
+
+
+class LRUCache:
+    """
+    In-process, thread-safe LRU cache with per-entry TTL.
+    Evicts the least recently used entries beyond **maxsize**.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._data[key] = value, time.time() + ttl
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """
+    Cache backed by a Redis server (shared across workers), eg. a local instance.
+    Requires the `redis` package.
+
+    Expects a Redis db of its own (cf. **url**): its size is that of the
+    db (`DBSIZE`), rather than scanning the keyspace for **prefix**.
+    """
+
+    def __init__(self, url="redis://localhost:6379/1", prefix="newsapi:"):
+        import redis
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._redis.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self._redis.set(self.prefix + key, value, ex=ttl)
+
+    def __len__(self):
+        return self._redis.dbsize()
+
+
+def make_cache(backend: str, **kwargs):
+    """
+    Cache instance for given backend name.
+    :param backend: "lru" | "redis"
+    :param kwargs: options for the backend, eg. `maxsize`, `url`.
+    """
+
+    backends = {"lru": LRUCache, "redis": RedisCache}
+    assert backend in backends, \
+        f"unsupported cache backend `{backend}`, choose from: {', '.join(backends)}"
+    return backends[backend](**kwargs)
@@ -0,0 +1,52 @@
+from functools import lru_cache
+from typing import Dict, Optional
+
+import pytz
+from babel.core import Locale, UnknownLocaleError
+from babel.numbers import get_territory_currencies
+
+
+__all__ = ('get_countries', 'get_country')
+
+
+@lru_cache(maxsize=None)
+def get_countries() -> Dict[str, dict]:
+    """
+    Registry of country metadata, by ISO 3166-1 alpha-2 territory code.
+    Covers every territory known to Babel; built once (Babel lookups are costly),
+    then shared: callers must not alter the returned dicts.
+
+        >>> get_countries()["SN"]
+        {'country_code': 'SN', 'country_name': 'Senegal', 'timezone': 'Africa/Dakar',
+         'currency': 'XOF', 'languages': ['French']}
+    """
+
+    en = Locale('en')
+    countries = {}
+    for code, name in en.territories.items():
+        if len(code) != 2 or not code.isalpha():
+            continue
+
+        # language of the territory's most likely locale, if any
+        try:
+            languages = [Locale.parse(f"und_{code}").get_language_name('en')]
+        except UnknownLocaleError:
+            languages = []
+
+        timezones = pytz.country_timezones.get(code) or [None]
+        currencies = get_territory_currencies(code) or [None]
+        countries[code] = {
+            "country_code": code,
+            "country_name": name,
+            "timezone": timezones[0],
+            "currency": currencies[0],
+            "languages": languages,
+        }
+
+    return countries
+
+
+def get_country(code: str) -> Optional[dict]:
+    """ Metadata of country with territory **code**, cf. `get_countries()` """
+
+    return get_countries().get((code or "").upper())
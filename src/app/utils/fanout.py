@@ -0,0 +1,33 @@
+import contextvars
+from collections import deque
+from concurrent.futures import Executor
+from itertools import islice
+from typing import Callable, Iterable
+
+
+__all__ = ('fan_out', )
+
+
+def fan_out(fn: Callable, items: Iterable, executor: Executor, concurrency: int):
+    """
+    Like `map(fn, items)`, but runs calls concurrently on **executor**.
+
+    Results are yielded in order of **items**, as soon as available.
+    At most **concurrency** calls are in flight at once, whatever the size
+    of the executor's pool, so that a single wide request cannot exhaust it.
+    Pending calls are cancelled if the consumer stops iterating early.
+    Calls run in a copy of the caller's context (`contextvars`).
+    """
+
+    items = iter(items)
+    pending = deque(executor.submit(contextvars.copy_context().run, fn, item)
+                    for item in islice(items, max(concurrency, 1)))
+    try:
+        while pending:
+            result = pending.popleft().result()
+            for item in islice(items, 1):
+                pending.append(executor.submit(contextvars.copy_context().run, fn, item))
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,30 @@
+from graphql import FieldNode, FragmentSpreadNode, GraphQLResolveInfo
+
+
+__all__ = ('get_selection', )
+
+
+def get_selection(info: GraphQLResolveInfo) -> dict:
+    """
+    Tree of the fields selected by the query under the field being resolved,
+    with fragments inlined. Eg. for query `{ posts { id siblings { title } } }`:
+
+        >>> get_selection(info)
+        {'id': {}, 'siblings': {'title': {}}}
+    """
+
+    def _collect(nodes, tree: dict):
+        for node in nodes:
+            if not getattr(node, 'selection_set', None):
+                continue
+            for sel in node.selection_set.selections:
+                if isinstance(sel, FieldNode):
+                    _collect([sel], tree.setdefault(sel.name.value, {}))
+                elif isinstance(sel, FragmentSpreadNode):
+                    _collect([info.fragments[sel.name.value]], tree)
+                else:
+                    # InlineFragmentNode
+                    _collect([sel], tree)
+        return tree
+
+    return _collect(info.field_nodes, {})
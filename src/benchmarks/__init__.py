@@ -0,0 +1,7 @@
+"""
+Performance benchmarks, run against a live MongoDB database (`MONGO_URI`).
+
+    cd src
+    MONGO_URI=mongodb://localhost:27017/scraped_news_db \
+    python -m benchmarks.bench_search_posts
+"""
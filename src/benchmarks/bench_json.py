@@ -0,0 +1,71 @@
+"""
+Compares encoders of GraphQL responses (cf. `utils.encoders`) against the
+former `flask.jsonify()` path, on realistic `posts` payloads: generated posts
+(cf. `datagen`) with their similar and adjacent posts embedded, as returned
+by a `posts` query selecting every field. No database needed.
+
+    python -m benchmarks.bench_json --posts 10 100 1000 --repeat 20
+"""
+import argparse
+import statistics
+import time
+
+import flask
+
+from app.utils.encoders import make_encoder
+from benchmarks.bench_post_view import mk_expanded
+
+
+def mk_response(count: int, similar: int, adjacent: int) -> dict:
+    """ `posts` query response: posts as GraphQL returns them (plain dicts, str ids) """
+
+    from app.posts.view import PostView
+    return {"data": {"posts": [PostView(p).to_dict() for p in mk_expanded(count, similar, adjacent)]}}
+
+
+def timeit(fn, repeat: int) -> float:
+    """ Median ms of **repeat** runs of **fn** """
+
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - start) * 1000)
+    return statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--similar", type=int, default=5)
+    parser.add_argument("--adjacent", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = flask.Flask(__name__)
+    encoders = {
+        "flask.jsonify": lambda r: flask.jsonify(r).get_data(),
+        "json": make_encoder("json").dumps,
+        "orjson": make_encoder("orjson").dumps,
+    }
+
+    print(f"{'posts':>6}  {'encoder':<15}{'median_ms':>10}{'kib':>10}{'speedup':>9}")
+    with app.app_context():
+        for count in args.posts:
+            response = mk_response(count, args.similar, args.adjacent)
+            # posts encoded beforehand, as cached sub-results would be (cf. `pre_encoded()`)
+            orjson = make_encoder("orjson")
+            fragments = {"data": {"posts": [orjson.fragment(p) for p in response["data"]["posts"]]}}
+            cases = [(name, encode, response) for name, encode in encoders.items()]
+            cases.append(("orjson+cached", orjson.dumps, fragments))
+
+            baseline = None
+            for name, encode, payload in cases:
+                ms = timeit(lambda: encode(payload), args.repeat)
+                baseline = baseline or ms
+                size = len(encode(payload)) / 1024
+                print(f"{count:>6}  {name:<15}{ms:>10.2f}{size:>10.0f}{baseline / ms:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
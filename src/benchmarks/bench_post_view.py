@@ -0,0 +1,95 @@
+"""
+Compares copying posts (`format_doc()`) to viewing them (`PostView`):
+peak memory, allocated blocks and time to format expanded posts, then to
+execute a `posts` query over them. No database needed: posts are generated
+(cf. `datagen`), with similar and adjacent posts embedded like `expand_docs()` does.
+
+    python -m benchmarks.bench_post_view --posts 100 1000 --similar 5 --adjacent 2
+"""
+import argparse
+import datetime
+import random
+import time
+import tracemalloc
+
+from benchmarks.datagen import mk_posts
+
+
+QUERY = """{ posts {
+    id title excerpt country category tags paper { brand }
+    siblings { id title } related { id title } previous { id title } next { id title } } }"""
+
+
+def mk_expanded(count: int, similar: int, adjacent: int):
+    """ Raw expanded posts, as fetched and patched by `expand_docs()` """
+
+    rnd = random.Random(0)
+    posts = mk_posts(datetime.date.today(), count, rnd)
+    strip = lambda p: {k: v for k, v in p.items() if k not in ("siblings", "related")}
+    for post in posts:
+        for rel in ("siblings", "related"):
+            post[rel] = [strip(p) for p in rnd.sample(posts, similar)]
+        for adj in ("previous", "next"):
+            post[adj] = [strip(p) for p in rnd.sample(posts, adjacent)]
+    return posts
+
+
+def format_copies(posts, format_doc):
+    """ Former formatting: every post and embedded post copied """
+
+    formatted = []
+    for post in posts:
+        post = dict(post)
+        for rel in ("siblings", "related", "previous", "next"):
+            post[rel] = [format_doc(p) for p in post[rel]]
+        formatted.append(format_doc(post))
+    return formatted
+
+
+def measure(fn):
+    """ (ms, peak KiB, allocated blocks) of running **fn** """
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+    del result
+    return elapsed * 1000, peak / 1024, blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--similar", type=int, default=5)
+    parser.add_argument("--adjacent", type=int, default=2)
+    args = parser.parse_args()
+
+    from ariadne import QueryType, graphql_sync, load_schema_from_path, make_executable_schema
+    from app import create_app
+    with create_app().app_context():
+        from app.posts.queries import format_doc
+        from app.posts.view import PostView
+
+    print(f"{'posts':>6}  {'format':<10}{'step':<9}{'ms':>10}{'peak_kib':>12}{'blocks':>10}")
+    for count in args.posts:
+        posts = mk_expanded(count, args.similar, args.adjacent)
+        formats = {"copy": lambda: format_copies(posts, format_doc),
+                   "view": lambda: [PostView(p) for p in posts]}
+
+        for name, fmt in formats.items():
+            query = QueryType()
+            query.set_field("posts", lambda *_: fmt())
+            schema = make_executable_schema(load_schema_from_path("app/schema.graphql"), query)
+
+            for step, fn in (("format", fmt),
+                             ("execute", lambda: graphql_sync(schema, {"query": QUERY}))):
+                ms, peak, blocks = measure(fn)
+                print(f"{count:>6}  {name:<10}{step:<9}{ms:>10.1f}{peak:>12.0f}{blocks:>10}")
+
+
+if __name__ == '__main__':
+    main()
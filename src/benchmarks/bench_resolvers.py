@@ -0,0 +1,169 @@
+"""
+Times every resolver across dataset sizes, on a synthetic dataset (cf. `datagen`)
+loaded into a local mongod (database `--db`, dropped and refilled!) or into mongomock.
+
+Queries are executed against the GraphQL schema, each run in its own request
+(per-request caches reset), bypassing the HTTP layer and the response cache.
+Reports the first (cold) run and the median of the next `--repeat` (warm) runs.
+Results are written to JSON, and compared against a previous `--baseline` run.
+
+    python -m benchmarks.bench_resolvers --sizes 3x100 7x500 --output bench.json
+    python -m benchmarks.bench_resolvers --mongomock --baseline bench.json
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import time
+
+from pymongo import monitoring
+
+from benchmarks.bench_search_posts import CommandCounter
+from benchmarks.datagen import generate
+
+
+# resolver -> (query, variables)
+QUERIES = {
+    "posts": ("""{ posts(limit: 20, adjacent: 1) {
+        id title country category tags
+        siblings { id title } related { id title } previous { id } next { id } } }""", {}),
+    "post": ("""query($id: String!) { post(post_id: $id, adjacent: 1) {
+        id title text siblings { id title } related { id } previous { id } next { id } } }""",
+             None),
+    "mostPublished": ("{ mostPublished(limit: 10) { name value doc } }", {}),
+    "mostOccurring": ("{ mostOccurring(limit: 10) { name value doc } }", {}),
+    "categoriesCounts": ("{ categoriesCounts(limit: 10) { name value } }", {}),
+    "tagsCounts": ("{ tagsCounts(limit: 20) { name value } }", {}),
+    "countriesCounts": ("{ countriesCounts(limit: 10) { name value doc } }", {}),
+    "sportsSchedule": ("""{ sportsSchedule(sport: "102", limit: 20) {
+        event league time home_team away_team } }""", {}),
+}
+
+
+def parse_size(size: str):
+    """ "7x500" -> (7 days, 500 posts per day) """
+
+    days, posts = size.lower().split("x")
+    return int(days), int(posts)
+
+
+def run_query(app, query, variables, counter):
+    """ Execute **query** in a fresh request, returns (ms, commands, errors) """
+
+    from ariadne import graphql_sync
+    from app.routes import schema
+
+    with app.test_request_context():
+        counter.count = 0
+        start = time.perf_counter()
+        _, result = graphql_sync(schema, {"query": query, "variables": variables})
+        elapsed = time.perf_counter() - start
+
+    return elapsed * 1000, counter.count, result.get("errors")
+
+
+def bench(create_app, sizes, repeat, counter, mongomock=False):
+    results = []
+    for days, posts in sizes:
+
+        # fresh app per dataset, not to reuse app-wide caches (rollups, etc.)
+        app = create_app()
+        with app.app_context():
+            from app.database import db
+        generate(db, days, posts)
+        latest = max(n for n in db.list_collection_names() if n[0].isdigit())
+        post_id = str(db[latest].find_one({}, {"_id": 1})["_id"])
+
+        for resolver, (query, variables) in QUERIES.items():
+            variables = {"id": post_id} if variables is None else variables
+            runs = [run_query(app, query, variables, counter) for _ in range(repeat + 1)]
+            (cold, commands, errors), warm = runs[0], [ms for ms, _, _ in runs[1:]]
+
+            results.append({
+                "resolver": resolver, "days": days, "posts": posts,
+                "cold_ms": round(cold, 2),
+                "median_ms": round(statistics.median(warm), 2) if warm else None,
+                "min_ms": round(min(warm), 2) if warm else None,
+                # command monitoring is not supported by mongomock
+                "commands": None if mongomock else commands,
+                "errors": [e.get("message") for e in errors or []],
+            })
+            print_row(results[-1])
+
+    return results
+
+
+def print_row(r, baseline=None):
+    delta = ""
+    if baseline and baseline.get("median_ms") and r["median_ms"]:
+        delta = f"{(r['median_ms'] / baseline['median_ms'] - 1) * 100:+.0f}%"
+    print(f"{r['resolver']:<18}{r['days']:>6}{r['posts']:>8}{r['cold_ms']:>10}"
+          f"{str(r['median_ms']):>10}{str(r['commands']):>10}{delta:>8}"
+          f"{'  ERR ' + r['errors'][0] if r['errors'] else ''}")
+
+
+def compare(results, path):
+    """ Print median deltas against the results of a previous run """
+
+    with open(path) as f:
+        baseline = {(r["resolver"], r["days"], r["posts"]): r for r in json.load(f)["results"]}
+    print(f"\ncompared to {path}:")
+    for r in results:
+        print_row(r, baseline.get((r["resolver"], r["days"], r["posts"])))
+
+
+def git_commit():
+    with contextlib.suppress(Exception):
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", nargs="+", default=["3x100", "7x500"],
+                        help="dataset sizes, as <days>x<posts per day>")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="newsapi_bench",
+                        help="database to (re)fill. its contents get dropped!")
+    parser.add_argument("--mongomock", action="store_true",
+                        help="run against an in-memory mongomock server instead")
+    parser.add_argument("--output", default="bench_resolvers.json")
+    parser.add_argument("--baseline", help="previous results to compare to")
+    args = parser.parse_args()
+
+    # app settings are read on import
+    os.environ["MONGO_URI"] = f"{args.uri.rstrip('/')}/{args.db}"
+
+    # listeners must be registered before the Mongo client gets created
+    counter = CommandCounter()
+    monitoring.register(counter)
+
+    with contextlib.ExitStack() as stack:
+        if args.mongomock:
+            import mongomock
+            stack.enter_context(mongomock.patch(servers=((args.uri.split("//")[-1]),)))
+
+        from app import create_app
+        print(f"{'resolver':<18}{'days':>6}{'posts':>8}{'cold_ms':>10}"
+              f"{'median_ms':>10}{'commands':>10}")
+        results = bench(create_app, [parse_size(s) for s in args.sizes],
+                        args.repeat, counter, args.mongomock)
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "commit": git_commit(),
+            "date": datetime.datetime.utcnow().isoformat(),
+            "backend": "mongomock" if args.mongomock else "mongod",
+            "results": results}, f, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
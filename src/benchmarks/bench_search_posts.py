@@ -0,0 +1,67 @@
+"""
+Compares Mongo round trips and latency of the `search_posts()` engines:
+"python" (app-side expansion) vs. "pipeline" (server-side `$lookup`s).
+
+    python -m benchmarks.bench_search_posts --limit 10 100 --adjacent 0 1 5
+"""
+import argparse
+import time
+
+from pymongo import monitoring
+
+
+class CommandCounter(monitoring.CommandListener):
+    """ Counts Mongo commands (round trips) issued by the client """
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def run(app, engine, limit, adjacent, counter):
+    from app.posts.queries import search_posts
+
+    app.config["POSTS_ENGINE"] = engine
+    with app.test_request_context():
+        counter.count = 0
+        start = time.perf_counter()
+        posts = list(search_posts(match={}, limit=limit, adjacent=adjacent))
+        elapsed = time.perf_counter() - start
+
+    return {"engine": engine, "limit": limit, "adjacent": adjacent,
+            "posts": len(posts), "commands": counter.count,
+            "ms": round(elapsed * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limit", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--adjacent", type=int, nargs="+", default=[0, 1, 5])
+    args = parser.parse_args()
+
+    # listeners must be registered before the Mongo client gets created
+    counter = CommandCounter()
+    monitoring.register(counter)
+
+    from app import create_app
+    app = create_app()
+
+    print(f"{'engine':<10}{'limit':>8}{'adjacent':>10}{'posts':>8}{'commands':>10}{'ms':>10}")
+    for limit in args.limit:
+        for adjacent in args.adjacent:
+            for engine in ("python", "pipeline"):
+                r = run(app, engine, limit, adjacent, counter)
+                print(f"{r['engine']:<10}{r['limit']:>8}{r['adjacent']:>10}"
+                      f"{r['posts']:>8}{r['commands']:>10}{r['ms']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Synthetic dataset generator: fills a database with **days** day collections
+of **posts** realistic posts each (types, countries, categories, tags, videos,
+`siblings`/`related` similarity scores), plus upcoming sports events.
+
+    python -m benchmarks.datagen --uri mongodb://localhost:27017 --db newsapi_bench \
+        --days 7 --posts 500
+"""
+import argparse
+import datetime
+import os
+import random
+import struct
+
+from bson import ObjectId
+
+
+# cf. `app.database.DAY_FORMAT`, not imported: requires an app context
+DAY_FORMAT = "%Y-%m-%d"
+
+
+POST_TYPES = ["post", "post", "post", "metapost", "metapost.featured"]
+COUNTRIES = ["SN", "CI", "ML", "GN", "BF", "CM", "FR", "MA", "TG", "BJ"]
+CATEGORIES = ["Politique", "Economie", "Culture", "Sport", "Societe", "Sante",
+              "International", "Technologie", "Faits divers", "Environnement"]
+TAGS = [f"tag{i}" for i in range(200)]
+PAPERS = [{"brand": f"paper{i}", "description": f"Paper #{i}",
+           "logo_url": f"https://paper{i}.example/logo.png"} for i in range(50)]
+SPORTS = {"102": "Soccer", "106": "Basketball"}
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+         "tempor incididunt ut labore et dolore magna aliqua").split()
+
+
+def object_id(at: datetime.datetime) -> ObjectId:
+    """ Unique ObjectId generated at given time, like drivers do """
+
+    return ObjectId(struct.pack(">I", int(at.timestamp())) + os.urandom(8))
+
+
+def sentence(rnd: random.Random, n: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(n)).capitalize()
+
+
+def mk_posts(day: datetime.date, count: int, rnd: random.Random) -> list:
+    """ **count** posts scraped on **day**, newest last; similar posts refer to same day """
+
+    start = datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.timezone.utc)
+    times = sorted(start + datetime.timedelta(seconds=rnd.randrange(86400))
+                   for _ in range(count))
+    ids = [object_id(t) for t in times]
+
+    similar = lambda: [{"_id": x, "score": round(rnd.uniform(.5, 1), 3)} for x in rnd.sample(
+        ids, min(len(ids), rnd.choice((0, 0, 1, 2, 3, 5, 8))))]
+
+    posts = []
+    for _id, at in zip(ids, times):
+        title = sentence(rnd, 8)
+        posts.append({
+            "_id": _id,
+            "type": rnd.choice(POST_TYPES),
+            "country": rnd.choice(COUNTRIES),
+            "category": rnd.choice(CATEGORIES),
+            "tags": rnd.sample(TAGS, rnd.randint(0, 6)),
+            "videos": [f"https://videos.example/{_id}/{i}.mp4"
+                       for i in range(rnd.choice((0, 0, 0, 1, 2)))],
+            "images": [f"https://images.example/{_id}/{i}.jpg" for i in range(rnd.randint(0, 4))],
+            "title": title,
+            "excerpt": sentence(rnd, 25),
+            "text": " ".join(sentence(rnd, 15) for _ in range(20)),
+            "summary": sentence(rnd, 40),
+            "caption": title,
+            "keywords": rnd.sample(WORDS, 5),
+            "authors": [{"name": sentence(rnd, 2), "role": "journalist"}],
+            "paper": rnd.choice(PAPERS),
+            "link": f"https://news.example/{_id}",
+            "publish_time": at.isoformat(),
+            "modified_time": at.isoformat(),
+            "top_image": f"https://images.example/{_id}/top.jpg",
+            "is_draft": False,
+            "is_scrap": True,
+            "version": "1",
+            "siblings": similar(),
+            "related": similar(),
+        })
+    return posts
+
+
+def mk_events(sport: str, count: int, rnd: random.Random) -> list:
+    """ **count** upcoming (and some past) events of **sport** """
+
+    today = datetime.date.today()
+    events = []
+    for i in range(count):
+        date = today + datetime.timedelta(days=rnd.randint(-30, 90))
+        home, away = rnd.sample(range(40), 2)
+        events.append({
+            "idEvent": str(i), "strSport": SPORTS.get(sport, sport),
+            "strSeason": f"{today.year}-{today.year + 1}",
+            "strEvent": f"Team {home} vs Team {away}", "strLeague": f"League {i % 5}",
+            "strVenue": f"Stadium {home}", "dateEvent": str(date),
+            "strTimestamp": f"{date}T{rnd.randint(12, 21)}:00:00+00:00",
+            "strCity": f"City {home}", "strCountry": rnd.choice(COUNTRIES),
+            "strStatus": "Not Started", "strPostponed": "no",
+            "strHomeTeam": f"Team {home}", "strAwayTeam": f"Team {away}",
+            "strThumb": f"https://thumbs.example/{i}.jpg",
+        })
+    return events
+
+
+def generate(db, days: int, posts: int, events=500, seed=0):
+    """
+    Replace the contents of database **db** with **days** day collections
+    (up to today) of **posts** posts each, and **events** events per sport.
+    """
+
+    rnd = random.Random(seed)
+    for name in db.list_collection_names():
+        db.drop_collection(name)
+
+    today = datetime.datetime.utcnow().date()
+    for d in range(days):
+        day = today - datetime.timedelta(days=d)
+        docs = mk_posts(day, posts, rnd)
+        if docs:
+            db[day.strftime(DAY_FORMAT)].insert_many(docs)
+
+    for sport in SPORTS:
+        db[sport].insert_many(mk_events(sport, events, rnd))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="newsapi_bench",
+                        help="database to (re)fill. its contents get dropped!")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from pymongo import MongoClient
+    generate(MongoClient(args.uri)[args.db], args.days, args.posts, seed=args.seed)
+    print(f"generated {args.days} days x {args.posts} posts into `{args.db}`")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,17 +3,25 @@ import pytest
 from app import create_app
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def app():
 
     # `yield`, so that execution is passed to the test functions.
-    app = create_app({
-        "TESTING": True     # so exceptions can propagate to test client
-    })
+    # shared by all tests: routes get registered on the first app created only.
+    # `TestConfig`: TESTING, so exceptions can propagate to test client
+    app = create_app("test")
 
     yield app
 
 
+@pytest.fixture(autouse=True)
+def app_context(app):
+    # app modules bind to the current app once imported:
+    # import them within tests, under this context, not at the top of test modules.
+    with app.app_context():
+        yield
+
+
 @pytest.fixture(scope="module")
 def test_client(app):
     # return `FlaskClient` (subclasses `werkzeug.test.Client`) instance
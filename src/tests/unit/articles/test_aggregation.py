@@ -0,0 +1,77 @@
+import mongomock
+from bson import ObjectId
+
+from app.utils.agg import Aggregate as Agg
+
+
+def _rows(day, counts):
+    return [({"_id": key, "value": value}, day) for key, value in counts]
+
+
+def test_exec_agg_sum_ranks_across_days(app):
+
+    # partial sums of a same key get merged across days, before ranking
+    from app.posts.queries import exec_agg_sum_pipeline
+
+    rows = _rows("2021-06-22", [("Sport", 3), ("Culture", 4), ("", 9)]) + \
+        _rows("2021-06-21", [("Sport", 2), ("Politique", 1)])
+
+    with app.app_context():
+        ranked = lambda limit: [(k, v["sum"]) for k, v in exec_agg_sum_pipeline(
+            None, rows=rows, limit=limit).items()]
+
+        assert ranked(None) == [("Sport", 5), ("Culture", 4), ("Politique", 1)]
+        assert ranked(2) == [("Sport", 5), ("Culture", 4)]
+
+
+def test_exec_agg_sum_keeps_ties_in_order(app):
+
+    from app.posts.queries import exec_agg_sum_pipeline
+
+    rows = _rows("2021-06-22", [("b", 2), ("a", 2), ("c", 1), ("d", 2)])
+
+    with app.app_context():
+        ranked = lambda limit: list(exec_agg_sum_pipeline(None, rows=rows, limit=limit))
+
+        assert ranked(None) == ["b", "a", "d", "c"]
+        assert ranked(2) == ranked(None)[:2]
+        assert ranked(10) == ranked(None)
+
+
+def test_exec_agg_sum_fetches_top_docs_only(app, mocker):
+
+    from app.posts.queries import exec_agg_sum_pipeline
+
+    collection = mongomock.MongoClient().db["2021-06-21"]
+    ids = [ObjectId() for _ in range(3)]
+    collection.insert_many([{"_id": _id, "title": str(i)} for i, _id in enumerate(ids)])
+    find = mocker.spy(collection, "find")
+    rows = _rows(collection, [(ids[0], 1), (ids[1], 3), (ids[2], 2)])
+
+    with app.test_request_context():
+        results = exec_agg_sum_pipeline(None, rows=rows, limit=2, with_doc=True)
+
+    assert [v["doc"]["title"] for v in results.values()] == ["1", "2"]
+    assert find.call_count == 1
+    assert set(find.call_args[0][0]["_id"]["$in"]) == {ids[1], ids[2]}
+
+
+def test_agg_post_sum_limits_relations_per_day(app, mocker):
+
+    from app.posts import queries
+    from app.posts.queries import agg_post_sum, exec_agg_sum_pipeline
+
+    execute = mocker.patch.object(queries, "exec_agg_sum_pipeline")
+    mocker.patch.dict(app.config, {"POSTS_ROLLUPS": False})
+
+    with app.app_context():
+        agg_post_sum(Agg.GroupBy.siblings, limit=3)
+        agg_post_sum(Agg.GroupBy.categories, limit=3)
+
+    (relation, *_), _ = execute.call_args_list[0]
+    (category, *_), _ = execute.call_args_list[1]
+
+    # sums by post `_id` are final per collection, unlike sums by category
+    assert {"$limit": 3} in relation
+    assert {"$limit": 3} not in category
+    assert execute.call_args_list[0][1]["with_doc"]
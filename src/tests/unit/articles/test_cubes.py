@@ -0,0 +1,108 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import mongomock
+
+
+docs = [
+    {"paper": {"brand": "a"}, "country": "SN", "type": "post", "tags": ["x", "y"],
+     "videos": ["v"], "siblings": [{"score": .5}, {"score": .25}]},
+    {"paper": {"brand": "a"}, "country": "CI", "type": "post", "tags": ["x"]},
+    {"paper": {"brand": "b"}, "country": "SN", "type": "metapost"},
+]
+
+
+def test_cube_groups_by_dimensions():
+
+    from app.posts.cubes import PostCube
+
+    cube = PostCube.build(docs)
+
+    assert cube.group_by(["paper"], ["posts", "videos", "siblings"]) == {
+        ("a",): [2, 1, .75], ("b",): [1, 0, 0]}
+    assert cube.group_by(["tag"], ["posts"]) == {("x",): [2], ("y",): [1], (None,): [1]}
+    assert cube.group_by(["paper", "country"], ["posts"], networks=["a"]) == {
+        ("a", "SN"): [1], ("a", "CI"): [1]}
+    assert cube.group_by(["type"], ["posts"], networks=["c"]) == {}
+
+
+def test_cube_persists():
+
+    from app.posts.cubes import PostCube
+
+    cube = PostCube.from_document(PostCube.build(docs).to_document())
+    assert cube.group_by(["country"], ["posts"]) == {("SN",): [2], ("CI",): [1]}
+
+
+def _store(mocker, days, **kwargs):
+
+    from app.posts import cubes, rollups
+    from app.posts.cubes import CubeStore
+
+    db = mongomock.MongoClient().db
+    for day, day_docs in days.items():
+        db[day].insert_many([dict(doc) for doc in day_docs])
+    for module in (cubes, rollups):
+        mocker.patch.object(module, "db", db)
+    mocker.patch.object(cubes, "get_day_names", lambda *_, **__: sorted(days, reverse=True))
+    store = CubeStore(**kwargs)
+    return db, store, mocker.spy(CubeStore, "build")
+
+
+def test_cube_store_persists_past_days(mocker):
+
+    from app.posts.cubes import CubeStore, CUBES_COLLECTION
+
+    db, store, build = _store(mocker, {"2021-06-21": docs}, check_interval=3600)
+
+    assert len(store.get("2021-06-21")) == 3
+    assert db[CUBES_COLLECTION].count_documents({"_id": "2021-06-21"}) == 1
+
+    # fingerprint unchanged: loaded from the stored cube, eg. by another worker
+    other = CubeStore(check_interval=0)
+    assert len(other.get("2021-06-21")) == 3
+    assert build.call_count == 1
+
+    # fingerprint changed: rebuilt, once checked again
+    db["2021-06-21"].insert_one({"paper": {"brand": "c"}})
+    assert len(store.get("2021-06-21")) == 3
+    assert len(other.get("2021-06-21")) == 4
+    assert build.call_count == 2
+
+
+def test_cube_store_rebuilds_recent_days(mocker):
+
+    from app.posts.cubes import CUBES_COLLECTION
+
+    today = datetime.datetime.utcnow().strftime("%Y-%m-%d")
+    db, store, build = _store(mocker, {today: docs}, ttl=0)
+
+    db[today].insert_one({"paper": {"brand": "c"}})
+    assert len(store.get(today)) == 4
+    db[today].delete_one({"paper.brand": "c"})
+    assert len(store.get(today)) == 3
+
+    # never persisted
+    assert build.call_count == 2
+    assert db[CUBES_COLLECTION].count_documents({}) == 0
+
+
+def test_cube_store_query_merges_days(mocker):
+
+    from app.posts import queries
+
+    days = {"2021-06-21": docs, "2021-06-22": docs[:1]}
+    with ThreadPoolExecutor(2) as executor:
+        db, store, build = _store(mocker, days, maxsize=1, executor=executor, concurrency=2)
+
+        assert store.query(["paper"], ["posts", "siblings"]) == [
+            {"paper": "a", "posts": 3, "siblings": 1.5}, {"paper": "b", "posts": 1, "siblings": 0}]
+        assert store.query(["country"], ["posts"], networks=["b"], limit=1) == [
+            {"country": "SN", "posts": 1}]
+
+        # as resolved, defaults to posts by paper
+        mocker.patch.object(queries, "get_cube_store", lambda: store)
+        assert queries.resolve_publisher_metrics(None, None, limit=1) == [{"paper": "a", "posts": 3}]
+
+    # at most `maxsize` cubes kept in memory
+    assert len(store._cubes) == 1
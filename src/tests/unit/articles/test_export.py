@@ -0,0 +1,67 @@
+import json
+
+import mongomock
+import pytest
+
+
+@pytest.fixture
+def collections(app, mocker):
+
+    from app.posts import export
+
+    db = mongomock.MongoClient().db
+    db["2021-06-22"].insert_many([{"title": f"22-{i}", "country": "SN"} for i in range(3)])
+    db["2021-06-21"].insert_many([{"title": f"21-{i}", "country": "CI"} for i in range(3)])
+    collections = [db["2021-06-22"], db["2021-06-21"]]
+    mocker.patch.object(export, "get_collections", lambda *_: collections)
+    mocker.patch.dict(app.config, {"POSTS_EXPORT_CHUNK_SIZE": 2})
+    return collections
+
+
+def test_export_streams_posts_in_chunks(test_client, collections):
+
+    response = test_client.get("/posts/export?limit=5", buffered=False)
+    chunks = [chunk.decode() for chunk in response.response]
+    posts = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert [chunk.count("\n") for chunk in chunks] == [2, 2, 1]
+    assert [p["title"] for p in posts] == ["22-2", "22-1", "22-0", "21-2", "21-1"]
+    assert all("id" in p and "_id" not in p for p in posts)
+
+
+def test_export_filters_and_projects(test_client, collections):
+
+    response = test_client.get("/posts/export?countries=CI&fields=country")
+    posts = [json.loads(line) for line in response.data.decode().splitlines()]
+
+    assert len(posts) == 3
+    assert all(set(p) == {"id", "country"} and p["country"] == "CI" for p in posts)
+    assert test_client.get("/posts/export?countries=").data == b""
+
+
+def test_export_encodes_posts_like_graphql(test_client, collections, mocker):
+
+    from app.posts import export
+    from app.utils.encoders import make_encoder
+
+    encoder = make_encoder("orjson")
+    dumps = mocker.spy(encoder, "dumps")
+    mocker.patch.object(export, "get_json_encoder", return_value=encoder)
+    sibling = collections[1].find_one()
+    collections[0].update_many({}, {"$set": {"siblings": [{"_id": sibling["_id"], "score": 0.9}]}})
+
+    response = test_client.get("/posts/export?days=2021-06-22&limit=1")
+    post = json.loads(response.data)
+
+    assert post["siblings"] == [{"id": str(sibling["_id"]), "score": 0.9}]
+    assert dumps.call_count == 1
+
+
+@pytest.mark.parametrize("query", ["limit=x", "post_ids=nope"])
+def test_export_rejects_invalid_args(test_client, collections, query):
+
+    response = test_client.get(f"/posts/export?{query}")
+    assert response.status_code == 400
+    assert "error" in response.json
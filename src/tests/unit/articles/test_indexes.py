@@ -0,0 +1,40 @@
+import mongomock
+
+
+def test_index_manager_indexes_new_days(mocker):
+
+    from app.posts import indexes
+    from app.posts.indexes import IndexManager
+
+    db = mongomock.MongoClient().db
+    db["2021-06-21"].insert_one({"type": "post"})
+    mocker.patch.object(indexes, "db", db)
+    mocker.patch.object(indexes, "get_day_names", lambda *_, **__: db.list_collection_names())
+    manager = IndexManager()
+
+    assert manager.check("2021-06-21") == manager.names
+    manager.refresh()
+    assert manager.check("2021-06-21") == []
+
+    db["2021-06-22"].insert_one({"type": "post"})
+    manager.refresh()
+    assert manager.check("2021-06-22") == []
+
+
+def test_index_manager_indexes_in_background(mocker):
+
+    from app.posts import indexes
+    from app.posts.indexes import IndexManager
+
+    db = mongomock.MongoClient().db
+    db["2021-06-21"].insert_one({"type": "post"})
+    mocker.patch.object(indexes, "db", db)
+    mocker.patch.object(indexes, "get_day_names", lambda *_, **__: db.list_collection_names())
+    manager = IndexManager(check_interval=3600)
+    refresh = mocker.spy(manager, "refresh")
+
+    manager.start()
+    manager.start()
+    manager._timer.join(timeout=.5)
+    assert manager.check("2021-06-21") == []
+    assert refresh.call_count == 1
@@ -0,0 +1,146 @@
+from unittest import mock
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+
+class Locator:
+    def locate(self, _id):
+        return "2021-06-21"
+
+
+def _db(mocker, post_ids):
+
+    from app.posts import ingest
+
+    db = mongomock.MongoClient().db
+    db["2021-06-21"].insert_many([{"_id": post_id} for post_id in post_ids])
+    mocker.patch.object(ingest, "db", db)
+    return db
+
+
+def test_event_buffer_flushes_counters(mocker):
+
+    from app.posts.ingest import EventBuffer, target_key
+
+    post_id = ObjectId()
+    db = _db(mocker, [post_id])
+    buffer = EventBuffer(Locator(), flush_interval=3600)
+
+    for _ in range(3):
+        buffer.add(post_id, "clicks")
+    buffer.add(post_id, "views", count=5)
+    buffer.add(post_id, "clicks", target_key("https://x.y/z"))
+
+    assert len(buffer) == 3
+    assert buffer.flush() == 1
+    assert len(buffer) == 0
+    assert db["2021-06-21"].find_one(post_id)["counters"] == {
+        "clicks": {"root": 3, "https%3A%2F%2Fx%2Ey%2Fz": 1}, "views": {"root": 5}}
+
+    # summed to the stored counters
+    buffer.add(post_id, "clicks")
+    buffer.flush()
+    assert db["2021-06-21"].find_one(post_id)["counters"]["clicks"]["root"] == 4
+
+
+def test_event_buffer_keeps_counters_not_written(mocker):
+
+    from app.posts.ingest import EventBuffer
+
+    post_ids = ObjectId(), ObjectId()
+    db = _db(mocker, post_ids)
+    buffer = EventBuffer(Locator(), flush_interval=3600)
+
+    for post_id in post_ids:
+        buffer.add(post_id, "clicks", count=2)
+    with mock.patch.object(mongomock.collection.Collection, "bulk_write", side_effect=ConnectionError):
+        with pytest.raises(ConnectionError):
+            buffer.flush()
+    buffer.add(post_ids[0], "clicks")
+
+    # retried on next flush
+    assert buffer.flush() == 2
+    assert [doc["counters"] for doc in db["2021-06-21"].find()] == [
+        {"clicks": {"root": 3}}, {"clicks": {"root": 2}}]
+
+
+def test_event_buffer_bounds_pending_counters(mocker):
+
+    from app.posts import ingest
+    from app.posts.ingest import EventBuffer
+
+    db = mocker.patch.object(ingest, "db")
+    db["2021-06-21"].bulk_write.side_effect = ConnectionError
+    thread = mocker.spy(ingest.threading, "Thread")
+    buffer = EventBuffer(Locator(), flush_interval=3600, max_pending=2)
+
+    post_ids = [ObjectId() for _ in range(3)]
+    for post_id in post_ids:
+        buffer.add(post_id, "clicks")
+    assert buffer.full
+
+    # a single flusher thread, woken once full
+    assert thread.call_count == 1
+    with pytest.raises(ConnectionError):
+        buffer.flush()
+    assert len(buffer) == 2 and buffer.full
+
+
+def test_event_buffer_drops_unknown_posts(mocker):
+
+    from app.posts import ingest
+    from app.posts.ingest import EventBuffer
+
+    mocker.patch.object(ingest, "db")
+    locator = mocker.Mock(**{"locate.return_value": None})
+    buffer = EventBuffer(locator, flush_interval=3600)
+
+    post_id = ObjectId()
+    buffer.add(post_id, "clicks")
+    assert buffer.flush() == 0
+
+    # remembered as unknown: further events are ignored, without looking the post up again
+    buffer.add(post_id, "clicks")
+    assert len(buffer) == 0
+    assert buffer.flush() == 0
+    locator.locate.assert_called_once_with(post_id)
+
+
+def test_ingest_events_requires_token(app, test_client, mocker):
+
+    from app.posts import ingest
+
+    buffer = mocker.patch.object(ingest, "get_event_buffer").return_value
+    buffer.full, add = False, buffer.add
+    events = [{"post": str(ObjectId()), "action": "clicks"}] * 3
+    post = lambda events, token=None: test_client.post(
+        "/posts/events", json=events, headers={"Authorization": f"Bearer {token}"} if token else {})
+
+    assert post(events, "t").status_code == 403
+    mocker.patch.dict(app.config, {"POSTS_EVENTS_TOKENS": ["t"], "POSTS_EVENTS_MAX_BATCH": 2})
+    assert post(events).status_code == 401
+    assert post(events, "x").status_code == 401
+    assert post(events, "t").status_code == 413
+    assert post(events[:2], "t").status_code == 202
+    assert add.call_count == 2
+
+    buffer.full = True
+    assert post(events[:2], "t").status_code == 503
+    assert add.call_count == 2
+
+
+def test_parse_event():
+
+    from app.posts.ingest import parse_event
+
+    post_id = ObjectId()
+    assert parse_event({"post": str(post_id), "action": "views"}) == \
+        (post_id, "views", "root", 1)
+    with pytest.raises(ValueError):
+        parse_event({"post": str(post_id), "action": "likes"})
+    with pytest.raises(ValueError):
+        parse_event({"post": "nope", "action": "clicks"})
+    with pytest.raises(ValueError):
+        parse_event({"post": str(post_id), "action": "clicks", "count": 10 ** 20})
@@ -0,0 +1,48 @@
+import mongomock
+from bson import ObjectId
+
+
+def _collection(name, docs):
+    collection = mongomock.MongoClient().db[name]
+    collection.insert_many(docs)
+    return collection
+
+
+def test_relation_loader_fetches_once_per_collection():
+
+    from app.posts.loaders import RelationLoader
+
+    ids = [ObjectId() for _ in range(3)]
+    collection = _collection("2021-06-21", [{"_id": x, "title": str(x)} for x in ids])
+    loader = RelationLoader()
+
+    loader.prime(collection, ids[:2])
+    loader.prime(collection, ids[1:])
+    loader.dispatch()
+
+    collection.delete_many({})
+    docs = loader.load_many(collection, [ids[2], ids[0]])
+    assert [d["_id"] for d in docs] == [ids[2], ids[0]]
+
+    # returns the cached docs, not copies
+    assert loader.load_many(collection, [ids[2]])[0] is docs[0]
+
+
+def test_adjacency_index_mimics_sorted_queries():
+
+    from app.posts.loaders import AdjacencyIndex
+
+    ids = [ObjectId() for _ in range(6)]
+    collection = _collection("2021-06-21", [
+        {"_id": x, "type": "metapost" if i % 2 else "post"} for i, x in enumerate(ids)])
+    index = AdjacencyIndex()
+
+    previous_ids, next_ids = index.adjacent(
+        collection, "metapost", {"type": "metapost"}, ids[3], 5)
+    assert previous_ids == [ids[1]]
+    assert next_ids == [ids[5]]
+
+    previous_ids, next_ids = index.adjacent(
+        collection, "post", {"type": "post"}, ids[4], 1)
+    assert previous_ids == [ids[2]]
+    assert next_ids == []
@@ -0,0 +1,30 @@
+import mongomock
+from bson import ObjectId
+
+
+def test_post_locator_updates_bloom_with_new_days(mocker):
+
+    from app.posts import lookup
+    from app.posts.lookup import PostLocator
+
+    db = mongomock.MongoClient().db
+    ids = {"2021-06-21": [ObjectId() for _ in range(3)], "2021-06-22": [ObjectId()]}
+    db["2021-06-21"].insert_many([{"_id": _id} for _id in ids["2021-06-21"]])
+    mocker.patch.object(lookup, "db", db)
+    mocker.patch.object(lookup, "get_collections", lambda *_: [
+        db[name] for name in sorted(db.list_collection_names(), reverse=True)])
+    find = mocker.spy(mongomock.collection.Collection, "find")
+    locator = PostLocator()
+
+    locator.update_bloom()
+    assert find.call_count == 1
+
+    # only new days are scanned
+    db["2021-06-22"].insert_many([{"_id": _id} for _id in ids["2021-06-22"]])
+    locator.update_bloom()
+    assert find.call_count == 2
+    assert all(_id.binary in locator._bloom for day_ids in ids.values() for _id in day_ids)
+
+    # rebuilt from scratch on demand only
+    locator.update_bloom(rebuild=True)
+    assert find.call_count == 4
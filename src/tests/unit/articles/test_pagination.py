@@ -0,0 +1,49 @@
+import mongomock
+import pytest
+from bson import ObjectId
+
+
+def _db(days):
+    db = mongomock.MongoClient().db
+    for day, ids in days.items():
+        db[day].insert_many([{"_id": x} for x in ids])
+    return db
+
+
+def _fetch(collection, after_key, limit):
+    match = {"_id": {"$lt": after_key[-1]}} if after_key else {}
+    return [((doc["_id"],), doc["_id"])
+            for doc in collection.find(match).sort("_id", -1).limit(limit)]
+
+
+def test_cursor_roundtrip():
+
+    from app.posts.pagination import encode_cursor, decode_cursor
+
+    _id = ObjectId()
+    assert decode_cursor(encode_cursor("2021-06-21", (3, _id))) == ("2021-06-21", (3, _id))
+    with pytest.raises(ValueError):
+        decode_cursor("garbage")
+
+
+def test_paginate_resumes_across_days(mocker):
+
+    from app.posts import pagination
+    from app.posts.pagination import paginate, to_connection
+
+    days = {"2021-06-22": [ObjectId() for _ in range(3)],
+            "2021-06-21": [ObjectId() for _ in range(2)]}
+    mocker.patch.object(pagination, "db", _db(days))
+    mocker.patch.object(pagination, "get_day_names", lambda *_, **__: sorted(days, reverse=True))
+    expected = sorted(days["2021-06-22"], reverse=True) + sorted(days["2021-06-21"], reverse=True)
+
+    results, after = [], None
+    while True:
+        edges, has_next = paginate(_fetch, 2, after)
+        results += [x for _, x in edges]
+        connection = to_connection(edges, has_next, after)
+        after = connection["pageInfo"]["endCursor"]
+        if not has_next:
+            break
+
+    assert results == expected
@@ -1,5 +1,3 @@
-from app.database import get_collections
-
 # def test_resolve_posts(mocker):
 #
 #     response = test_client.post("/graphql", json={"query": '{ posts {id title} }'})
@@ -10,6 +8,8 @@ from app.database import get_collections
 
 def test_get_collections_returns_empty_list_with_wrong_date_range(mocker, app, mongo, from_date, to_date):
 
+    from app.database import get_collections
+
     with app.app_context():
         pass
 
@@ -19,4 +19,100 @@ def test_get_collections_returns_empty_list_with_wrong_date_range(mocker, app, m
     mocker.patch('newsapi.posts.queries.db.list_collection_names', return_value=collection_names)
     collections = [mongo.db.collection[name] for name in collection_names]
 
-    assert collections == get_collections(from_date, to_date)
\ No newline at end of file
+    assert collections == get_collections(from_date, to_date)
+
+def test_expand_posts_without_adjacent_selected(app):
+
+    import mongomock
+    from daily_query.base import Doc
+    from app.posts.queries import expand_posts, mk_projection
+
+    collection = mongomock.MongoClient().db["2021-06-21"]
+    collection.insert_many([{"title": str(i), "type": "post"} for i in range(3)])
+    selection = {"id": {}, "title": {}}
+
+    # `type` not projected, adjacent posts not expanded
+    with app.test_request_context():
+        docs = [Doc(collection, d) for d in collection.find({}, mk_projection(selection))]
+        posts = expand_posts(docs, adjacent=1, selection=selection)
+
+    assert [p["title"] for p in posts] == ["0", "1", "2"]
+    assert all("previous" not in p for p in posts)
+
+
+def test_expand_posts_scans_adjacency_index_for_many_posts(app):
+
+    import flask
+    import mongomock
+    from daily_query.base import Doc
+    from app.posts.queries import expand_posts, ADJACENCY_INDEX_MIN_POSTS
+
+    collection = mongomock.MongoClient().db["2021-06-21"]
+    collection.insert_many([{"title": str(i), "type": "post"}
+                            for i in range(ADJACENCY_INDEX_MIN_POSTS + 1)])
+    selection = {"title": {}, "previous": {"title": {}}, "next": {"title": {}}}
+    docs = lambda limit: [Doc(collection, d) for d in collection.find().sort("_id", -1).limit(limit)]
+
+    # a single post: adjacent posts queried
+    with app.test_request_context():
+        post, = expand_posts(docs(1), adjacent=1, selection=selection)
+        assert (collection, "post") not in flask.g.adjacency_index
+    assert [p["title"] for p in post["previous"]] == [str(ADJACENCY_INDEX_MIN_POSTS - 1)]
+
+    with app.test_request_context():
+        posts = expand_posts(docs(ADJACENCY_INDEX_MIN_POSTS), adjacent=1, selection=selection)
+        assert (collection, "post") in flask.g.adjacency_index
+    assert [p["title"] for p in posts[0]["previous"]] == [str(ADJACENCY_INDEX_MIN_POSTS - 1)]
+    assert [p["title"] for p in posts[1]["next"]] == [str(ADJACENCY_INDEX_MIN_POSTS)]
+
+
+def test_merge_stats_of_legacy_stats_and_counters():
+
+    from bson import ObjectId
+    from app.posts.queries import merge_stats
+
+    post, other = ObjectId(), ObjectId()
+    row = lambda post_id, action, name, counter, value, root=False: {
+        "_id": {"post": post_id, "action": action, "name": name, "counter": counter},
+        "root": root, "value": value}
+
+    # rows of two day collections, each ranked by its pipeline
+    rows = [
+        row(post, "clicks", None, False, 2, root=True),
+        row(post, "clicks", None, True, 3, root=True),
+        row(post, "clicks", "https://x.y/z", False, 1),
+        row(post, "clicks", "https%3A%2F%2Fx%2Ey%2Fz", True, 4),
+        row(other, "clicks", None, True, 6, root=True),
+        row(other, "views", None, True, 1, root=True),
+    ]
+    stats = merge_stats(rows, ["clicks", "views"])
+
+    assert [(s["post"], s["name"], s["value"]) for s in stats["clicks"]] == [
+        (str(other), None, 6), (str(post), None, 5), (str(post), "https://x.y/z", 5)]
+    assert stats["views"] == [{"post": str(other), "name": None, "root": True, "value": 1}]
+    assert [s["value"] for s in merge_stats(rows, ["clicks"], limit=2)["clicks"]] == [6, 5]
+
+
+def test_fanout_search_fetches_ahead_first_batches_only(mocker):
+
+    import mongomock
+    from app import database
+    from app.database import FanoutDaily
+
+    db = mongomock.MongoClient().db
+    for day in ("2021-06-21", "2021-06-22", "2021-06-23"):
+        db[day].insert_many([{"day": day, "i": i} for i in range(10)])
+    collections = [db["2021-06-23"], db["2021-06-22"], db["2021-06-21"]]
+    mocker.patch.object(database, "get_collections", lambda *_: collections)
+    engine = FanoutDaily(db, pool_size=2, concurrency=2, batch_size=3)
+
+    docs = [(d["day"], d["i"]) for d in engine.search(limit=12)]
+    assert docs == [("2021-06-23", i) for i in range(9, -1, -1)] + \
+        [("2021-06-22", 9), ("2021-06-22", 8)]
+
+    # collections fetched ahead hold a batch at most
+    read = mocker.spy(mongomock.collection.Cursor, "__next__")
+    posts = engine.search(limit=100)
+    next(posts)
+    assert read.call_count <= 2 * 3
+    posts.close()
@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import mongomock
+
+from app.utils.agg import Aggregate as Agg
+
+
+def _store(mocker, days, **kwargs):
+
+    from app.posts import rollups
+    from app.posts.rollups import RollupStore
+
+    db = mongomock.MongoClient().db
+    for day, docs in days.items():
+        db[day].insert_many(docs)
+    mocker.patch.object(rollups, "db", db)
+    mocker.patch.object(rollups, "get_day_names", lambda *_, **__: sorted(days, reverse=True))
+    return db, RollupStore(**kwargs)
+
+
+def test_rollups_merge_days(app, mocker):
+
+    db, store = _store(mocker, {
+        "2021-06-21": [{"category": "Sport", "country": "SN"},
+                       {"category": "Sport", "country": "CI"}],
+        "2021-06-22": [{"category": "Sport", "country": "SN"},
+                       {"category": "Culture", "country": "SN"}],
+    }, executor=ThreadPoolExecutor(2))
+
+    with app.app_context():
+        rows = list(store.aggregate(Agg.GroupBy.categories))
+        assert sorted((row["_id"], row["value"], c.name) for row, c in rows) == [
+            ("Culture", 1, "2021-06-22"), ("Sport", 1, "2021-06-22"), ("Sport", 2, "2021-06-21")]
+
+        # filtered upon rollup dimensions, at merge time
+        rows = list(store.aggregate(Agg.GroupBy.categories, countries=["SN"]))
+        assert sorted((row["_id"], row["value"]) for row, _ in rows) == [
+            ("Culture", 1), ("Sport", 1), ("Sport", 1)]
+        # empty lists drop all filters, like `mkfilter()`
+        assert len(list(store.aggregate(Agg.GroupBy.categories, countries=[], type="post"))) == 3
+        assert list(store.aggregate(Agg.GroupBy.categories, type="post")) == []
+
+
+def test_rollups_refresh_past_days_when_changed(app, mocker):
+
+    from app.posts.rollups import RollupStore
+
+    db, store = _store(mocker, {"2021-06-21": [{"category": "Sport"}]}, check_interval=3600)
+    compute = mocker.spy(store, "compute")
+
+    with app.app_context():
+        assert store.get("2021-06-21", Agg.GroupBy.categories)[0]["value"] == 1
+        db["2021-06-21"].insert_one({"category": "Sport"})
+
+        # served from memory until checked again
+        assert store.get("2021-06-21", Agg.GroupBy.categories)[0]["value"] == 1
+        store.check_interval = 0
+        assert store.get("2021-06-21", Agg.GroupBy.categories)[0]["value"] == 2
+
+        # served from the stored rollups while unchanged, eg. by another worker
+        other = RollupStore(check_interval=0)
+        assert other.get("2021-06-21", Agg.GroupBy.categories)[0]["value"] == 2
+        assert compute.call_count == 2
+
+
+def test_rollups_recompute_invalidated_days(app, mocker):
+
+    from app.posts.rollups import RollupStore
+
+    db, store = _store(mocker, {"2021-06-21": [{"category": "Sport"}]}, check_interval=0)
+    compute = mocker.spy(store, "compute")
+
+    with app.app_context():
+        assert store.get("2021-06-21", Agg.GroupBy.categories)[0]["_id"] == "Sport"
+
+        # edited in place: same count and newest `_id`, unnoticed until invalidated
+        db["2021-06-21"].update_many({}, {"$set": {"category": "Culture"}})
+        assert store.get("2021-06-21", Agg.GroupBy.categories)[0]["_id"] == "Sport"
+        RollupStore.invalidate("2021-06-21")
+        assert store.get("2021-06-21", Agg.GroupBy.categories)[0]["_id"] == "Culture"
+        assert compute.call_count == 2
+
+
+def test_rollups_invalidate_command(app, mocker):
+
+    from app.posts.rollups import RollupStore, rollups_cli
+
+    invalidate = mocker.patch.object(RollupStore, "invalidate")
+    result = app.test_cli_runner().invoke(rollups_cli, ["invalidate", "--day", "2021-06-21"])
+
+    assert result.exit_code == 0
+    invalidate.assert_called_once_with("2021-06-21")
+
+
+def test_rollups_eligible_types():
+
+    from app.posts.rollups import RollupStore
+
+    store = RollupStore(types=["metapost"])
+
+    assert store.is_eligible(Agg.GroupBy.categories, Agg.SumBy.count, {"type": "metapost"})
+    assert store.is_eligible(Agg.GroupBy.categories, Agg.SumBy.count, {"countries": ["SN"]})
+    assert not store.is_eligible(Agg.GroupBy.categories, Agg.SumBy.count, {"type": "anything"})
@@ -0,0 +1,28 @@
+from bson import ObjectId
+
+
+def test_post_view_exposes_id():
+
+    from app.posts.view import PostView
+
+    _id = ObjectId()
+    doc = {"_id": _id, "title": "t"}
+    post = PostView(doc)
+
+    assert post["id"] == str(_id) and post.get("title") == "t"
+    assert "_id" not in post and post.get("_id") is None
+    assert dict(post) == {"id": str(_id), "title": "t"}
+
+
+def test_post_view_wraps_embedded_posts_lazily():
+
+    from app.posts.view import PostView
+
+    sibling = {"_id": ObjectId(), "title": "s"}
+    doc = {"_id": ObjectId(), "siblings": [sibling], "tags": ["a"]}
+    post = PostView(doc)
+
+    assert doc["siblings"][0] is sibling
+    assert post["siblings"][0]["id"] == str(sibling["_id"])
+    assert post["tags"] == ["a"]
+    assert post.to_dict()["siblings"] == [{"id": str(sibling["_id"]), "title": "s"}]
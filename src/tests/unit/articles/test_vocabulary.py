@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import mongomock
+import pytest
+from graphql import GraphQLError
+
+
+def test_vocabulary_merges_days(mocker):
+
+    from app.posts import rollups, vocabulary
+    from app.posts.vocabulary import VocabularyStore
+
+    db = mongomock.MongoClient().db
+    db["2021-06-21"].insert_many([{"category": "Sport", "tags": ["foot", "can"]},
+                                  {"category": "Culture", "tags": []}])
+    db["2021-06-22"].insert_many([{"category": "Sport", "tags": ["basket"]}])
+    for module in (vocabulary, rollups):
+        mocker.patch.object(module, "db", db)
+    mocker.patch.object(vocabulary, "get_day_names", lambda *_, **__: ["2021-06-22", "2021-06-21"])
+    store = VocabularyStore()
+
+    assert store.values("category") == ["Culture", "Sport"]
+    assert store.values("tags", limit=2) == ["basket", "can"]
+    assert store.values("tags", match={"$regex": "^b"}) == ["basket"]
+
+    # past days are served from memory until checked again
+    db["2021-06-21"].insert_one({"category": "Politique"})
+    assert store.values("category") == ["Culture", "Sport"]
+
+
+def test_vocabulary_bounds_and_fans_out_days(mocker):
+
+    from app.posts import rollups, vocabulary
+    from app.posts.vocabulary import VocabularyStore
+
+    days = ["2021-06-23", "2021-06-22", "2021-06-21"]
+    db = mongomock.MongoClient().db
+    for day in days:
+        db[day].insert_one({"category": day})
+    for module in (vocabulary, rollups):
+        mocker.patch.object(module, "db", db)
+    mocker.patch.object(vocabulary, "get_day_names", lambda days_from=None, *_: [
+        d for d in days if not days_from or d >= days_from])
+
+    with ThreadPoolExecutor(2) as executor:
+        store = VocabularyStore(max_days=2, executor=executor, concurrency=2)
+        assert store.values("category") == ["2021-06-22", "2021-06-23"]
+        assert store.values("category", days_from="2021-06-21") == days[::-1]
+
+
+def test_mk_matcher():
+
+    from app.posts.vocabulary import mk_matcher
+
+    assert mk_matcher("SPO")("Sport")
+    assert not mk_matcher({"$nin": ["Sport"]})("Sport")
+    assert mk_matcher(["Sport", "Culture"])("Culture")
+    assert mk_matcher(None)("anything")
+    assert mk_matcher({"$regex": "^c\\+\\+", "$options": "i"})("C++")
+    assert not mk_matcher({"$regex": "^foot"})("baby-foot")
+
+
+@pytest.mark.parametrize("pattern", ["(a+)+$", "[", "fo.t", "\\d", "x" * 101, 1])
+def test_mk_matcher_rejects_patterns(pattern):
+
+    from app.posts.vocabulary import mk_matcher
+
+    with pytest.raises(GraphQLError):
+        mk_matcher({"$regex": pattern})
@@ -0,0 +1,32 @@
+import datetime
+
+import mongomock
+
+
+def test_schedule_view_filters_upcoming_events(mocker):
+
+    from app.ezines import sports
+    from app.ezines.sports import ScheduleView
+
+    today = datetime.date.today()
+    day = lambda offset: str(today + datetime.timedelta(days=offset))
+    db = mongomock.MongoClient().db
+    db["102"].insert_many([
+        {"strEvent": "past", "strSeason": "2021-2022", "dateEvent": day(-1)},
+        {"strEvent": "later", "strSeason": "2022-2023", "dateEvent": day(2)},
+        {"strEvent": "next", "strSeason": "2021-2022", "dateEvent": day(1)},
+    ])
+    mocker.patch.object(sports, "db", db)
+    view = ScheduleView(sports=[102, 106])
+    view.refresh()
+
+    assert [e["event"] for e in view.get("102")] == ["next", "later"]
+    assert [e["event"] for e in view.get("102", limit=1)] == ["next"]
+    assert [e["event"] for e in view.get("102", season="2022-2023")] == ["later"]
+    assert view.get("102", season="2000-2001") == []
+    assert view.get("106") == []
+
+    # indexes known sports only, never reads other collections
+    assert "dateEvent" in db["102"].index_information()
+    assert view.get("posts_rollups") == []
+    assert "posts_rollups" not in db.list_collection_names()
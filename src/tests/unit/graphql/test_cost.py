@@ -0,0 +1,82 @@
+import pytest
+from ariadne import make_executable_schema
+from graphql import GraphQLError, parse
+
+
+schema = make_executable_schema("""
+    type Post { id: String siblings: [Post] previous: Post next: Post }
+    type Query {
+        posts(limit: Int, adjacent: Int, days: [String], days_from: String, days_to: String): [Post]
+        post(post_id: String!, adjacent: Int): Post
+        tags(limit: Int, days: [String], days_from: String, days_to: String): [String]
+        publisherMetrics(limit: Int, days: [String], days_from: String, days_to: String): String
+    }
+""")
+
+
+@pytest.fixture(autouse=True)
+def day_names(mocker):
+    from app import cost
+    mocker.patch.object(cost, "get_day_names", lambda *_: [f"day-{i}" for i in range(90)])
+
+
+def test_cost_grows_with_days_and_relations():
+
+    from app.cost import CostAnalyser
+
+    analyser = CostAnalyser(schema)
+    cost = lambda q: analyser.analyse(parse(q)).actual
+
+    assert cost('{ posts(limit: 10, days: ["2021-06-21"]) { id } }') == 1 + 10
+    assert cost('{ posts(limit: 10, days_from: "2021-06-20", days_to: "2021-06-21") { id } }') \
+        == 2 + 10
+    assert cost('{ posts(limit: 10, days: ["2021-06-21"]) { siblings { id } } }') == 1 + 10 * 6
+    assert cost('{ post(post_id: "x", adjacent: 3) { previous { id } next { id } } }') == 1 + 6
+
+
+def test_cost_of_in_memory_stores_grows_with_days():
+
+    from app.cost import CostAnalyser
+
+    analyser = CostAnalyser(schema, unbounded_days=90)
+    cost = lambda q: analyser.analyse(parse(q)).actual
+
+    assert cost('{ tags(limit: 10, days: ["2021-06-21"]) }') == 5 + 10
+    assert cost('{ publisherMetrics(limit: 10) }') == 90 * 10 + 10
+
+
+def test_unbounded_days_count_day_collections(mocker):
+
+    from app import cost
+    from app.cost import CostAnalyser
+
+    day_names = mocker.patch.object(cost, "get_day_names", return_value=["d"] * 400)
+    analyser = CostAnalyser(schema)
+    cost = lambda q: analyser.analyse(parse(q)).actual
+
+    assert cost('{ publisherMetrics(limit: 10) }') == 400 * 10 + 10
+    assert cost('{ tags(limit: 10, days_to: "2021-06-21") }') == 400 * 5 + 10
+    assert cost('{ tags(limit: 10, days_from: "2021-06-21", days_to: "2021-06-21") }') == 5 + 10
+    assert day_names.call_count == 1
+
+
+def test_over_budget_rejected():
+
+    from app.cost import CostAnalyser
+
+    analyser = CostAnalyser(schema, budget=100)
+    with pytest.raises(GraphQLError) as e:
+        analyser.check(parse('{ posts(limit: 500) { id } }'))
+    assert e.value.extensions["code"] == "QUERY_TOO_EXPENSIVE"
+
+
+def test_over_budget_downgraded():
+
+    from app.cost import CostAnalyser
+
+    analyser = CostAnalyser(schema, budget=100, mode="downgrade")
+    cost = analyser.check(parse('{ p: posts(limit: 500, adjacent: 4, days: ["2021-06-21"]) '
+                                '{ previous { id } } }'))
+
+    assert cost.requested > 100 >= cost.actual
+    assert cost.overrides["p"]["adjacent"] == 1
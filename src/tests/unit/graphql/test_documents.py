@@ -0,0 +1,80 @@
+import pytest
+from ariadne import QueryType, make_executable_schema
+from graphql import GraphQLError
+
+from app.documents import DocumentCache, PersistedQueries, graphql_cached, query_hash
+
+
+query = QueryType()
+query.set_field("hello", lambda *_: "world")
+schema = make_executable_schema("type Query { hello: String }", query)
+
+
+def test_document_cache_parses_once():
+
+    documents = DocumentCache(schema)
+    document, errors = documents.validate("{ hello }")
+
+    assert not errors
+    assert documents.parse("{ hello }") is document
+    assert len(documents) == 1
+
+
+def test_document_cache_keeps_validation_errors():
+
+    documents = DocumentCache(schema)
+    success, result = graphql_cached(schema, {"query": "{ nope }"}, documents)
+
+    assert not success
+    assert documents.validate("{ nope }")[1]
+
+
+def test_graphql_cached_executes():
+
+    success, result = graphql_cached(schema, {"query": "{ hello }"}, DocumentCache(schema))
+
+    assert success
+    assert result == {"data": {"hello": "world"}}
+
+
+def test_persisted_queries_resolve_hash():
+
+    persisted = PersistedQueries(["{ hello }"])
+    data = {"extensions": {"persistedQuery": {"version": 1, "sha256Hash": query_hash("{ hello }")}}}
+
+    assert persisted.resolve(data)["query"] == "{ hello }"
+
+
+def test_persisted_queries_register_on_the_fly():
+
+    persisted = PersistedQueries()
+    extensions = {"persistedQuery": {"version": 1, "sha256Hash": query_hash("{ hello }")}}
+
+    with pytest.raises(GraphQLError, match="PersistedQueryNotFound"):
+        persisted.resolve({"extensions": extensions})
+
+    persisted.resolve({"query": "{ hello }", "extensions": extensions})
+    assert persisted.resolve({"extensions": extensions})["query"] == "{ hello }"
+
+
+def test_persisted_queries_registered_on_the_fly_are_bounded():
+
+    persisted = PersistedQueries(["{ hello }"], maxsize=2)
+    for alias in ("a", "b", "c"):
+        query = f"{{ {alias}: hello }}"
+        persisted.resolve({"query": query, "extensions": {
+            "persistedQuery": {"version": 1, "sha256Hash": query_hash(query)}}})
+
+    # least recently registered evicted, the registry is kept
+    assert len(persisted) == 3
+    assert persisted.get(query_hash("{ a: hello }")) is None
+    assert persisted.get(query_hash("{ hello }")) == "{ hello }"
+
+
+def test_persisted_queries_only_allowed_operations():
+
+    persisted = PersistedQueries(["{ hello }"], only=True)
+
+    assert persisted.resolve({"query": "{ hello }"})
+    with pytest.raises(GraphQLError, match="PersistedQueryNotSupported"):
+        persisted.resolve({"query": "{ __typename }"})
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+import bson
+from ariadne import QueryType, make_executable_schema
+from prometheus_client import REGISTRY
+
+
+def find(collection, docs):
+    """ Report a `find` command, as PyMongo does to its listeners """
+
+    from app.metrics import command_metrics
+
+    command_metrics.started(SimpleNamespace(command={"find": collection}, command_name="find"))
+    command_metrics.succeeded(SimpleNamespace(
+        command_name="find", duration_micros=1000, reply={"cursor": {"firstBatch": docs}}))
+
+
+def test_metrics_attribute_commands_to_resolvers():
+
+    from app.documents import DocumentCache, graphql_cached
+    from app.metrics import MetricsExtension
+
+    query = QueryType()
+    docs = [{"title": "t"}] * 3
+    query.set_field("metricsPosts", lambda *_: find("2021-06-21", docs) or find("posts_x", docs[:1]))
+    schema = make_executable_schema("type Query { metricsPosts: String }", query)
+    sample = lambda name: REGISTRY.get_sample_value(name, {"field": "Query.metricsPosts"})
+
+    success, _ = graphql_cached(schema, {"query": "{ metricsPosts }"}, DocumentCache(schema),
+                                extensions=[MetricsExtension])
+
+    assert success
+    assert sample("newsapi_resolver_duration_seconds_count") == 1
+    assert sample("newsapi_resolver_mongo_commands_sum") == 2
+    assert sample("newsapi_resolver_mongo_documents_sum") == 4
+    assert sample("newsapi_resolver_mongo_bytes_sum") == 4 * len(bson.encode(docs[0]))
+    assert sample("newsapi_resolver_day_collections_sum") == 1
+
+    # commands outside resolvers are not attributed
+    find("2021-06-21", docs)
+    assert sample("newsapi_resolver_mongo_commands_sum") == 2
@@ -0,0 +1,37 @@
+from graphql import parse
+
+
+def test_touches_today():
+
+    from app.cache import touches_today
+
+    day = "2021-06-22"
+    touches = lambda query, variables=None: touches_today(parse(query), variables, day)
+
+    assert touches('{ posts { id } }')
+    assert touches('{ posts(days_from: "2021-06-01") { id } }')
+    assert touches('query($d: [String]) { posts(days: $d) { id } }', {"d": ["2021-06-22"]})
+    assert not touches('{ posts(days: ["2021-06-21"]) { id } }')
+    assert not touches('{ posts(days_to: "2021-06-21") { id } }')
+
+    # counters of past posts keep changing
+    assert touches('{ stats(days: ["2021-06-21"]) { clicks { value } } }')
+
+
+def test_response_cache_by_key():
+
+    from app.cache import ResponseCache
+    from app.utils.cache import LRUCache
+
+    cache = ResponseCache(LRUCache(), ttl_today=60, ttl_past=3600)
+    data = {"query": '{ posts(days: ["2021-06-21"]) { id } }'}
+    key, ttl = cache.entry(data)
+    assert ttl == 3600
+
+    assert cache.get_key(key) is None
+    cache.set_key(key, b"{}", ttl)
+    assert cache.get_key(key) == b"{}" == cache.get(data)
+    assert cache.stats() == {"hits": 2, "misses": 1, "size": 1}
+
+    # mutations are not cached
+    assert cache.entry({"query": "mutation { x }"}) == (None, 0)
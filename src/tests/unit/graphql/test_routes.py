@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.mark.parametrize("body", ["[1, 2]", "null", '"{ posts { id } }"'])
+def test_malformed_request_rejected(test_client, body):
+
+    response = test_client.post("/graphql", data=body, content_type="application/json")
+    assert response.status_code == 400
+    assert response.json["errors"]
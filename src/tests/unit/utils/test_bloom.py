@@ -0,0 +1,23 @@
+from bson import ObjectId
+
+from app.utils.bloom import BloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives():
+
+    keys = [ObjectId().binary for _ in range(1000)]
+    bloom = BloomFilter(capacity=len(keys), error_rate=0.01)
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+
+
+def test_bloom_filter_false_positives_within_error_rate():
+
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"in-{i}".encode())
+
+    false_positives = sum(f"out-{i}".encode() in bloom for i in range(10000))
+    assert false_positives < 300
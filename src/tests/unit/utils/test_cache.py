@@ -0,0 +1,26 @@
+import time
+
+from app.utils.cache import LRUCache, make_cache
+
+
+def test_lru_cache_evicts_least_recently_used():
+
+    cache = LRUCache(maxsize=2)
+    cache.set("a", b"1", ttl=60)
+    cache.set("b", b"2", ttl=60)
+    cache.get("a")
+    cache.set("c", b"3", ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+
+
+def test_lru_cache_expires_entries():
+
+    cache = make_cache("lru", maxsize=2)
+    cache.set("a", b"1", ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
@@ -0,0 +1,17 @@
+from app.utils.countries import get_countries, get_country
+
+
+def test_country_metadata():
+
+    assert get_country("SN") == {
+        "country_code": "SN", "country_name": "Senegal", "timezone": "Africa/Dakar",
+        "currency": "XOF", "languages": ["French"]}
+    assert get_country("sn") is get_country("SN")
+    assert get_country("XX") is None
+
+
+def test_countries_cover_all_territories():
+
+    countries = get_countries()
+    assert countries is get_countries()
+    assert {"CI", "FR", "US", "AQ"} <= countries.keys()
@@ -0,0 +1,33 @@
+import datetime
+import json
+
+import pytest
+from bson import Decimal128, ObjectId
+
+from app.utils.encoders import make_encoder
+
+
+_id = ObjectId()
+doc = {"id": _id, "price": Decimal128("1.10"), "at": datetime.datetime(2021, 6, 21, 8, 30),
+       "day": datetime.date(2021, 6, 21), "tags": ["a"]}
+
+
+@pytest.mark.parametrize("name", ["json", "orjson"])
+def test_encoders_handle_bson_types(name):
+
+    encoded = json.loads(make_encoder(name).dumps(doc))
+    assert encoded == {"id": str(_id), "price": "1.10", "at": "2021-06-21T08:30:00",
+                       "day": "2021-06-21", "tags": ["a"]}
+
+
+def test_orjson_embeds_fragments():
+
+    encoder = make_encoder("orjson")
+    fragment = encoder.fragment({"country_code": "SN"})
+    assert json.loads(encoder.dumps({"doc": fragment})) == {"doc": {"country_code": "SN"}}
+
+
+def test_unknown_encoder():
+
+    with pytest.raises(ValueError):
+        make_encoder("ujson")
@@ -0,0 +1,45 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.fanout import fan_out
+
+
+def test_fan_out_keeps_items_order():
+
+    def slow_square(x):
+        time.sleep(0.01 * (5 - x))
+        return x * x
+
+    with ThreadPoolExecutor(8) as executor:
+        assert list(fan_out(slow_square, range(5), executor, 3)) == [0, 1, 4, 9, 16]
+
+
+def test_fan_out_caps_concurrency():
+
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def task(x):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return x
+
+    with ThreadPoolExecutor(8) as executor:
+        assert len(list(fan_out(task, range(20), executor, 2))) == 20
+    assert peak[0] <= 2
+
+
+def test_fan_out_stops_submitting_when_closed_early():
+
+    called = []
+
+    with ThreadPoolExecutor(2) as executor:
+        results = fan_out(called.append, range(100), executor, 2)
+        next(results)
+        results.close()
+
+    assert len(called) <= 3
@@ -0,0 +1,37 @@
+from graphql import build_schema, graphql_sync
+
+from app.utils.gql import get_selection
+
+
+schema = build_schema("""
+    type Query { posts: [Post] }
+    type Post { id: ID! title: String siblings: [Post] }
+""")
+
+
+def _selection(query):
+    selections = []
+
+    def resolve_posts(_, info):
+        selections.append(get_selection(info))
+        return []
+
+    schema.query_type.fields["posts"].resolve = resolve_posts
+    graphql_sync(schema, query)
+    return selections[0]
+
+
+def test_get_selection_returns_fields_tree():
+
+    assert _selection("{ posts { id siblings { title } } }") == \
+        {"id": {}, "siblings": {"title": {}}}
+
+
+def test_get_selection_inlines_fragments():
+
+    query = """
+        { posts { ...card siblings { ... on Post { id } } } }
+        fragment card on Post { id title }
+    """
+    assert _selection(query) == \
+        {"id": {}, "title": {}, "siblings": {"id": {}}}